@@ -0,0 +1,94 @@
+"""
+Benchmarks the events_reader against the pandas path it replaces.
+
+Usage:
+    python benchmarks/benchmark_events_reader.py [base_folder] [--repeats N] [--small-files N]
+
+The first part reads every night of the dataset; the second part writes many small events files
+to a temporary folder, where the per-file overhead dominates and the bulk reader helps most.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Make the project importable when the script is run from anywhere
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from files_for_python_project.find_file_function import find_event_files
+from files_for_python_project.events_reader import read_event_columns, read_events_bulk
+
+STAGE_COLUMNS = ["majority", "ai_psg"]
+EVENTS_HEADER = ["onset", "duration", "begsample", "endsample", "offset", "majority", "ai_psg"]
+
+
+def best_time(function, repeats):
+    """
+    Runs the function several times and returns the fastest run in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmarks(paths, repeats):
+    """
+    Times every way of reading the stage columns of the given PSG events files.
+    """
+    candidates = {
+        "pandas read_csv (all columns)": lambda: [pd.read_csv(path, sep="\t")[STAGE_COLUMNS].to_numpy() for path in paths],
+        "pandas read_csv (usecols, int8)": lambda: [pd.read_csv(path, sep="\t", usecols=STAGE_COLUMNS, dtype=np.int8)
+                                                     for path in paths],
+        "read_event_columns": lambda: [read_event_columns(path, STAGE_COLUMNS) for path in paths],
+        "read_events_bulk": lambda: read_events_bulk(paths, STAGE_COLUMNS),
+    }
+    baseline = None
+    for name, function in candidates.items():
+        elapsed = best_time(function, repeats)
+        baseline = baseline or elapsed
+        print(f"  {name:<34} {elapsed:9.2f} ms  ({baseline / elapsed:4.1f}x)")
+
+
+def write_small_files(folder, n_files, n_epochs=20):
+    """
+    Writes n_files small PSG events files and returns their paths.
+    """
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(n_files):
+        onset = np.arange(n_epochs) * 30
+        stages = rng.integers(0, 5, size=(n_epochs, 2))
+        table = pd.DataFrame({"onset": onset, "duration": 30, "begsample": onset * 256 + 1,
+                              "endsample": (onset + 30) * 256, "offset": 0,
+                              "majority": stages[:, 0], "ai_psg": stages[:, 1]})[EVENTS_HEADER]
+        path = os.path.join(folder, f"sub-{index}_task-Sleep_acq-psg_events.tsv")
+        table.to_csv(path, sep="\t", index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_folder", nargs="?", default="files_for_python_project")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--small-files", type=int, default=2000)
+    args = parser.parse_args()
+
+    _, psg_files = find_event_files(args.base_folder)
+    print(f"Dataset: {len(psg_files)} PSG events files in {args.base_folder}")
+    run_benchmarks(psg_files, args.repeats)
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_small_files(folder, args.small_files)
+        print(f"Many small files: {len(paths)} files of 20 epochs")
+        run_benchmarks(paths, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import numpy as np
+import logging
+import os
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION, SLEEP_STAGES, scheme_stages, stage_positions
+
+# Constants
+MAX_ERROR_PERCENTAGE = 40
+
+# Number of block draws (resamples x blocks) handled at once by block-level resampling; small slices
+# stay in the CPU cache, which matters more than the number of NumPy calls
+BLOCK_DRAWS_PER_SLICE = 2_500_000
+
+
+# Function to count how often every expert stage was scored as every AI stage
+def confusion_counts(majority, ai, stages=SLEEP_STAGES, no_data_column=False):
+    """
+    Builds the confusion matrix of expert stages (rows) against AI stages (columns).
+
+    Epochs with a stage outside of `stages` (PSG disconnections, missing AI data) are ignored,
+    unless no_data_column is set: then the epochs where the AI has no data are counted in an
+    extra last column, so they count as disagreements (the convention of aispg_vs_majority).
+
+    Parameters:
+    majority (array-like): Expert majority stage of every epoch.
+    ai (array-like): AI stage of every epoch (same length as majority).
+    stages (array-like): Stage codes that make up the rows and columns. Default is 0-4.
+    no_data_column (bool): Count missing AI data in an extra column. Default is False.
+
+    Returns:
+    numpy.ndarray: K x K matrix of epoch counts (K x (K + 1) with no_data_column), where K is the number of stages.
+    """
+    stages = np.asarray(stages)
+    n_stages = len(stages)
+    majority = np.asarray(majority)
+    ai = np.asarray(ai)
+
+    expert_index = stage_positions(majority, stages)
+    ai_index = stage_positions(ai, stages)
+
+    n_columns = n_stages
+    if no_data_column:
+        ai_index = np.where(ai == NO_DATA_COLLECTED, n_stages, ai_index)
+        n_columns += 1
+
+    valid = (expert_index >= 0) & (ai_index >= 0)
+    flat = expert_index[valid] * n_columns + ai_index[valid]
+    return np.bincount(flat, minlength=n_stages * n_columns).reshape(n_stages, n_columns)
+
+
+# Function to compute Cohen's kappa from one or many confusion matrices
+def cohen_kappa(confusion):
+    """
+    Calculates Cohen's kappa from a confusion matrix, or from a stack of them.
+
+    A matrix with more columns than rows (e.g. a no-data column) is treated as square, with AI
+    categories the experts never use.
+
+    Parameters:
+    confusion (numpy.ndarray): Array of shape (..., K, K) or (..., K, K + 1) with epoch counts.
+
+    Returns:
+    float or numpy.ndarray: Kappa for every matrix (NaN when a matrix has no epochs).
+    """
+    confusion = np.asarray(confusion, dtype=float)
+    n_stages = confusion.shape[-2]
+    return kappa_from_margins(np.trace(confusion[..., :n_stages], axis1=-2, axis2=-1), confusion.sum(axis=(-2, -1)),
+                              confusion.sum(axis=-1), confusion.sum(axis=-2)[..., :n_stages])
+
+
+# Function to compute Cohen's kappa from the totals of a confusion matrix
+def kappa_from_margins(matches, total, expert_totals, ai_totals):
+    """
+    Calculates Cohen's kappa from the diagonal sum, the total and the row and column sums of a confusion matrix.
+
+    Columns without a matching row (e.g. a no-data column) only count in the total.
+
+    Parameters:
+    matches (float or numpy.ndarray): Number of epochs on the diagonal.
+    total (float or numpy.ndarray): Number of epochs.
+    expert_totals (numpy.ndarray): Epochs per expert stage, shape (..., K).
+    ai_totals (numpy.ndarray): Epochs per AI stage, shape (..., K).
+
+    Returns:
+    float or numpy.ndarray: Kappa (NaN when there are no epochs).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observed = matches / total
+        expected = (expert_totals * ai_totals).sum(axis=-1) / total ** 2
+        kappa = (observed - expected) / (1 - expected)
+    return kappa
+
+
+# Function to pre-aggregate the confusion counts of every night (or block of epochs) once
+def collect_night_counts(headband_files, psg_files, source="hb", block_size=None, scheme=None):
+    """
+    Reads every night once and stores its confusion counts, so the bootstrap never reruns the comparison.
+
+    The counts follow the baseline comparisons: headband nights whose error rate reaches the threshold
+    used by headband_vs_majority are skipped and their missing epochs ignored, while for the PSG AI
+    missing epochs count as disagreements, like in aispg_vs_majority (an extra no-data column).
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    source (str): 'hb' for the headband AI or 'psg' for the PSG AI. Default is 'hb'.
+    block_size (int, optional): When given, every night is split into blocks of this many epochs
+                                and counts are kept per block. Default is None (one unit per night).
+    scheme (str, optional): Stage encoding scheme to count in (see stage_encoding). Default is None.
+
+    Returns:
+    dict: {'confusion': array (units, K, K), or (units, K, K + 1) for 'psg', 'night': array with the night index of every unit,
+           'night_ids': list of subject IDs of the kept nights}
+    """
+    if source not in ("hb", "psg"):
+        raise ValueError(f"Unknown source '{source}', expected 'hb' or 'psg'.")
+
+    stages_of_scheme = scheme_stages(scheme)
+    confusions, night_of_unit, night_ids = [], [], []
+
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        stages = load_night_stages(headband_file, psg_file, scheme)
+        if stages is None:
+            continue
+        majority, ai_psg, ai_hb = stages
+        ai = ai_hb if source == "hb" else ai_psg
+
+        if source == "hb":
+            expert_valid = majority != PSG_DISCONNECTION
+            if not expert_valid.any():
+                continue
+            error_percentage = (ai[expert_valid] == NO_DATA_COLLECTED).mean() * 100
+            if error_percentage >= MAX_ERROR_PERCENTAGE:
+                logging.debug("Error rate is too high for %s (%.2f%%), skipping night.", headband_file, error_percentage)
+                continue
+
+        # Split the night into blocks (or keep it whole) and count each part
+        bounds = range(0, len(majority), block_size) if block_size else [0]
+        step = block_size or len(majority)
+        night_confusions = [confusion_counts(majority[start:start + step], ai[start:start + step], stages_of_scheme,
+                                             no_data_column=source == "psg")
+                            for start in bounds]
+        night_confusions = [c for c in night_confusions if c.sum() > 0]
+        if not night_confusions:
+            continue
+
+        confusions.extend(night_confusions)
+        night_of_unit.extend([len(night_ids)] * len(night_confusions))
+        night_ids.append(os.path.basename(psg_file).split("_")[0])
+
+    n_stages = len(stages_of_scheme)
+    n_columns = n_stages + 1 if source == "psg" else n_stages
+    return {
+        "confusion": np.array(confusions, dtype=np.int64).reshape(-1, n_stages, n_columns),
+        "night": np.array(night_of_unit, dtype=np.int64),
+        "night_ids": night_ids,
+    }
+
+
+# Function to compute bootstrap confidence intervals for the match percentage and kappa
+def bootstrap_agreement_ci(counts, level="night", n_resamples=10000, confidence=0.95, seed=None, chunk_size=1000):
+    """
+    Bootstraps the mean per-night match percentage and the pooled Cohen's kappa.
+
+    Resampling is done with NumPy index matrices over the pre-aggregated counts:
+    - level='night' resamples whole nights with replacement.
+    - level='block' keeps every night and resamples its blocks of epochs with replacement
+      (requires counts collected with a block_size). The drawn blocks are summed per night with
+      np.add.reduceat, and kappa is computed from the pooled row and column sums only.
+
+    Parameters:
+    counts (dict): Output of collect_night_counts.
+    level (str): 'night' or 'block'. Default is 'night'.
+    n_resamples (int): Number of bootstrap resamples. Default is 10000.
+    confidence (float): Confidence level of the interval. Default is 0.95.
+    seed (int, optional): Seed for the random generator. Default is None.
+    chunk_size (int): Number of resamples processed at once, to bound memory. Default is 1000.
+
+    Returns:
+    dict: {'match': (estimate, low, high), 'kappa': (estimate, low, high), 'nights': int}
+          or None if there are no nights.
+    """
+    if level not in ("night", "block"):
+        raise ValueError(f"Unknown level '{level}', expected 'night' or 'block'.")
+
+    confusion = counts["confusion"]
+    night = counts["night"]
+    n_nights = len(counts["night_ids"])
+    if n_nights == 0:
+        logging.warning("No nights available for the bootstrap.")
+        return None
+
+    shape = confusion.shape[1:]
+    flat = confusion.reshape(len(confusion), -1).astype(float)
+    matches = np.trace(confusion, axis1=1, axis2=2).astype(float)
+    totals = confusion.sum(axis=(1, 2)).astype(float)
+
+    # Per-night totals, used both for the estimate and for night-level resampling
+    night_flat = np.zeros((n_nights, flat.shape[1]))
+    np.add.at(night_flat, night, flat)
+    night_matches = np.bincount(night, weights=matches, minlength=n_nights)
+    night_totals = np.bincount(night, weights=totals, minlength=n_nights)
+    night_percentage = night_matches / night_totals * 100
+
+    estimate_match = night_percentage.mean()
+    estimate_kappa = float(cohen_kappa(night_flat.sum(axis=0).reshape(shape)))
+
+    rng = np.random.default_rng(seed)
+    boot_match = np.empty(n_resamples)
+    boot_kappa = np.empty(n_resamples)
+
+    if level == "night":
+        for start in range(0, n_resamples, chunk_size):
+            size = min(chunk_size, n_resamples - start)
+            # Index matrix of resampled nights, turned into per-resample night weights
+            index = rng.integers(0, n_nights, size=(size, n_nights))
+            offsets = (np.arange(size) * n_nights)[:, None]
+            weights = np.bincount((index + offsets).ravel(), minlength=size * n_nights).reshape(size, n_nights)
+            boot_match[start:start + size] = weights @ night_percentage / n_nights
+            boot_kappa[start:start + size] = cohen_kappa((weights @ night_flat).reshape(size, *shape))
+    else:
+        # Blocks of a night are stored next to each other, so each night is a contiguous slice
+        order = np.argsort(night, kind="stable")
+        confusion, matches, totals, night = confusion[order], matches[order], totals[order], night[order]
+        n_units = len(night)
+        blocks_per_night = np.bincount(night, minlength=n_nights)
+        first_block = np.concatenate(([0], np.cumsum(blocks_per_night)[:-1]))
+        unit_blocks = blocks_per_night[night].astype(float)
+        unit_first = first_block[night]
+        # Row and column sums of every block, the only parts of the matrices kappa needs
+        n_stages = shape[0]
+        margins = np.hstack([confusion.sum(axis=2), confusion.sum(axis=1)[:, :n_stages]]).astype(float)
+
+        step = max(1, min(chunk_size, BLOCK_DRAWS_PER_SLICE // n_units))
+        for start in range(0, n_resamples, step):
+            size = min(step, n_resamples - start)
+            # Each block slot draws a random block from the same night
+            index = rng.random(size=(size, n_units))
+            index *= unit_blocks
+            index = index.astype(np.intp)
+            index += unit_first
+            per_night_matches = np.add.reduceat(matches[index], first_block, axis=1)
+            per_night_totals = np.add.reduceat(totals[index], first_block, axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                boot_match[start:start + size] = np.nanmean(per_night_matches / per_night_totals * 100, axis=1)
+
+            # How often every block was drawn, then the pooled row and column sums of each resample
+            index += (np.arange(size) * n_units)[:, None]
+            drawn = np.bincount(index.ravel(), minlength=size * n_units).reshape(size, n_units)
+            pooled = drawn.astype(float) @ margins
+            boot_kappa[start:start + size] = kappa_from_margins(
+                per_night_matches.sum(axis=1), per_night_totals.sum(axis=1),
+                pooled[:, :n_stages], pooled[:, n_stages:])
+
+    alpha = (1 - confidence) / 2 * 100
+    match_low, match_high = np.nanpercentile(boot_match, [alpha, 100 - alpha])
+    kappa_low, kappa_high = np.nanpercentile(boot_kappa, [alpha, 100 - alpha])
+
+    return {
+        "match": (float(estimate_match), float(match_low), float(match_high)),
+        "kappa": (estimate_kappa, float(kappa_low), float(kappa_high)),
+        "nights": n_nights,
+    }
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.streaming_pipeline import (
+    summarize_night,
+    new_aggregates,
+    update_aggregates,
+    final_report,
+    spill_rows,
+)
+from files_for_python_project.telemetry import new_progress, update_progress, finish_progress
+
+# Version of the checkpoint file layout
+CHECKPOINT_VERSION = 1
+
+
+# Function to write a checkpoint atomically
+def save_checkpoint(checkpoint_path, checkpoint):
+    """
+    Writes the checkpoint to a temporary file and renames it, so a crash never leaves a half-written checkpoint.
+
+    Parameters:
+    checkpoint_path (str): Path to the checkpoint file.
+    checkpoint (dict): The checkpoint contents.
+
+    Returns:
+    None
+    """
+    temporary_path = f"{checkpoint_path}.tmp"
+    with open(temporary_path, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(temporary_path, checkpoint_path)
+
+
+# Function to read a checkpoint written by save_checkpoint
+def load_checkpoint(checkpoint_path, base_folder):
+    """
+    Reads a checkpoint and checks that it belongs to the same dataset.
+
+    Parameters:
+    checkpoint_path (str): Path to the checkpoint file.
+    base_folder (str): The dataset folder of the current run.
+
+    Returns:
+    dict or None: The checkpoint, or None if there is no usable checkpoint.
+    """
+    if not os.path.exists(checkpoint_path):
+        logging.info(f"No checkpoint found at {checkpoint_path}, starting from the first night.")
+        return None
+
+    with open(checkpoint_path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {checkpoint.get('version')} in {checkpoint_path}.")
+    if os.path.abspath(checkpoint["base_folder"]) != os.path.abspath(base_folder):
+        raise ValueError(f"Checkpoint {checkpoint_path} belongs to {checkpoint['base_folder']}, not {base_folder}.")
+
+    return checkpoint
+
+
+# Function to run the analysis with periodic checkpoints
+def run_with_checkpoints(base_folder, checkpoint_path, resume=False, checkpoint_every=100, spill_path=None):
+    """
+    Runs the analysis of main.py and writes a checkpoint of the completed nights and the running
+    aggregates every checkpoint_every nights.
+
+    With resume=True, nights completed in the checkpoint are skipped and the run continues from the
+    saved aggregates, so the final report is the same as the one of an uninterrupted run. Per-night
+    rows spilled after the last checkpoint are dropped and written again.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+    checkpoint_path (str): Path to the checkpoint file.
+    resume (bool): Continue from the checkpoint if there is one. Default is False.
+    checkpoint_every (int): Nights between two checkpoints. Default is 100.
+    spill_path (str, optional): Tab-separated file the per-night rows are appended to. Default is None.
+
+    Returns:
+    dict: The final_report of the dataset.
+    """
+    checkpoint = load_checkpoint(checkpoint_path, base_folder) if resume else None
+
+    if checkpoint is None:
+        checkpoint = {"version": CHECKPOINT_VERSION, "base_folder": base_folder, "completed": [],
+                      "aggregates": new_aggregates(), "spill_size": 0, "finished": False}
+        if spill_path is not None and os.path.exists(spill_path):
+            os.remove(spill_path)
+    else:
+        logging.info(f"Resuming from {checkpoint_path}: {len(checkpoint['completed'])} nights already done.")
+        # Drop rows that were spilled after the checkpoint was written
+        if spill_path is not None and os.path.exists(spill_path):
+            with open(spill_path, "r+") as spill_file:
+                spill_file.truncate(checkpoint["spill_size"])
+
+    completed = set(checkpoint["completed"])
+    aggregates = checkpoint["aggregates"]
+    pending_rows = []
+    since_checkpoint = 0
+    progress = new_progress()
+
+    def write_checkpoint(finished=False):
+        # Spill the rows of the finished nights first, so the checkpoint never points past them
+        if spill_path is not None and pending_rows:
+            spill_rows(spill_path, pending_rows)
+            pending_rows.clear()
+        checkpoint["completed"] = sorted(completed)
+        checkpoint["spill_size"] = os.path.getsize(spill_path) if spill_path and os.path.exists(spill_path) else 0
+        checkpoint["finished"] = finished
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    for headband_file, psg_file in iter_event_files(base_folder):
+        if psg_file in completed:
+            continue
+
+        row = summarize_night(headband_file, psg_file)
+        if row is not None:
+            update_aggregates(aggregates, [row])
+            pending_rows.append(row)
+
+        # Unreadable nights are also marked as done, so a resumed run does not retry them
+        completed.add(psg_file)
+        since_checkpoint += 1
+        update_progress(progress)
+
+        if since_checkpoint >= checkpoint_every:
+            write_checkpoint()
+            since_checkpoint = 0
+            logging.debug("Checkpoint written: %d nights done.", len(completed))
+
+    write_checkpoint(finished=True)
+    finish_progress(progress)
+    return final_report(aggregates)
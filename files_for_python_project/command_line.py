@@ -0,0 +1,475 @@
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.streaming_pipeline import (
+    NIGHT_COLUMNS,
+    summarize_night,
+    new_aggregates,
+    update_aggregates,
+    final_report,
+)
+from files_for_python_project.results_database import (
+    connect_database,
+    stale_pairs,
+    upsert_nights,
+    query_nights,
+)
+from files_for_python_project.checkpointed_runs import run_with_checkpoints
+from files_for_python_project.exporting_results import export_results
+from files_for_python_project.creating_plots import cached_sleep_stages
+from files_for_python_project.creating_pdf_report import write_pdf_report
+from files_for_python_project.stage_encoding import SLEEP_STAGES, NO_DATA_COLLECTED, PSG_DISCONNECTION
+from files_for_python_project.telemetry import (
+    DEFAULT_INTERVAL,
+    configure_progress,
+    new_progress,
+    update_progress,
+    finish_progress,
+)
+
+# Stage codes that may appear in the expert and in the AI columns
+EXPERT_CODES = set(SLEEP_STAGES) | {PSG_DISCONNECTION}
+AI_CODES = set(SLEEP_STAGES) | {NO_DATA_COLLECTED}
+
+
+# Function to make a result serializable as strict JSON
+def to_json_value(value):
+    """
+    Converts numpy scalars and arrays, tuples and NaN values into plain JSON values.
+
+    Parameters:
+    value: Any result value.
+
+    Returns:
+    A value that json.dumps can write as strict JSON (NaN becomes null).
+    """
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# Function to write one JSON record on its own line
+def emit(record, stream=None):
+    """
+    Writes one record as a line of JSON (one line per record makes a stream of records NDJSON).
+
+    Parameters:
+    record (dict): The record to write.
+    stream (file, optional): Output stream. Default is sys.stdout.
+
+    Returns:
+    None
+    """
+    stream = stream or sys.stdout
+    stream.write(json.dumps(to_json_value(record), allow_nan=False) + "\n")
+    stream.flush()
+
+
+# Function to list the nights of a dataset, optionally one shard of them
+def select_pairs(base_folder, shard=None):
+    """
+    Lists the (headband_file, psg_file) pairs of a dataset in a stable order.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+    shard (tuple, optional): (index, count) to keep only every count-th night starting at index. Default is None.
+
+    Returns:
+    list: The selected file pairs, sorted by PSG file path.
+    """
+    pairs = sorted(iter_event_files(base_folder), key=lambda pair: pair[1])
+    if shard is not None:
+        index, count = shard
+        pairs = pairs[index::count]
+    return pairs
+
+
+# Function to parse the --shard option
+def parse_shard(text):
+    """
+    Parses a shard given as 'INDEX/COUNT', e.g. '0/4' for the first of four shards.
+
+    Parameters:
+    text (str): The option value.
+
+    Returns:
+    tuple: (index, count)
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like INDEX/COUNT, not '{text}'.")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 0 and {count - 1}.")
+    return index, count
+
+
+# Function to summarize many nights, optionally in parallel and through the results database
+def summarize_pairs(file_pairs, workers=1, database_path=None):
+    """
+    Computes the summarize_night rows of the given nights.
+
+    Parameters:
+    file_pairs (list): (headband_file, psg_file) pairs.
+    workers (int): Number of worker processes. Default is 1.
+    database_path (str, optional): Results database used as a cache: only new or changed nights are
+                                   computed, the others are read from it. Default is None.
+
+    Returns:
+    list: One row per readable night, in the order of file_pairs.
+    """
+    def compute(pairs):
+        if not pairs:
+            return []
+        headband_files, psg_files = zip(*pairs)
+        progress = new_progress(len(pairs))
+        rows = []
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for row in executor.map(summarize_night, headband_files, psg_files, chunksize=16):
+                    rows.append(row)
+                    update_progress(progress)
+        else:
+            for pair in pairs:
+                rows.append(summarize_night(*pair))
+                update_progress(progress)
+        finish_progress(progress)
+        return [row for row in rows if row is not None]
+
+    if database_path is None:
+        return compute(file_pairs)
+
+    connection = connect_database(database_path)
+    try:
+        changed = list(stale_pairs(connection, file_pairs))
+        upsert_nights(connection, compute(changed))
+        logging.info(f"{len(changed)} of {len(file_pairs)} nights computed, the others came from {database_path}.")
+
+        stored = {row["psg_file"]: row for row in connection.execute(
+            "SELECT subject_id AS subject, headband_file, psg_file, hb_match, psg_match, error_hours, total_hours "
+            "FROM night_metrics")}
+    finally:
+        connection.close()
+
+    return [{column: stored[psg_file][column] for column in NIGHT_COLUMNS}
+            for _, psg_file in file_pairs if psg_file in stored]
+
+
+# Function behind the 'discover' subcommand
+def command_discover(args):
+    for headband_file, psg_file in select_pairs(args.base_folder, args.shard):
+        emit({"subject": os.path.basename(psg_file).split("_")[0],
+              "headband_file": headband_file, "psg_file": psg_file})
+    return 0
+
+
+# Function to check one night for problems
+def validate_night(headband_file, psg_file):
+    """
+    Checks that a night can be analyzed: readable files, required columns, equal lengths and known stage codes.
+
+    Parameters:
+    headband_file (str): Path to the headband event file.
+    psg_file (str): Path to the PSG event file.
+
+    Returns:
+    list: Descriptions of the problems found (empty for a valid night).
+    """
+    try:
+        psg_df = pd.read_csv(psg_file, sep="\t")
+        headband_df = pd.read_csv(headband_file, sep="\t")
+    except Exception as e:
+        return [f"cannot read files: {e}"]
+
+    problems = []
+    for path, df, columns in ((psg_file, psg_df, ("majority", "ai_psg")), (headband_file, headband_df, ("ai_hb",))):
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            problems.append(f"missing columns {', '.join(missing)} in {os.path.basename(path)}")
+    if problems:
+        return problems
+
+    if len(psg_df) == 0:
+        problems.append("no epochs")
+    if len(psg_df) != len(headband_df):
+        problems.append(f"{len(psg_df)} PSG epochs but {len(headband_df)} headband epochs")
+
+    for column, df, allowed in (("majority", psg_df, EXPERT_CODES), ("ai_psg", psg_df, AI_CODES),
+                                ("ai_hb", headband_df, AI_CODES)):
+        codes = set(pd.unique(df[column].dropna()))
+        unknown = sorted(codes - allowed)
+        if unknown:
+            problems.append(f"unknown stage codes in {column}: {', '.join(str(code) for code in unknown)}")
+        if df[column].isna().any():
+            problems.append(f"empty values in {column}")
+    return problems
+
+
+# Function behind the 'validate' subcommand
+def command_validate(args):
+    invalid = 0
+    for headband_file, psg_file in select_pairs(args.base_folder, args.shard):
+        problems = validate_night(headband_file, psg_file)
+        invalid += bool(problems)
+        emit({"subject": os.path.basename(psg_file).split("_")[0], "psg_file": psg_file,
+              "valid": not problems, "problems": problems})
+    return 1 if invalid else 0
+
+
+# Function behind the 'analyze' subcommand
+def command_analyze(args):
+    if args.checkpoint is not None:
+        report = run_with_checkpoints(args.base_folder, args.checkpoint, resume=args.resume,
+                                      checkpoint_every=args.checkpoint_every)
+        emit({"type": "report", **report})
+        return 0
+
+    rows = summarize_pairs(select_pairs(args.base_folder, args.shard), args.workers, args.cache)
+    if args.nights:
+        for row in rows:
+            emit({"type": "night", **row})
+
+    # The aggregates let a scheduler combine the reports of several shards
+    aggregates = update_aggregates(new_aggregates(), rows)
+    report = {"type": "report", **final_report(aggregates), "aggregates": aggregates}
+    if args.shard is not None:
+        report["shard"] = f"{args.shard[0]}/{args.shard[1]}"
+    emit(report)
+    return 0
+
+
+# Function behind the 'plot' subcommand
+def command_plot(args):
+    pairs = select_pairs(args.base_folder)
+    if args.subjects:
+        wanted = set(args.subjects)
+        pairs = [pair for pair in pairs if os.path.basename(pair[1]).split("_")[0] in wanted]
+
+    figures = []
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+        # Without a cache folder the figures are rendered through a throw-away cache
+        with tempfile.TemporaryDirectory() as temporary_cache:
+            cache_dir = args.cache_dir or temporary_cache
+            for headband_file, psg_file in pairs:
+                subject = os.path.basename(psg_file).split("_")[0]
+                cached_path = cached_sleep_stages(headband_file, psg_file, cache_dir, colormap=args.colormap,
+                                                  render_mode=args.render_mode)
+                if cached_path is None:
+                    continue
+                output_path = os.path.join(args.output_dir, f"{subject}_sleep_stages.{args.render_mode}")
+                shutil.copyfile(cached_path, output_path)
+                figures.append({"subject": subject, "path": output_path})
+
+    result = {"figures": figures}
+    if args.report is not None:
+        headband_files = [headband_file for headband_file, _ in pairs]
+        psg_files = [psg_file for _, psg_file in pairs]
+        result["report"] = write_pdf_report(headband_files, psg_files, args.report, workers=args.workers,
+                                            shard_size=args.shard_size, colormap=args.colormap)
+    emit(result)
+    return 0
+
+
+# Function behind the 'export' subcommand
+def command_export(args):
+    paths = export_results(args.base_folder, args.output_dir, export_format=args.format,
+                           include_epochs=args.epochs, batch_size=args.batch_size)
+    emit({"tables": paths})
+    return 0
+
+
+# Function to create the HTTP server of the 'serve' subcommand
+def make_server(database_path, host="127.0.0.1", port=8000):
+    """
+    Creates an HTTP server that answers JSON queries on a results database.
+
+    Endpoints:
+    GET /nights?max_hb_match=60&order_by=hb_match  - nights matching any QUERY_FILTERS
+    GET /nights/<subject_id>                       - one night
+    GET /report                                    - dataset-wide numbers of the main report
+
+    Parameters:
+    database_path (str): Path to the SQLite file (see results_database).
+    host (str): Address to listen on. Default is '127.0.0.1'.
+    port (int): Port to listen on (0 picks a free port). Default is 8000.
+
+    Returns:
+    http.server.ThreadingHTTPServer: The server, not started yet.
+    """
+    class ResultsHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, body):
+            data = json.dumps(to_json_value(body), allow_nan=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+            try:
+                if parts == ["nights"]:
+                    order_by = query.pop("order_by", "subject_number")
+                    filters = {name: float(value) for name, value in query.items()}
+                    self.send_json(200, query_nights(database_path, order_by=order_by, **filters))
+                elif len(parts) == 2 and parts[0] == "nights":
+                    rows = [row for row in query_nights(database_path) if row["subject_id"] == parts[1]]
+                    if rows:
+                        self.send_json(200, rows[0])
+                    else:
+                        self.send_json(404, {"error": f"Unknown subject '{parts[1]}'."})
+                elif parts == ["report"]:
+                    self.send_json(200, final_report(update_aggregates(new_aggregates(), query_nights(database_path))))
+                else:
+                    self.send_json(404, {"error": f"Unknown endpoint '{url.path}'."})
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            logging.debug("%s - %s", self.address_string(), format % args)
+
+    return ThreadingHTTPServer((host, port), ResultsHandler)
+
+
+# Function behind the 'serve' subcommand
+def command_serve(args):
+    server = make_server(args.database, args.host, args.port)
+    host, port = server.server_address[:2]
+    emit({"serving": f"http://{host}:{port}", "database": args.database})
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+# Function to build the argument parser of the command line
+def build_parser():
+    """
+    Builds the parser of the 'sleep-analysis' command and its subcommands.
+
+    Returns:
+    argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="sleep-analysis",
+        description="Compare AI sleep staging from a headband and from PSG with expert scoring. "
+                    "Results are written to stdout as JSON (one record per line), logs to stderr.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only log warnings and errors")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also log the details of every night")
+    parser.add_argument("--progress", metavar="FILE", help="append progress records (NDJSON) to this file")
+    parser.add_argument("--progress-interval", type=float, default=DEFAULT_INTERVAL,
+                        help="seconds between progress reports (default %(default)s)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    discover = subcommands.add_parser("discover", help="list the nights of a dataset (NDJSON)")
+    discover.add_argument("base_folder")
+    discover.add_argument("--shard", type=parse_shard, help="only list shard INDEX/COUNT")
+    discover.set_defaults(handler=command_discover)
+
+    validate = subcommands.add_parser("validate", help="check every night for problems (NDJSON, exit code 1 if any)")
+    validate.add_argument("base_folder")
+    validate.add_argument("--shard", type=parse_shard, help="only check shard INDEX/COUNT")
+    validate.set_defaults(handler=command_validate)
+
+    analyze = subcommands.add_parser("analyze", help="run the main analysis (JSON report, NDJSON with --nights)")
+    analyze.add_argument("base_folder")
+    analyze.add_argument("--workers", type=int, default=1, help="number of worker processes (default 1)")
+    analyze.add_argument("--cache", metavar="DATABASE", help="results database; only new or changed nights are computed")
+    analyze.add_argument("--shard", type=parse_shard, help="only analyze shard INDEX/COUNT")
+    analyze.add_argument("--nights", action="store_true", help="also emit one record per night")
+    analyze.add_argument("--checkpoint", help="checkpoint file for a long run (sequential, whole dataset)")
+    analyze.add_argument("--checkpoint-every", type=int, default=100, help="nights between checkpoints (default 100)")
+    analyze.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    analyze.set_defaults(handler=command_analyze)
+
+    plot = subcommands.add_parser("plot", help="render sleep stage figures and/or a PDF report (JSON)")
+    plot.add_argument("base_folder")
+    plot.add_argument("--subjects", nargs="+", help="subject IDs to plot, e.g. sub-1 (default: all)")
+    plot.add_argument("--output-dir", help="folder the figures are written to")
+    plot.add_argument("--cache-dir", help="figure cache folder (see figure_cache)")
+    plot.add_argument("--render-mode", choices=["png", "svg", "pdf"], default="png")
+    plot.add_argument("--colormap", default="viridis")
+    plot.add_argument("--report", help="also write a multi-page PDF report to this path")
+    plot.add_argument("--workers", type=int, default=1, help="worker processes for the PDF report (default 1)")
+    plot.add_argument("--shard-size", type=int, default=200, help="nights per PDF shard (default 200)")
+    plot.set_defaults(handler=command_plot)
+
+    export = subcommands.add_parser("export", help="export the results as Parquet or NPZ tables (JSON)")
+    export.add_argument("base_folder")
+    export.add_argument("output_dir")
+    export.add_argument("--format", choices=["auto", "parquet", "npz"], default="auto")
+    export.add_argument("--epochs", action="store_true", help="also export the per-epoch table")
+    export.add_argument("--batch-size", type=int, default=256)
+    export.set_defaults(handler=command_export)
+
+    serve = subcommands.add_parser("serve", help="answer JSON queries on a results database over HTTP")
+    serve.add_argument("database")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.set_defaults(handler=command_serve)
+
+    return parser
+
+
+# Entry point of the 'sleep-analysis' command
+def main(argv=None):
+    """
+    Runs the command line.
+
+    Parameters:
+    argv (list, optional): The arguments (without the program name). Default is None (sys.argv).
+
+    Returns:
+    int: The exit code.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "analyze" and args.checkpoint is not None and (args.workers > 1 or args.cache or args.shard):
+        parser.error("--checkpoint runs the whole dataset sequentially and cannot be combined with "
+                     "--workers, --cache or --shard.")
+    if args.command == "analyze" and args.resume and args.checkpoint is None:
+        parser.error("--resume needs --checkpoint.")
+    if args.command == "plot" and args.output_dir is None and args.report is None:
+        parser.error("plot needs --output-dir and/or --report.")
+
+    # Logs go to stderr, so stdout only carries the JSON results
+    level = logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format="%(asctime)s - %(levelname)s - %(message)s")
+    logging.getLogger().setLevel(level)
+    configure_progress(interval=args.progress_interval, stream_path=args.progress)
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # The reader of stdout exited early (e.g. `| head`): point stdout at devnull so the final
+        # flush at exit does not fail again, and stop without a traceback
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_pdf import PdfPages
+from files_for_python_project.creating_plots import draw_sleep_stages
+from files_for_python_project.events_reader import read_night_epochs
+from files_for_python_project.streaming_pipeline import (
+    summarize_stages,
+    new_aggregates,
+    update_aggregates,
+    final_report,
+)
+
+# pypdf is optional: it is only needed to join the shards of a parallel render into one file
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+
+# Page size of the report in inches (A4 landscape)
+PAGE_SIZE = (11.69, 8.27)
+
+
+# Function to collect the per-night numbers needed for the summary page
+def collect_summary_rows(headband_files, psg_files):
+    """
+    Reads every night once and keeps only its summary numbers.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+
+    Returns:
+    list: One dictionary per readable night with 'subject' and the summarize_stages numbers.
+    """
+    rows = []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        epochs = read_night_epochs(headband_file, psg_file)
+        if epochs is None:
+            continue
+        row = {"subject": os.path.basename(psg_file).split("_")[0]}
+        row.update(summarize_stages(epochs["majority"], epochs["ai_psg"], epochs["ai_hb"]))
+        rows.append(row)
+    return rows
+
+
+# Function to draw the dataset-wide summary page
+def draw_summary_page(fig, rows):
+    """
+    Draws the summary page: dataset-wide agreement and artifact numbers, and their distribution over nights.
+
+    Parameters:
+    fig (matplotlib.figure.Figure): The figure to draw on.
+    rows (list): Per-night rows created by collect_summary_rows.
+
+    Returns:
+    None
+    """
+    report = final_report(update_aggregates(new_aggregates(), rows))
+    hb_match = np.array([row["hb_match"] for row in rows if row["hb_match"] is not None])
+    psg_match = np.array([row["psg_match"] for row in rows if row["psg_match"] is not None])
+    error_hours = np.array([row["error_hours"] for row in rows])
+
+    def percentage(value):
+        return f"{value:.2f}%" if value is not None else "n/a"
+
+    lines = [
+        f"Nights: {report['nights']}",
+        f"Headband AI vs majority: {percentage(report['hb_match'])} "
+        f"({len(hb_match)} nights, the others had too much missing data)",
+        f"PSG AI vs majority: {percentage(report['psg_match'])}",
+        f"Missing headband data: {report['error_hours']:.2f} of {report['total_hours']:.2f} hours",
+    ]
+    fig.suptitle("Sleep Analysis - AI vs Experts: dataset summary", fontsize=18)
+    fig.text(0.05, 0.88, "\n".join(lines), fontsize=12, va="top")
+
+    # Distribution of the per-night agreement of both AI sources
+    ax = fig.add_axes([0.07, 0.1, 0.4, 0.55])
+    bins = np.linspace(0, 100, 21)
+    ax.hist(psg_match, bins=bins, alpha=0.7, color="darkviolet", label="AI (PSG)")
+    ax.hist(hb_match, bins=bins, alpha=0.7, color="darkturquoise", label="AI (Headband)")
+    ax.set_xlabel("Agreement with the majority (%)")
+    ax.set_ylabel("Nights")
+    ax.legend()
+    ax.grid(True, linestyle="--", linewidth=0.5)
+
+    # Distribution of the artifact hours per night
+    ax = fig.add_axes([0.56, 0.1, 0.4, 0.55])
+    ax.hist(error_hours, bins=20, color="deeppink", alpha=0.7)
+    ax.set_xlabel("Missing headband data per night (hours)")
+    ax.set_ylabel("Nights")
+    ax.grid(True, linestyle="--", linewidth=0.5)
+
+
+# Function to stream one page per night into an open PDF document
+def write_night_pages(pdf, file_pairs, colormap="viridis"):
+    """
+    Streams one page per night into an open PdfPages document; every figure is freed right after it is written.
+
+    Parameters:
+    pdf (matplotlib.backends.backend_pdf.PdfPages): The open PDF document.
+    file_pairs (list): (headband_file, psg_file) pairs to render.
+    colormap (str): Colormap of the expert scatter plot. Default is 'viridis'.
+
+    Returns:
+    int: Number of pages written.
+    """
+    pages = 0
+    for headband_file, psg_file in file_pairs:
+        epochs = read_night_epochs(headband_file, psg_file)
+        if epochs is None or len(epochs["onset"]) == 0:
+            continue
+
+        # A Figure that is not registered with pyplot is released as soon as it goes out of scope
+        fig = Figure(figsize=PAGE_SIZE)
+        subject_id = os.path.basename(psg_file).split("_")[0]
+        draw_sleep_stages(fig, epochs["onset"], epochs["majority"], epochs["ai_psg"], epochs["ai_hb"],
+                          subject_id, colormap=colormap)
+        pdf.savefig(fig)
+        fig.clear()
+        del fig
+        pages += 1
+    return pages
+
+
+# Function to render one page per night into its own PDF file (used by the worker processes)
+def render_night_pages(file_pairs, output_path, colormap="viridis"):
+    """
+    Writes one page per night into a new PDF file.
+
+    Parameters:
+    file_pairs (list): (headband_file, psg_file) pairs to render.
+    output_path (str): Path to the PDF file.
+    colormap (str): Colormap of the expert scatter plot. Default is 'viridis'.
+
+    Returns:
+    int: Number of pages written.
+    """
+    with PdfPages(output_path) as pdf:
+        return write_night_pages(pdf, file_pairs, colormap)
+
+
+# Function to add the summary page to an open PDF document
+def write_summary_page(pdf, rows):
+    """
+    Draws the summary page into an open PdfPages document and frees its figure.
+
+    Parameters:
+    pdf (matplotlib.backends.backend_pdf.PdfPages): The open PDF document.
+    rows (list): Per-night rows created by collect_summary_rows.
+
+    Returns:
+    None
+    """
+    fig = Figure(figsize=PAGE_SIZE)
+    draw_summary_page(fig, rows)
+    pdf.savefig(fig)
+    fig.clear()
+
+
+# Function to join several PDF files into one
+def concatenate_pdfs(input_paths, output_path):
+    """
+    Concatenates PDF files in order into one file (requires the optional 'pypdf' package).
+
+    Parameters:
+    input_paths (list): Paths to the PDF files to join.
+    output_path (str): Path to the joined PDF file.
+
+    Returns:
+    None
+    """
+    if PdfWriter is None:
+        raise ImportError("Joining PDF shards requires the 'pypdf' package.")
+
+    writer = PdfWriter()
+    for path in input_paths:
+        writer.append(path)
+    with open(output_path, "wb") as output_file:
+        writer.write(output_file)
+    writer.close()
+
+
+# Function to write the full dataset report
+def write_pdf_report(headband_files, psg_files, output_path, workers=1, shard_size=200, colormap="viridis"):
+    """
+    Writes a multi-page PDF report: a summary page of the whole dataset followed by one page per night.
+
+    Pages are streamed through PdfPages, so memory stays constant however many nights there are.
+    With workers > 1 the nights are split into shards of shard_size nights that are rendered to
+    separate PDFs in parallel and then concatenated (this needs the optional 'pypdf' package;
+    without it the shards are kept next to the report).
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    output_path (str): Path to the PDF report.
+    workers (int): Number of worker processes used for the night pages. Default is 1.
+    shard_size (int): Nights per shard when rendering in parallel. Default is 200.
+    colormap (str): Colormap of the expert scatter plots. Default is 'viridis'.
+
+    Returns:
+    list: Paths of the written PDF files (just the report, unless the shards could not be joined).
+    """
+    file_pairs = list(zip(headband_files, psg_files))
+    rows = collect_summary_rows(headband_files, psg_files)
+
+    if workers <= 1:
+        with PdfPages(output_path) as pdf:
+            write_summary_page(pdf, rows)
+            write_night_pages(pdf, file_pairs, colormap)
+        logging.info(f"Wrote the report of {len(rows)} nights to {output_path}.")
+        return [output_path]
+
+    # Parallel rendering: the summary page is shard 0, the nights are split into the other shards
+    base, _ = os.path.splitext(output_path)
+    summary_path = f"{base}.shard-0000.pdf"
+    with PdfPages(summary_path) as pdf:
+        write_summary_page(pdf, rows)
+
+    shards = [file_pairs[start:start + shard_size] for start in range(0, len(file_pairs), shard_size)]
+    shard_paths = [f"{base}.shard-{index + 1:04d}.pdf" for index in range(len(shards))]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(render_night_pages, shards, shard_paths, [colormap] * len(shards)))
+
+    all_paths = [summary_path] + shard_paths
+    if PdfWriter is None:
+        logging.warning("The 'pypdf' package is not installed, so the report shards were not joined.")
+        return all_paths
+
+    concatenate_pdfs(all_paths, output_path)
+    for path in all_paths:
+        os.remove(path)
+    logging.info(f"Wrote the report of {len(rows)} nights to {output_path}.")
+    return [output_path]
@@ -1,15 +1,22 @@
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
+from matplotlib.figure import Figure
+import io
 import random
 import pandas as pd
 import os
 import numpy as np
 import logging
+from files_for_python_project.events_reader import read_night_epochs
+from files_for_python_project.figure_cache import (
+    DEFAULT_CACHE_BYTES,
+    figure_cache_key,
+    load_cached_figure,
+    store_figure,
+)
 
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def plot_sleep_stages(psg_files, headband_files, colormap='viridis', title=None):
+def plot_sleep_stages(psg_files, headband_files, colormap='viridis', title=None, cache_dir=None):
     """
     Plots sleep stage data from PSG and headband files.
     
@@ -22,9 +29,12 @@ def plot_sleep_stages(psg_files, headband_files, colormap='viridis', title=None)
     - headband_files (list of str): List of file paths to headband data files.
     - colormap (str, optional): The colormap to use for the scatter plot. Default is 'viridis'.
     - title (str, optional): Title for the plot. Default is None.
+    - cache_dir (str, optional): Folder of a figure cache (see figure_cache). When given, the figure is
+      rendered once per input fingerprint and options, and later calls show the cached image without
+      reading the files or drawing again. Default is None.
     
     Returns:
-    - None: Displays the plot but does not return any values.
+    - None, or the path of the cached image when cache_dir is given.
     """
     # Select a random PSG file from the provided list
     random_psg_file = random.choice(psg_files)
@@ -33,6 +43,23 @@ def plot_sleep_stages(psg_files, headband_files, colormap='viridis', title=None)
     if not os.path.exists(random_psg_file):
         logging.warning(f"File not found: {random_psg_file}. Skipping plot.")
         return
+
+    # With a figure cache, the night is shown from its cached image (rendered first if needed)
+    if cache_dir is not None:
+        subject_id = os.path.basename(random_psg_file).split("_")[0]
+        headband_file = next((file for file in headband_files if subject_id in os.path.basename(file)), None)
+        if headband_file is None or not os.path.exists(headband_file):
+            logging.warning(f"No corresponding headband file found or file does not exist for PSG file {random_psg_file}")
+            return
+        image_path = cached_sleep_stages(headband_file, random_psg_file, cache_dir, colormap=colormap, title=title)
+        if image_path is None:
+            return
+        fig = plt.figure(figsize=(14, 7))
+        ax = fig.add_axes([0, 0, 1, 1])
+        ax.imshow(plt.imread(image_path))
+        ax.axis('off')
+        plt.show()
+        return image_path
     
     # Load PSG data
     psg_data = pd.read_csv(random_psg_file, sep="\t")
@@ -47,12 +74,7 @@ def plot_sleep_stages(psg_files, headband_files, colormap='viridis', title=None)
     majority = psg_data['majority']  # Expert-labeled sleep stages
     ai_psg = psg_data['ai_psg']  # AI predictions from PSG
     
-    # Create a colormap for sleep stages
-    cmap = plt.get_cmap(colormap)
-    norm = mcolors.Normalize(vmin=majority.min(), vmax=majority.max())
-    colors = [cmap(norm(stage)) for stage in majority] if len(majority) > 0 else []
-    
-    if not colors:
+    if majority.empty:
         logging.warning(f"No valid majority values in {random_psg_file}. Skipping plot.")
         return
     
@@ -78,32 +100,100 @@ def plot_sleep_stages(psg_files, headband_files, colormap='viridis', title=None)
     ai_hb = headband_data['ai_hb']  # AI predictions from headband
     
     # Plot sleep stages
-    plt.figure(figsize=(14, 7))
-    
+    fig = plt.figure(figsize=(14, 7))
+    draw_sleep_stages(fig, onset, majority, ai_psg, ai_hb, subject_id, colormap=colormap, title=title)
+    plt.show()
+
+
+def draw_sleep_stages(fig, onset, majority, ai_psg, ai_hb, subject_id, colormap='viridis', title=None):
+    """
+    Draws the two sleep stage panels of one night on the given figure.
+
+    The first panel is a scatter plot of the expert sleep stages over time, the second one compares
+    the expert stages with the PSG and headband AI stages. Only the figure's own methods are used,
+    so it also works on figures that are not managed by pyplot (e.g. pages of a PDF report).
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): The figure to draw on.
+    - onset (array-like): Time of every epoch in seconds.
+    - majority (array-like): Expert-labeled sleep stages.
+    - ai_psg (array-like): AI predictions from PSG.
+    - ai_hb (array-like): AI predictions from the headband.
+    - subject_id (str): Subject ID shown in the titles.
+    - colormap (str, optional): The colormap to use for the scatter plot. Default is 'viridis'.
+    - title (str, optional): Title for the first panel. Default is None.
+
+    Returns:
+    - None
+    """
+    # Color the expert stages through the colormap, so the colorbar shows the stage scale
+    norm = mcolors.Normalize(vmin=min(majority), vmax=max(majority))
+
     # First subplot: Scatter plot of expert sleep stages over time
-    plt.subplot(2, 1, 1)
-    plt.scatter(onset, majority, c=colors, cmap=colormap, edgecolor='none', s=20, alpha=0.7)
-    plt.xlabel('Time (seconds)', fontsize=14)
-    plt.ylabel('Sleep Stage', fontsize=14)
-    plt.title(title or f'Sleep Stages Over Time In PSG (Subject: {subject_id})', fontsize=16)
-    plt.grid(True, linestyle='--', linewidth=0.5)
-    plt.colorbar(label='Sleep Stage')
-    
+    ax = fig.add_subplot(2, 1, 1)
+    scatter = ax.scatter(onset, majority, c=majority, cmap=colormap, norm=norm, edgecolor='none', s=20, alpha=0.7)
+    ax.set_xlabel('Time (seconds)', fontsize=14)
+    ax.set_ylabel('Sleep Stage', fontsize=14)
+    ax.set_title(title or f'Sleep Stages Over Time In PSG (Subject: {subject_id})', fontsize=16)
+    ax.grid(True, linestyle='--', linewidth=0.5)
+    fig.colorbar(scatter, ax=ax, label='Sleep Stage')
+
     # Second subplot: Line plot comparing expert and AI sleep stages
-    plt.subplot(2, 1, 2)
-    plt.plot(onset, majority, label='Experts', color='deeppink', alpha=0.7)
-    plt.plot(onset, ai_psg, label='AI (PSG)', color='darkviolet', alpha=0.7)
-    plt.plot(onset, ai_hb, label='AI (Headband)', color='darkturquoise', alpha=0.7)
-    
-    plt.xlabel('Time (seconds)', fontsize=14)
-    plt.ylabel('Sleep Stage', fontsize=14)
-    plt.title(f'Sleep Stages Comparison (Experts vs AI) for {subject_id}', fontsize=16)
-    plt.legend()
-    plt.grid(True, linestyle='--', linewidth=0.5)
-    
+    ax = fig.add_subplot(2, 1, 2)
+    ax.plot(onset, majority, label='Experts', color='deeppink', alpha=0.7)
+    ax.plot(onset, ai_psg, label='AI (PSG)', color='darkviolet', alpha=0.7)
+    ax.plot(onset, ai_hb, label='AI (Headband)', color='darkturquoise', alpha=0.7)
+
+    ax.set_xlabel('Time (seconds)', fontsize=14)
+    ax.set_ylabel('Sleep Stage', fontsize=14)
+    ax.set_title(f'Sleep Stages Comparison (Experts vs AI) for {subject_id}', fontsize=16)
+    ax.legend()
+    ax.grid(True, linestyle='--', linewidth=0.5)
+
     # Set y-axis ticks to match the range of sleep stages
-    plt.yticks(np.arange(min(min(majority), min(ai_psg), min(ai_hb)), 
-                         max(max(majority), max(ai_psg), max(ai_hb)) + 1, 1))
-    
-    plt.tight_layout()
-    plt.show()
+    ax.set_yticks(np.arange(min(min(majority), min(ai_psg), min(ai_hb)),
+                            max(max(majority), max(ai_psg), max(ai_hb)) + 1, 1))
+
+    fig.tight_layout()
+
+
+def cached_sleep_stages(headband_file, psg_file, cache_dir, colormap='viridis', title=None, render_mode='png',
+                        dpi=100, max_bytes=DEFAULT_CACHE_BYTES):
+    """
+    Returns the rendered sleep stage figure of one night from the figure cache, drawing it only on a miss.
+
+    The cache key is made of the fingerprints (size and modification time) of both files and the plot
+    options, so a cache hit neither parses the files nor uses matplotlib.
+
+    Parameters:
+    - headband_file (str): Path to the headband event file.
+    - psg_file (str): Path to the PSG event file.
+    - cache_dir (str): Folder of the figure cache.
+    - colormap (str, optional): The colormap to use for the scatter plot. Default is 'viridis'.
+    - title (str, optional): Title for the first panel. Default is None.
+    - render_mode (str, optional): Image format, one of figure_cache.RENDER_MODES. Default is 'png'.
+    - dpi (int, optional): Resolution of raster images. Default is 100.
+    - max_bytes (int, optional): Size limit of the cache; least recently used figures are evicted above it.
+
+    Returns:
+    - str or None: Path of the cached image, or None if the night cannot be read.
+    """
+    key = figure_cache_key([psg_file, headband_file], colormap=colormap, title=title,
+                           render_mode=render_mode, dpi=dpi)
+    cached_path = load_cached_figure(cache_dir, key, render_mode)
+    if cached_path is not None:
+        return cached_path
+
+    epochs = read_night_epochs(headband_file, psg_file)
+    if epochs is None or len(epochs['onset']) == 0:
+        logging.warning(f"No valid data found in {psg_file}. Skipping plot.")
+        return None
+
+    # A Figure that is not registered with pyplot, so nothing is shown and it is freed right away
+    fig = Figure(figsize=(14, 7))
+    subject_id = os.path.basename(psg_file).split("_")[0]
+    draw_sleep_stages(fig, epochs['onset'], epochs['majority'], epochs['ai_psg'], epochs['ai_hb'],
+                      subject_id, colormap=colormap, title=title)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=render_mode, dpi=dpi)
+    return store_figure(cache_dir, key, buffer.getvalue(), render_mode, max_bytes)
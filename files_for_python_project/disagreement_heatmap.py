@@ -0,0 +1,258 @@
+import io
+import logging
+import os
+import shutil
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.streaming_pipeline import EPOCH_SECONDS
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION
+from files_for_python_project.figure_cache import (
+    DEFAULT_CACHE_BYTES,
+    figure_cache_key,
+    load_cached_figure,
+    store_figure,
+)
+
+# Status of every epoch in the night x time matrix
+NOT_RECORDED = -1   # after the end of a shorter night
+AGREE = 0
+DISAGREE = 1
+ARTIFACT = 2        # the AI has no data
+DISCONNECTED = 3    # PSG disconnection in the expert scoring
+
+# Views of the heatmap: the status counted in every cell, and the statuses it is counted among
+HEATMAP_VIEWS = {
+    "agreement": (DISAGREE, (AGREE, DISAGREE)),
+    "artifact": (ARTIFACT, (AGREE, DISAGREE, ARTIFACT, DISCONNECTED)),
+}
+
+# Colors of the figure
+HEATMAP_COLORMAP = "RdYlGn_r"
+MISSING_COLOR = "lightgrey"
+
+
+# Function to classify every epoch of a night
+def epoch_status(majority, ai):
+    """
+    Gives every epoch of a night one status: AGREE, DISAGREE, ARTIFACT or DISCONNECTED.
+
+    Parameters:
+    majority (numpy.ndarray): Expert majority stage of every epoch.
+    ai (numpy.ndarray): AI stage of every epoch.
+
+    Returns:
+    numpy.ndarray: int8 status of every epoch.
+    """
+    status = np.where(majority == ai, AGREE, DISAGREE).astype(np.int8)
+    status[ai == NO_DATA_COLLECTED] = ARTIFACT
+    status[majority == PSG_DISCONNECTION] = DISCONNECTED
+    return status
+
+
+# Function to stack the epoch status of every night into one matrix
+def build_status_matrix(headband_files, psg_files, source="ai_hb", scheme=None):
+    """
+    Reads every night once and stacks its epoch status into a night x epoch matrix aligned on the recording start.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    source (str): AI compared with the experts, 'ai_hb' or 'ai_psg'. Default is 'ai_hb'.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    tuple: (matrix, night_ids, files) where matrix is an int8 array with NOT_RECORDED after the end
+           of shorter nights, and files lists the (headband_file, psg_file) pair of every row.
+    """
+    if source not in ("ai_hb", "ai_psg"):
+        raise ValueError(f"Unknown source '{source}'. Use 'ai_hb' or 'ai_psg'.")
+
+    statuses, night_ids, files = [], [], []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        night = load_night_stages(headband_file, psg_file, scheme)
+        if night is None:
+            continue
+        majority, ai_psg, ai_hb = night
+        statuses.append(epoch_status(majority, ai_hb if source == "ai_hb" else ai_psg))
+        night_ids.append(os.path.basename(psg_file).split("_")[0])
+        files.append((headband_file, psg_file))
+
+    lengths = np.array([len(status) for status in statuses], dtype=np.int64)
+    matrix = np.full((len(statuses), lengths.max(initial=0)), NOT_RECORDED, dtype=np.int8)
+    # Scatter all nights into the padded matrix at once
+    rows = np.repeat(np.arange(len(statuses)), lengths)
+    columns = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    if len(statuses):
+        matrix[rows, columns] = np.concatenate(statuses)
+    return matrix, night_ids, files
+
+
+# Function to turn the status matrix into the values shown in the heatmap
+def bin_status_matrix(matrix, view="agreement", bin_epochs=1):
+    """
+    Computes, for every night and time bin, the fraction of epochs with the status of the view.
+
+    'agreement' shows the fraction of disagreeing epochs among the compared ones, 'artifact' the
+    fraction of epochs without AI data among the recorded ones. Cells without such epochs are NaN.
+
+    Parameters:
+    matrix (numpy.ndarray): Matrix created by build_status_matrix.
+    view (str): 'agreement' or 'artifact'. Default is 'agreement'.
+    bin_epochs (int): Epochs per time bin (1 keeps every epoch). Default is 1.
+
+    Returns:
+    numpy.ndarray: float matrix of shape nights x bins.
+    """
+    if view not in HEATMAP_VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Use one of: {', '.join(HEATMAP_VIEWS)}.")
+    counted, among = HEATMAP_VIEWS[view]
+
+    # Pad the time axis to a whole number of bins, then sum every bin with one reshape
+    n_nights, n_epochs = matrix.shape
+    n_bins = -(-n_epochs // bin_epochs)
+    padded = np.full((n_nights, n_bins * bin_epochs), NOT_RECORDED, dtype=np.int8)
+    padded[:, :n_epochs] = matrix
+    padded = padded.reshape(n_nights, n_bins, bin_epochs)
+
+    numerator = (padded == counted).sum(axis=2)
+    denominator = np.isin(padded, among).sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+# Function to order the nights of the heatmap
+def night_order(matrix, view="agreement", sort_by=None):
+    """
+    Returns the row order of the heatmap.
+
+    Parameters:
+    matrix (numpy.ndarray): Matrix created by build_status_matrix.
+    view (str): 'agreement' or 'artifact'. Default is 'agreement'.
+    sort_by (str, optional): None to keep the input order, or 'score' to put the nights with the
+                             highest fraction (most disagreement or most artifacts) first. Default is None.
+
+    Returns:
+    numpy.ndarray: Row indices in display order.
+    """
+    if sort_by is None:
+        return np.arange(len(matrix))
+    if sort_by != "score":
+        raise ValueError(f"Unknown sort order '{sort_by}'. Use None or 'score'.")
+    night_fraction = bin_status_matrix(matrix, view, bin_epochs=max(matrix.shape[1], 1))[:, 0]
+    # Stable sort, worst night first, nights without any compared epoch last
+    return np.argsort(-np.nan_to_num(night_fraction, nan=-1.0), kind="stable")
+
+
+# Function to draw the heatmap of some nights
+def draw_disagreement_heatmap(fig, values, night_ids, bin_epochs=1, view="agreement", title=None,
+                              colormap=HEATMAP_COLORMAP):
+    """
+    Draws a night x time heatmap with a single imshow call.
+
+    Parameters:
+    fig (matplotlib.figure.Figure): The figure to draw on.
+    values (numpy.ndarray): Matrix created by bin_status_matrix.
+    night_ids (list): Label of every row.
+    bin_epochs (int): Epochs per column, used to label the time axis in hours. Default is 1.
+    view (str): 'agreement' or 'artifact', used in the labels. Default is 'agreement'.
+    title (str, optional): Title of the figure. Default is None.
+    colormap (str): Colormap of the fractions. Default is HEATMAP_COLORMAP.
+
+    Returns:
+    None
+    """
+    cmap = colormaps[colormap].with_extremes(bad=MISSING_COLOR)
+    hours = values.shape[1] * bin_epochs * EPOCH_SECONDS / 3600
+
+    ax = fig.add_subplot(1, 1, 1)
+    image = ax.imshow(np.ma.masked_invalid(values), aspect="auto", interpolation="nearest", cmap=cmap,
+                      vmin=0, vmax=1, extent=(0, hours, len(values), 0))
+    ax.set_xlabel("Time since recording start (hours)", fontsize=12)
+    ax.set_ylabel("Night", fontsize=12)
+    if len(night_ids) <= 60:
+        ax.set_yticks(np.arange(len(night_ids)) + 0.5)
+        ax.set_yticklabels(night_ids, fontsize=7)
+    label = "Fraction of epochs where AI and experts disagree" if view == "agreement" else \
+        "Fraction of epochs without AI data"
+    fig.colorbar(image, ax=ax, label=label)
+    ax.set_title(title or f"{label} ({len(night_ids)} nights)", fontsize=14)
+    fig.tight_layout()
+
+
+# Function to render one tile of the heatmap to PNG bytes
+def _render_tile(values, night_ids, bin_epochs, view, title, colormap, dpi):
+    height = min(4 + 0.12 * len(night_ids), 40)
+    fig = Figure(figsize=(14, height))
+    draw_disagreement_heatmap(fig, values, night_ids, bin_epochs, view, title, colormap)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi)
+    return buffer.getvalue()
+
+
+# Function to render the dataset-wide heatmap
+def render_disagreement_heatmap(headband_files, psg_files, output_path, source="ai_hb", view="agreement",
+                                bin_epochs=1, sort_by=None, rows_per_tile=None, cache_dir=None, scheme=None,
+                                colormap=HEATMAP_COLORMAP, dpi=100, max_bytes=DEFAULT_CACHE_BYTES):
+    """
+    Renders the epoch-level agreement (or artifact) status of every night as one PNG heatmap.
+
+    All nights are read once into a night x time matrix and every tile is drawn with one imshow.
+    With rows_per_tile, the nights are split into tiles of that many rows that share the same time
+    axis and color scale. With a cache_dir, every tile is kept in the figure cache, keyed by its
+    nights' file fingerprints and the options, so only tiles whose nights changed are drawn again.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    output_path (str): Path of the PNG file; tiles are written next to it as '<name>.tile-NNNN.png'.
+    source (str): AI compared with the experts, 'ai_hb' or 'ai_psg'. Default is 'ai_hb'.
+    view (str): 'agreement' or 'artifact'. Default is 'agreement'.
+    bin_epochs (int): Epochs per time bin, e.g. 10 for 5-minute bins. Default is 1.
+    sort_by (str, optional): None (input order) or 'score' (worst nights first). Default is None.
+    rows_per_tile (int, optional): Nights per tile. Default is None (one image).
+    cache_dir (str, optional): Folder of the figure cache. Default is None.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+    colormap (str): Colormap of the fractions. Default is HEATMAP_COLORMAP.
+    dpi (int): Resolution of the PNG files. Default is 100.
+    max_bytes (int): Size limit of the figure cache. Default is DEFAULT_CACHE_BYTES.
+
+    Returns:
+    list: Paths of the written PNG files, in row order.
+    """
+    matrix, night_ids, files = build_status_matrix(headband_files, psg_files, source, scheme)
+    order = night_order(matrix, view, sort_by)
+    values = bin_status_matrix(matrix, view, bin_epochs)[order]
+    night_ids = [night_ids[index] for index in order]
+    files = [files[index] for index in order]
+
+    rows_per_tile = rows_per_tile or max(len(order), 1)
+    starts = range(0, max(len(order), 1), rows_per_tile)
+    base, extension = os.path.splitext(output_path)
+    paths = [output_path] if len(starts) == 1 else \
+        [f"{base}.tile-{index:04d}{extension or '.png'}" for index in range(len(starts))]
+
+    for path, start in zip(paths, starts):
+        rows = slice(start, start + rows_per_tile)
+        title = None if len(paths) == 1 else f"Nights {start + 1}-{start + len(night_ids[rows])} of {len(night_ids)}"
+
+        if cache_dir is None:
+            data = _render_tile(values[rows], night_ids[rows], bin_epochs, view, title, colormap, dpi)
+            with open(path, "wb") as image_file:
+                image_file.write(data)
+            continue
+
+        # The tile's nights, their position and the shared time axis all change the image
+        tile_files = [file for pair in files[rows] for file in pair]
+        key = figure_cache_key(tile_files, kind="disagreement_heatmap", source=source, view=view,
+                               bin_epochs=bin_epochs, sort_by=sort_by, title=title, columns=values.shape[1],
+                               scheme=scheme, colormap=colormap, dpi=dpi)
+        cached_path = load_cached_figure(cache_dir, key)
+        if cached_path is None:
+            data = _render_tile(values[rows], night_ids[rows], bin_epochs, view, title, colormap, dpi)
+            cached_path = store_figure(cache_dir, key, data, max_bytes=max_bytes)
+        shutil.copyfile(cached_path, path)
+
+    logging.info(f"Rendered the heatmap of {len(night_ids)} nights to {len(paths)} image(s).")
+    return paths
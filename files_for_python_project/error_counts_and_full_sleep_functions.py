@@ -1,8 +1,6 @@
 import pandas as pd
 import logging
-
-# Set up logging configuration to capture error and info messages with timestamps
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED
 
 # Function to calculate the total hours of missing data (artifacts)
 def error_hours_count(headband_file):
@@ -24,8 +22,8 @@ def error_hours_count(headband_file):
         logging.error("Missing 'ai_hb' column in the file")
         return 0
 
-    # Identify rows with missing data (artifacts) represented by -2 in the 'ai_hb' column
-    headband_file = headband_file['ai_hb'] == -2
+    # Identify rows with missing data (artifacts) represented by NO_DATA_COLLECTED (-2) in the 'ai_hb' column
+    headband_file = headband_file['ai_hb'] == NO_DATA_COLLECTED
     
     # Sum the number of artifacts, multiply by 30 (assuming 30 seconds per data point),
     # and convert from seconds to hours (3600 seconds in an hour)
@@ -0,0 +1,180 @@
+import numpy as np
+import pandas as pd
+import os
+from numpy.lib.stride_tricks import sliding_window_view
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.streaming_pipeline import EPOCH_SECONDS, MAX_ERROR_PERCENTAGE
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION, scheme_stages, stage_label, stage_positions
+
+# Default number of epochs in a pattern: the disagreeing epoch and one epoch on either side
+DEFAULT_LENGTH = 3
+
+
+# Function to encode the (expert, AI) stage pair of every epoch as one integer
+def pair_codes(majority, ai, stages):
+    """
+    Encodes every epoch's (expert stage, AI stage) pair as expert_position * K + ai_position.
+
+    Parameters:
+    majority (numpy.ndarray): Expert majority stage of every epoch.
+    ai (numpy.ndarray): AI stage of every epoch.
+    stages (numpy.ndarray): Sorted stage codes of the scheme (K of them).
+
+    Returns:
+    numpy.ndarray: Pair code in [0, K * K), or -1 for epochs with a stage outside of the scheme
+                   (PSG disconnections, missing AI data).
+    """
+    expert_positions = stage_positions(majority, stages)
+    ai_positions = stage_positions(ai, stages)
+    valid = (expert_positions >= 0) & (ai_positions >= 0)
+    return np.where(valid, expert_positions * len(stages) + ai_positions, -1)
+
+
+# Function to build the n-gram key of the window around every disagreement
+def error_window_keys(codes, errors, night_of_epoch, n_pairs, length=DEFAULT_LENGTH):
+    """
+    Encodes the pair codes of the window around every disagreeing epoch as one integer key.
+
+    The window of an error at epoch i covers epochs i - length // 2 up to i - length // 2 + length - 1.
+    Windows that cross into another night or contain an epoch without a pair code are dropped.
+
+    Parameters:
+    codes (numpy.ndarray): Pair codes of all epochs of all nights (see pair_codes).
+    errors (numpy.ndarray): Whether the AI disagrees with the experts at every epoch.
+    night_of_epoch (numpy.ndarray): Night index of every epoch.
+    n_pairs (int): Number of possible pair codes (K * K).
+    length (int): Number of epochs in a window. Default is DEFAULT_LENGTH.
+
+    Returns:
+    tuple: (keys, epochs) with the key of every kept window and the position of its disagreeing epoch.
+    """
+    if length < 1:
+        raise ValueError(f"A pattern needs at least one epoch, got length={length}.")
+    if n_pairs ** length >= np.iinfo(np.int64).max:
+        raise ValueError(f"Windows of {length} epochs do not fit in a 64-bit key with {n_pairs} stage pairs.")
+    half = length // 2
+    if len(codes) < length:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Row s holds the window that starts at epoch s, whose error sits at s + half
+    windows = sliding_window_view(codes, length)
+    window_nights = sliding_window_view(night_of_epoch, length)
+    valid = (windows >= 0).all(axis=1) & (window_nights == window_nights[:, :1]).all(axis=1)
+    valid &= errors[half:len(codes) - length + 1 + half]
+
+    starts = np.flatnonzero(valid)
+    weights = n_pairs ** np.arange(length - 1, -1, -1, dtype=np.int64)
+    return windows[starts].astype(np.int64) @ weights, starts + half
+
+
+# Function to turn a key back into its expert and AI stage sequences
+def decode_pattern(key, stages, length=DEFAULT_LENGTH):
+    """
+    Decodes a key made by error_window_keys.
+
+    Parameters:
+    key (int): The pattern key.
+    stages (numpy.ndarray): Sorted stage codes of the scheme.
+    length (int): Number of epochs in a window. Default is DEFAULT_LENGTH.
+
+    Returns:
+    tuple: (expert_stages, ai_stages), two arrays of stage codes.
+    """
+    n_stages = len(stages)
+    n_pairs = n_stages * n_stages
+    digits = (key // n_pairs ** np.arange(length - 1, -1, -1, dtype=np.int64)) % n_pairs
+    return stages[digits // n_stages], stages[digits % n_stages]
+
+
+# Function to find the confusion patterns the AI repeats most often
+def mine_error_patterns(headband_files, psg_files, source="ai_hb", length=DEFAULT_LENGTH, top=20, max_examples=3,
+                        scheme=None):
+    """
+    Finds the most frequent (expert, AI) stage sequences around the epochs where the AI disagrees with the experts.
+
+    All nights are concatenated, every window becomes one integer key, and the keys are counted with
+    np.unique; the nights per pattern are counted with np.bincount. Like headband_vs_majority, headband
+    nights with too much missing data are left out.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    source (str): AI compared with the experts, 'ai_hb' or 'ai_psg'. Default is 'ai_hb'.
+    length (int): Number of epochs in a pattern. Default is DEFAULT_LENGTH.
+    top (int): Number of patterns to return. Default is 20.
+    max_examples (int): Number of example locations per pattern. Default is 3.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    pandas.DataFrame: One row per pattern, most frequent first, with the 'expert' and 'ai' stage
+                      sequences, 'occurrences', 'nights' (number of nights it occurs in), 'share'
+                      (percentage of all error windows), the first 'example_night' and 'example_onset'
+                      (seconds since the recording start of the disagreeing epoch) and 'locations'
+                      (up to max_examples (night, onset) pairs).
+    """
+    if source not in ("ai_hb", "ai_psg"):
+        raise ValueError(f"Unknown source '{source}'. Use 'ai_hb' or 'ai_psg'.")
+    if length < 1:
+        raise ValueError(f"A pattern needs at least one epoch, got length={length}.")
+
+    night_ids, majorities, ais = [], [], []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        night = load_night_stages(headband_file, psg_file, scheme)
+        if night is None:
+            continue
+        majority, ai_psg, ai_hb = night
+        ai = ai_hb if source == "ai_hb" else ai_psg
+        expert_valid = majority != PSG_DISCONNECTION
+        if source == "ai_hb" and expert_valid.any() and \
+                (ai[expert_valid] == NO_DATA_COLLECTED).mean() * 100 >= MAX_ERROR_PERCENTAGE:
+            continue
+        night_ids.append(os.path.basename(psg_file).split("_")[0])
+        majorities.append(majority)
+        ais.append(ai)
+
+    columns = ["expert", "ai", "occurrences", "nights", "share", "example_night", "example_onset", "locations"]
+    if not night_ids:
+        return pd.DataFrame(columns=columns)
+
+    stages = scheme_stages(scheme)
+    n_pairs = len(stages) * len(stages)
+    lengths = np.array([len(majority) for majority in majorities], dtype=np.int64)
+    night_of_epoch = np.repeat(np.arange(len(night_ids)), lengths)
+    epoch_in_night = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    majority = np.concatenate(majorities)
+    ai = np.concatenate(ais)
+    codes = pair_codes(majority, ai, stages)
+    keys, error_epochs = error_window_keys(codes, (codes >= 0) & (majority != ai), night_of_epoch, n_pairs, length)
+    if len(keys) == 0:
+        return pd.DataFrame(columns=columns)
+
+    patterns, pattern_of_window, occurrences = np.unique(keys, return_inverse=True, return_counts=True)
+    window_nights = night_of_epoch[error_epochs]
+    # Distinct (pattern, night) combinations, counted per pattern
+    pattern_nights = np.unique(pattern_of_window * len(night_ids) + window_nights) // len(night_ids)
+    nights_per_pattern = np.bincount(pattern_nights, minlength=len(patterns))
+
+    # Most frequent first; equally frequent patterns in key order
+    ranked = np.lexsort((patterns, -occurrences))[:top]
+    # Windows grouped per pattern, in dataset order within every group
+    windows_by_pattern = np.argsort(pattern_of_window, kind="stable")
+    group_starts = np.cumsum(occurrences) - occurrences
+
+    rows = []
+    for pattern in ranked:
+        expert_stages, ai_stages = decode_pattern(patterns[pattern], stages, length)
+        examples = windows_by_pattern[group_starts[pattern]:group_starts[pattern] + max_examples]
+        locations = [(night_ids[window_nights[window]], int(epoch_in_night[error_epochs[window]]) * EPOCH_SECONDS)
+                     for window in examples]
+        rows.append({
+            "expert": " > ".join(stage_label(code, scheme) for code in expert_stages),
+            "ai": " > ".join(stage_label(code, scheme) for code in ai_stages),
+            "occurrences": int(occurrences[pattern]),
+            "nights": int(nights_per_pattern[pattern]),
+            "share": occurrences[pattern] / len(keys) * 100,
+            "example_night": locations[0][0],
+            "example_onset": locations[0][1],
+            "locations": locations,
+        })
+    return pd.DataFrame(rows, columns=columns)
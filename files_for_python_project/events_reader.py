@@ -0,0 +1,183 @@
+import io
+import logging
+import numpy as np
+
+# Types of the timing columns of the events files; every other (stage) column is read as int8
+TIMING_DTYPES = {
+    "onset": np.int32,
+    "duration": np.int32,
+    "begsample": np.int32,
+    "endsample": np.int32,
+    "offset": np.int32,
+}
+STAGE_DTYPE = np.int8
+
+# Column positions of every header seen so far, so each layout is parsed and checked only once
+_HEADER_LAYOUTS = {}
+
+
+# Function to get the type a column is read as
+def column_dtype(column):
+    """
+    Returns the NumPy type an events column is read as: int32 for timing columns, int8 for stage columns.
+
+    Parameters:
+    column (str): Column name.
+
+    Returns:
+    numpy.dtype: The column type.
+    """
+    return np.dtype(TIMING_DTYPES.get(column, STAGE_DTYPE))
+
+
+# Function to find the positions of the requested columns in a header line
+def column_positions(header, columns, path):
+    """
+    Validates the header line of an events file and returns the positions of the requested columns.
+
+    Identical headers are only parsed once; the dataset's files all share one or two layouts.
+
+    Parameters:
+    header (str): The first line of the file, without the line break.
+    columns (sequence): Names of the requested columns.
+    path (str): Path of the file (for error messages).
+
+    Returns:
+    list: Position of every requested column.
+    """
+    layout = _HEADER_LAYOUTS.get(header)
+    if layout is None:
+        names = header.split("\t")
+        if len(set(names)) != len(names) or "" in names:
+            raise ValueError(f"Invalid header in {path}: {names}")
+        layout = {name: position for position, name in enumerate(names)}
+        _HEADER_LAYOUTS[header] = layout
+
+    missing = [column for column in columns if column not in layout]
+    if missing:
+        raise ValueError(f"Missing columns {', '.join(missing)} in {path}.")
+    return [layout[column] for column in columns]
+
+
+# Function to read the header and the body of an events file
+def _read_events_text(path):
+    with open(path, "r", newline=None) as events_file:
+        text = events_file.read()
+    header, _, body = text.partition("\n")
+    if not header.strip():
+        raise ValueError(f"{path} is empty.")
+    return header, body
+
+
+# Function to convert the requested columns of tab-separated integer rows
+def _parse_rows(body, positions, path):
+    if not body.strip():
+        return np.zeros((0, len(positions)), dtype=np.int32)
+    try:
+        # The C parser of loadtxt only converts the requested columns
+        values = np.loadtxt(io.StringIO(body), dtype=np.int32, delimiter="\t", usecols=positions, ndmin=2)
+    except ValueError as e:
+        raise ValueError(f"Cannot parse {path}: {e}")
+    return values
+
+
+# Function to narrow a parsed column to its type, refusing values that do not fit
+def _typed_column(values, column, path):
+    dtype = column_dtype(column)
+    limits = np.iinfo(dtype)
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        raise ValueError(f"Values of '{column}' in {path} do not fit in {dtype}.")
+    return values.astype(dtype)
+
+
+# Function to read some columns of one events file
+def read_event_columns(path, columns):
+    """
+    Reads only the requested columns of an events TSV into typed NumPy arrays, without pandas.
+
+    Timing columns are read as int32 and stage columns as int8 (see column_dtype).
+
+    Parameters:
+    path (str): Path to the events file.
+    columns (sequence): Names of the columns to read.
+
+    Returns:
+    dict: Column name -> array, all of the same length.
+    """
+    header, body = _read_events_text(path)
+    values = _parse_rows(body, column_positions(header, columns, path), path)
+    return {column: _typed_column(values[:, index], column, path) for index, column in enumerate(columns)}
+
+
+# Function to read the onset and stage columns of one night
+def read_night_epochs(headband_file, psg_file):
+    """
+    Reads the onset and stage columns of one night as typed arrays.
+
+    Parameters:
+    headband_file (str): Path to the headband event file (headband_events.tsv).
+    psg_file (str): Path to the PSG event file (psg_events.tsv).
+
+    Returns:
+    dict or None: 'onset' (int32) and 'majority', 'ai_psg', 'ai_hb' (int8) arrays of equal length,
+                  or None if the night cannot be read.
+    """
+    try:
+        psg = read_event_columns(psg_file, ["onset", "majority", "ai_psg"])
+        headband = read_event_columns(headband_file, ["ai_hb"])
+    except (OSError, ValueError) as e:
+        logging.error(f"Error reading files: {e}")
+        return None
+
+    if len(psg["onset"]) != len(headband["ai_hb"]):
+        logging.warning(f"Mismatch in epoch counts between {headband_file} and {psg_file}. Skipping night.")
+        return None
+
+    psg["ai_hb"] = headband["ai_hb"]
+    return psg
+
+
+# Function to read the same columns of many small events files in one go
+def read_events_bulk(paths, columns):
+    """
+    Reads the requested columns of many events files with one parse per header layout.
+
+    The rows of all files that share a header are joined and converted in one loadtxt call, which
+    removes most of the per-file overhead when ingesting a dataset of many small files.
+
+    Parameters:
+    paths (sequence): Paths to the events files.
+    columns (sequence): Names of the columns to read.
+
+    Returns:
+    tuple: (arrays, offsets) where arrays maps every column to the concatenation of that column over
+           all files (in the order of paths), and file i covers rows offsets[i]:offsets[i + 1].
+    """
+    groups = {}
+    lengths = np.zeros(len(paths), dtype=np.int64)
+    for index, path in enumerate(paths):
+        header, body = _read_events_text(path)
+        body = body.rstrip("\n")
+        if "\n\n" in body:
+            # Blank lines carry no epoch (loadtxt skips them as well)
+            body = "\n".join(row for row in body.split("\n") if row.strip())
+        lengths[index] = body.count("\n") + 1 if body else 0
+        group = groups.setdefault(header, {"positions": column_positions(header, columns, path),
+                                           "indices": [], "bodies": []})
+        group["indices"].append(index)
+        if body:
+            group["bodies"].append(body)
+
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    arrays = {column: np.empty(offsets[-1], dtype=column_dtype(column)) for column in columns}
+
+    for header, group in groups.items():
+        description = f"{len(group['indices'])} files with header {header!r}"
+        values = _parse_rows("\n".join(group["bodies"]), group["positions"], description)
+
+        # Rows of this group, in the order of paths, go to their place in the output
+        target = np.concatenate([np.arange(offsets[index], offsets[index + 1]) for index in group["indices"]])
+        for position, column in enumerate(columns):
+            arrays[column][target] = _typed_column(values[:, position], column, description)
+
+    return arrays, offsets
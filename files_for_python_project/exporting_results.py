@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import logging
+import os
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.events_reader import read_night_epochs
+from files_for_python_project.streaming_pipeline import summarize_stages, batched
+
+# pyarrow is optional: without it the results are exported as compressed NPZ files
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Column types of the exported tables
+NIGHT_DTYPES = {"night": np.int32, "subject": object, "n_epochs": np.int32, "hb_match": np.float64,
+                "psg_match": np.float64, "error_hours": np.float64, "total_hours": np.float64}
+EPOCH_DTYPES = {"night": np.int32, "onset": np.int32, "majority": np.int8, "ai_psg": np.int8, "ai_hb": np.int8}
+
+
+# Function to choose the export format
+def resolve_format(export_format):
+    """
+    Resolves the requested export format.
+
+    Parameters:
+    export_format (str): 'parquet', 'npz' or 'auto' (parquet when pyarrow is installed, otherwise npz).
+
+    Returns:
+    str: 'parquet' or 'npz'.
+    """
+    if export_format == "auto":
+        return "parquet" if pq is not None else "npz"
+    if export_format == "parquet" and pq is None:
+        raise ImportError("Exporting to Parquet requires the 'pyarrow' package.")
+    if export_format not in ("parquet", "npz"):
+        raise ValueError(f"Unknown export format '{export_format}', expected 'parquet', 'npz' or 'auto'.")
+    return export_format
+
+
+# Function to turn a batch of nights into typed columns
+def _batch_columns(batch, first_night, include_epochs):
+    """
+    Builds the per-night (and optionally per-epoch) columns of a batch of loaded nights.
+
+    Parameters:
+    batch (list): (subject, epochs) pairs, where epochs is a read_night_epochs dictionary.
+    first_night (int): Night number of the first night of the batch.
+    include_epochs (bool): Whether to build the per-epoch columns.
+
+    Returns:
+    tuple: (night_columns, epoch_columns) dictionaries of NumPy arrays (epoch_columns is None when not requested).
+    """
+    night_rows = []
+    for offset, (subject, epochs) in enumerate(batch):
+        summary = summarize_stages(epochs["majority"], epochs["ai_psg"], epochs["ai_hb"])
+        night_rows.append({"night": first_night + offset, "subject": subject,
+                           "n_epochs": len(epochs["onset"]), **summary})
+
+    night_frame = pd.DataFrame(night_rows, columns=list(NIGHT_DTYPES))
+    night_columns = {name: night_frame[name].to_numpy(dtype=dtype) for name, dtype in NIGHT_DTYPES.items()}
+
+    epoch_columns = None
+    if include_epochs:
+        lengths = [len(epochs["onset"]) for _, epochs in batch]
+        epoch_columns = {"night": np.repeat(np.arange(first_night, first_night + len(batch), dtype=np.int32), lengths)}
+        for name in ("onset", "majority", "ai_psg", "ai_hb"):
+            epoch_columns[name] = np.concatenate([epochs[name] for _, epochs in batch]).astype(EPOCH_DTYPES[name])
+
+    return night_columns, epoch_columns
+
+
+# Helper to concatenate the columns of several batches
+def _concatenate_columns(batches, dtypes):
+    """
+    Concatenates per-batch column dictionaries into one dictionary of typed arrays.
+
+    Parameters:
+    batches (list): Column dictionaries of every batch.
+    dtypes (dict): Column name -> NumPy dtype.
+
+    Returns:
+    dict: Column name -> concatenated array (NPZ stores the subject column as unicode strings).
+    """
+    columns = {}
+    for name, dtype in dtypes.items():
+        parts = [columns_of_batch[name] for columns_of_batch in batches]
+        column = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+        columns[name] = column.astype(str) if dtype is object else column.astype(dtype)
+    return columns
+
+
+# Function to export per-night and per-epoch results in a columnar format
+def export_results(base_folder, output_dir, export_format="auto", include_epochs=False, batch_size=256):
+    """
+    Exports a per-night summary table, and optionally an aligned per-epoch table, of the whole dataset.
+
+    The per-epoch table has the columns night, onset, majority, ai_psg and ai_hb, with int8 stage columns.
+    Parquet files are written one batch of nights at a time (one row group per batch); NPZ files are
+    written once at the end with np.savez_compressed.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+    output_dir (str): Folder the tables are written to (created if needed).
+    export_format (str): 'parquet', 'npz' or 'auto'. Default is 'auto'.
+    include_epochs (bool): Whether to also export the per-epoch table. Default is False.
+    batch_size (int): Nights loaded per batch. Default is 256.
+
+    Returns:
+    dict: Paths of the written tables, under the keys 'nights' and (optionally) 'epochs'.
+    """
+    export_format = resolve_format(export_format)
+    os.makedirs(output_dir, exist_ok=True)
+    extension = "parquet" if export_format == "parquet" else "npz"
+    paths = {"nights": os.path.join(output_dir, f"nights.{extension}")}
+    if include_epochs:
+        paths["epochs"] = os.path.join(output_dir, f"epochs.{extension}")
+
+    # Lazily load every night, keeping only the ones that can be read
+    def loaded_nights():
+        for headband_file, psg_file in iter_event_files(base_folder):
+            epochs = read_night_epochs(headband_file, psg_file)
+            if epochs is not None:
+                yield os.path.basename(psg_file).split("_")[0], epochs
+
+    writers = {}
+    collected = {"nights": [], "epochs": []}
+    n_nights = 0
+
+    try:
+        for batch in batched(loaded_nights(), batch_size):
+            night_columns, epoch_columns = _batch_columns(batch, n_nights, include_epochs)
+            n_nights += len(batch)
+
+            for key, columns in (("nights", night_columns), ("epochs", epoch_columns)):
+                if columns is None:
+                    continue
+                if export_format == "parquet":
+                    table = pa.table(columns)
+                    if key not in writers:
+                        writers[key] = pq.ParquetWriter(paths[key], table.schema, compression="zstd")
+                    writers[key].write_table(table)
+                else:
+                    collected[key].append(columns)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if export_format == "npz":
+        for key in paths:
+            columns = _concatenate_columns(collected[key], NIGHT_DTYPES if key == "nights" else EPOCH_DTYPES)
+            np.savez_compressed(paths[key], **columns)
+    elif n_nights == 0:
+        # No batch was written, so write empty tables with the expected columns
+        for key in paths:
+            dtypes = NIGHT_DTYPES if key == "nights" else EPOCH_DTYPES
+            columns = _concatenate_columns([], dtypes)
+            pq.write_table(pa.table(columns), paths[key])
+
+    logging.info(f"Exported {n_nights} nights to {output_dir} ({export_format}).")
+    return paths
+
+
+# Function to read an exported table back into a DataFrame
+def load_exported_table(path):
+    """
+    Reads a table written by export_results.
+
+    Parameters:
+    path (str): Path to a '.parquet' or '.npz' table.
+
+    Returns:
+    pandas.DataFrame: The table with its column types preserved.
+    """
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise ImportError("Reading Parquet files requires the 'pyarrow' package.")
+        return pq.read_table(path).to_pandas()
+
+    with np.load(path, allow_pickle=False) as data:
+        return pd.DataFrame({name: data[name] for name in data.files})
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+from files_for_python_project.results_database import file_fingerprint
+
+# Version of the cache key layout; bump it when the drawing code changes so old figures are not reused
+FIGURE_CACHE_VERSION = 1
+
+# Default size limit of the figure cache in bytes
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Render modes that can be cached, and the file extension of each
+RENDER_MODES = {"png": ".png", "svg": ".svg", "pdf": ".pdf"}
+
+
+# Function to build the cache key of a figure
+def figure_cache_key(input_files, **options):
+    """
+    Builds the cache key of a figure from the fingerprints of its input files and the plot options.
+
+    The files are fingerprinted by size and modification time only, so computing a key never reads them.
+
+    Parameters:
+    input_files (list): Paths to the files the figure is drawn from.
+    **options: Plot options that change the figure (e.g. colormap, title, render_mode).
+
+    Returns:
+    str: A hex key that changes whenever an input file or an option changes.
+    """
+    description = {
+        "version": FIGURE_CACHE_VERSION,
+        "files": [[os.path.abspath(path), *file_fingerprint(path)[:2]] for path in input_files],
+        "options": options,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# Function to get the path of a cache entry
+def figure_cache_path(cache_dir, key, render_mode="png"):
+    """
+    Returns the path of the cache entry of a key.
+
+    Parameters:
+    cache_dir (str): The cache folder.
+    key (str): Key created by figure_cache_key.
+    render_mode (str): One of RENDER_MODES. Default is 'png'.
+
+    Returns:
+    str: Path of the cached figure file.
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode '{render_mode}'. Use one of: {', '.join(RENDER_MODES)}.")
+    return os.path.join(cache_dir, key + RENDER_MODES[render_mode])
+
+
+# Function to look up a cached figure
+def load_cached_figure(cache_dir, key, render_mode="png"):
+    """
+    Looks up a figure in the cache and marks it as recently used.
+
+    Parameters:
+    cache_dir (str): The cache folder.
+    key (str): Key created by figure_cache_key.
+    render_mode (str): One of RENDER_MODES. Default is 'png'.
+
+    Returns:
+    str or None: Path of the cached figure, or None on a cache miss.
+    """
+    path = figure_cache_path(cache_dir, key, render_mode)
+    try:
+        # The modification time doubles as the last-use time of the LRU eviction
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+# Function to add a rendered figure to the cache
+def store_figure(cache_dir, key, data, render_mode="png", max_bytes=DEFAULT_CACHE_BYTES):
+    """
+    Writes a rendered figure into the cache and evicts the least recently used figures above max_bytes.
+
+    Parameters:
+    cache_dir (str): The cache folder (created if needed).
+    key (str): Key created by figure_cache_key.
+    data (bytes): The rendered figure.
+    render_mode (str): One of RENDER_MODES. Default is 'png'.
+    max_bytes (int): Size limit of the whole cache in bytes. Default is DEFAULT_CACHE_BYTES.
+
+    Returns:
+    str: Path of the cached figure.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = figure_cache_path(cache_dir, key, render_mode)
+
+    # Write to a temporary file first, so a concurrent reader never sees a half-written figure
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as figure_file:
+        figure_file.write(data)
+    os.replace(temporary_path, path)
+
+    evict_figures(cache_dir, max_bytes, keep=path)
+    return path
+
+
+# Function to keep the cache under its size limit
+def evict_figures(cache_dir, max_bytes=DEFAULT_CACHE_BYTES, keep=None):
+    """
+    Removes the least recently used figures until the cache holds at most max_bytes.
+
+    Parameters:
+    cache_dir (str): The cache folder.
+    max_bytes (int): Size limit of the whole cache in bytes. Default is DEFAULT_CACHE_BYTES.
+    keep (str, optional): Path of a figure that must not be evicted (the one just written). Default is None.
+
+    Returns:
+    int: Number of figures removed.
+    """
+    extensions = tuple(RENDER_MODES.values())
+    entries = []
+    with os.scandir(cache_dir) as scanner:
+        for entry in scanner:
+            if entry.is_file() and entry.name.endswith(extensions):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    if removed:
+        logging.info(f"Evicted {removed} figures from the cache in {cache_dir}.")
+    return removed
@@ -1,8 +1,57 @@
 import logging
 import os
 
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Generator that yields event file pairs one subject folder at a time
+def iter_event_files(base_folder):
+    """
+    Lazily yields pairs of headband and PSG event files within the given directory structure.
+
+    Subject folders are scanned one at a time, so memory use does not grow with the size of the dataset.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+
+    Yields:
+    tuple: (headband_file, psg_file) for every subject folder with a complete pair.
+    """
+    # Check if base_folder exists and is a valid directory
+    if not os.path.isdir(base_folder):
+        logging.error(f"'{base_folder}' is not a valid directory.")
+        return
+
+    # Iterate through each subfolder in the base folder
+    with os.scandir(base_folder) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            eeg_folder_path = os.path.join(entry.path, "eeg")
+            if not os.path.isdir(eeg_folder_path):
+                continue
+
+            headband_file, psg_file = None, None
+
+            # Loop through files in "eeg" folder
+            for file_entry in os.scandir(eeg_folder_path):
+                if file_entry.is_file():
+                    # Identify headband and PSG event files
+                    if file_entry.name.endswith("headband_events.tsv"):
+                        headband_file = file_entry.path
+                    elif file_entry.name.endswith("psg_events.tsv"):
+                        psg_file = file_entry.path
+
+            # Only yield files if BOTH headband and PSG are found (complete pair)
+            if headband_file and psg_file:
+                yield headband_file, psg_file
+            elif headband_file:
+                # Log missing PSG file for this headband entry
+                logging.warning(f"Missing PSG file for {headband_file}. Skipping.")
+            elif psg_file:
+                # Log missing headband file for this PSG entry
+                logging.warning(f"Missing headband file for {psg_file}. Skipping.")
+            else:
+                # Log missing files (both headband and PSG)
+                logging.warning(f"No valid event files in {eeg_folder_path}. Skipping.")
+
 
 # Function to find event files within the provided base folder
 def find_event_files(base_folder):
@@ -18,40 +67,8 @@ def find_event_files(base_folder):
     headband_files = []
     psg_files = []
 
-    # Check if base_folder exists and is a valid directory
-    if not os.path.isdir(base_folder):
-        logging.error(f"'{base_folder}' is not a valid directory.")
-        return headband_files, psg_files
-
-    # Iterate through each subfolder in the base folder
-    for entry in os.scandir(base_folder):
-        if entry.is_dir():
-            eeg_folder_path = os.path.join(entry.path, "eeg")
+    for headband_file, psg_file in iter_event_files(base_folder):
+        headband_files.append(headband_file)
+        psg_files.append(psg_file)
 
-            if os.path.isdir(eeg_folder_path):
-                headband_file, psg_file = None, None
-
-                # Loop through files in "eeg" folder
-                for file_entry in os.scandir(eeg_folder_path):
-                    if file_entry.is_file():
-                        # Identify headband and PSG event files
-                        if file_entry.name.endswith("headband_events.tsv"):
-                            headband_file = file_entry.path
-                        elif file_entry.name.endswith("psg_events.tsv"):
-                            psg_file = file_entry.path
-
-                # Only add files if BOTH headband and PSG are found (complete pair)
-                if headband_file and psg_file:
-                    headband_files.append(headband_file)
-                    psg_files.append(psg_file)
-                elif headband_file:
-                    # Log missing PSG file for this headband entry
-                    logging.warning(f"Missing PSG file for {headband_file}. Skipping.")
-                elif psg_file:
-                    # Log missing headband file for this PSG entry
-                    logging.warning(f"Missing headband file for {psg_file}. Skipping.")
-                else:
-                    # Log missing files (both headband and PSG)
-                    logging.warning(f"No valid event files in {eeg_folder_path}. Skipping.")
-                
     return headband_files, psg_files
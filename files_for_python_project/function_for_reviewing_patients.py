@@ -2,9 +2,8 @@ import re
 import os
 import logging
 from files_for_python_project.creating_plots import plot_sleep_stages
+from files_for_python_project.results_database import suggest_subjects
 
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def get_matching_file(subject_id_input, file_list):
     """
@@ -28,14 +27,26 @@ def get_matching_file(subject_id_input, file_list):
             
     return None
 
-def review_subjects(headband_files, psg_files):
+def review_subjects(headband_files, psg_files, database=None, filters=None, cache_dir=None):
     """
     Allows the user to review subjects by entering a subject number.
 
     Parameters:
     headband_files (list): A list of paths to the headband event files.
     psg_files (list): A list of paths to the PSG event files.
+    database (str, optional): Path to a results database (see results_database) used to suggest subjects.
+    filters (dict, optional): query_nights filters, e.g. {'max_hb_match': 60}. When given together with
+                              a database, only the matching subjects can be reviewed.
+    cache_dir (str, optional): Folder of a figure cache, so subjects reviewed again are shown without redrawing.
     """
+    # Suggest (and optionally restrict to) the subjects matching the filters
+    allowed_subjects = None
+    if database is not None:
+        suggested = suggest_subjects(database, **(filters or {}))
+        logging.info(f"Suggested subjects: {', '.join(suggested) if suggested else 'none'}")
+        if filters:
+            allowed_subjects = set(suggested)
+
     while True:
         # Allow the user to input a subject number
         while True:
@@ -48,6 +59,10 @@ def review_subjects(headband_files, psg_files):
             
             logging.info(f"Looking for subject number: '{subject_id_input}'")
 
+            if allowed_subjects is not None and subject_id_input not in allowed_subjects:
+                logging.warning("This subject does not match the filters, please enter one of the suggested subjects.")
+                continue
+
 
             matching_headband_file = get_matching_file(subject_id_input, headband_files)
             matching_psg_file = get_matching_file(subject_id_input, psg_files)
@@ -56,11 +71,12 @@ def review_subjects(headband_files, psg_files):
             if matching_headband_file and matching_psg_file:
                 # If both files are found, plot the sleep stages
                 logging.info(f"Found matching files for subject {subject_id_input}. Displaying plots...")
-                logging.debug("Calling plot_sleep_stages with:", psg_files, headband_files)
+                logging.debug("Calling plot_sleep_stages with: %s %s", psg_files, headband_files)
 
                 try:
                     print("Attempting to call plot_sleep_stages...")  # Debugging statement
-                    plot_sleep_stages([matching_psg_file], [matching_headband_file])
+                    plot_options = {"cache_dir": cache_dir} if cache_dir is not None else {}
+                    plot_sleep_stages([matching_psg_file], [matching_headband_file], **plot_options)
                     print("Successfully called plot_sleep_stages")  # This should appear if it runs
                 except Exception as e:
                     print(f"Error calling plot_sleep_stages: {e}")  # Catches and logs the exception
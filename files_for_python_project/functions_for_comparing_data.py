@@ -1,23 +1,23 @@
 import pandas as pd
 import logging
 import os
-
-# Set up logging configuration
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION, remap_stages
+from files_for_python_project.events_reader import read_event_columns
 
 # Function to compare headband AI scoring with the majority expert scoring
-def headband_vs_majority(headband_file, psg_file):
+def headband_vs_majority(headband_file, psg_file, scheme=None):
     """
     Compares headband AI scoring to the majority expert scoring.
 
     Parameters:
     headband_file (str): Path to the headband AI scoring file (headband_events.tsv).
     psg_file (str): Path to the expert majority scoring file (psg_events.tsv).
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
 
     Returns:
     float or None: Percentage of agreement between AI and majority, or None if the error rate is too high.
     """
-    logging.info("Comparing headband AI scoring with PSG expert scoring...")
+    logging.debug("Comparing headband AI scoring with PSG expert scoring of %s", psg_file)
 
     try:
         ai_df = pd.read_csv(headband_file, sep="\t")
@@ -26,12 +26,8 @@ def headband_vs_majority(headband_file, psg_file):
         logging.error(f"Error reading files: {e}")
         return None
 
-    # Constants
-    NO_DATA_COLLECTED = -2
-    AWAKE_STAGE = 8
-
-    # Filter out awake stage before processing
-    mask = experts_df["majority"] != AWAKE_STAGE
+    # Filter out PSG disconnections before processing
+    mask = experts_df["majority"] != PSG_DISCONNECTION
     ai_df = ai_df.loc[mask].reset_index(drop=True)
     experts_df = experts_df.loc[mask].reset_index(drop=True)
 
@@ -46,7 +42,7 @@ def headband_vs_majority(headband_file, psg_file):
     error_percentage = (error_mask.sum() / len(ai_df)) * 100
 
     if error_percentage >= 40:
-        logging.warning(f"Error rate is too high ({error_percentage:.2f}%), skipping comparison.")
+        logging.debug("Error rate is too high for %s (%.2f%%), skipping comparison.", file_id, error_percentage)
         return None
 
     # Filter out erroneous AI readings
@@ -59,25 +55,32 @@ def headband_vs_majority(headband_file, psg_file):
         logging.warning("Mismatch in filtered DataFrame lengths. Skipping comparison.")
         return None
 
-    # Compute percentage match
-    match_percentage = (ai_df["ai_hb"] == experts_df["majority"]).mean() * 100
+    # Compute percentage match (in the requested stage encoding)
+    try:
+        ai_stages = remap_stages(ai_df["ai_hb"].to_numpy(), scheme)
+        expert_stages = remap_stages(experts_df["majority"].to_numpy(), scheme)
+    except ValueError as e:
+        logging.warning("%s Skipping comparison.", e)
+        return None
+    match_percentage = (ai_stages == expert_stages).mean() * 100
 
-    logging.info(f"Comparison completed. Percentage match for patient {file_id}: {match_percentage:.2f}%")
+    logging.debug("Comparison completed. Percentage match for patient %s: %.2f%%", file_id, match_percentage)
     return match_percentage
 
 
 # Function to compare PSG AI scoring with the majority expert scoring
-def aispg_vs_majority(psg_file):
+def aispg_vs_majority(psg_file, scheme=None):
     """
     Compares PSG AI scoring to the PSG expert scoring.
 
     Parameters:
     psg_file (str): Path to the PSG event file (psg_events.tsv).
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
 
     Returns:
     float: Percentage of agreement between AI and majority.
     """
-    logging.info("Comparing PSG AI scoring with PSG expert scoring...")
+    logging.debug("Comparing PSG AI scoring with PSG expert scoring of %s", psg_file)
 
     try:
         psg_df = pd.read_csv(psg_file, sep="\t")
@@ -85,10 +88,8 @@ def aispg_vs_majority(psg_file):
         logging.error(f"Error reading file: {e}")
         return None
 
-    AWAKE_STAGE = 8
-
-    # Filter out awake stage
-    mask = psg_df["majority"] != AWAKE_STAGE
+    # Filter out PSG disconnections
+    mask = psg_df["majority"] != PSG_DISCONNECTION
     psg_df = psg_df.loc[mask].reset_index(drop=True)
 
     if psg_df.empty:
@@ -97,8 +98,55 @@ def aispg_vs_majority(psg_file):
 
     file_id = os.path.basename(psg_file).split("_")[0]
 
-    # Compute percentage match
-    match_percentage = (psg_df["ai_psg"] == psg_df["majority"]).mean() * 100
+    # Compute percentage match (in the requested stage encoding)
+    try:
+        ai_stages = remap_stages(psg_df["ai_psg"].to_numpy(), scheme)
+        expert_stages = remap_stages(psg_df["majority"].to_numpy(), scheme)
+    except ValueError as e:
+        logging.warning("%s Skipping comparison.", e)
+        return None
+    match_percentage = (ai_stages == expert_stages).mean() * 100
 
-    logging.info(f"PSG AI comparison completed. Percentage match for patient {file_id}: {match_percentage:.2f}%")
+    logging.debug("PSG AI comparison completed. Percentage match for patient %s: %.2f%%", file_id, match_percentage)
     return match_percentage
+
+
+# Function to load the stage columns of one night as aligned NumPy arrays
+def load_night_stages(headband_file, psg_file, scheme=None):
+    """
+    Loads the expert and AI stage columns of one night as aligned integer arrays.
+
+    Parameters:
+    headband_file (str): Path to the headband AI scoring file (headband_events.tsv).
+    psg_file (str): Path to the PSG event file (psg_events.tsv).
+    scheme (str, optional): Stage encoding scheme to remap the stages to (see stage_encoding). Default is None.
+
+    Returns:
+    tuple or None: (majority, ai_psg, ai_hb) as int8 arrays of equal length (read with events_reader),
+                   or None if the files cannot be read or do not line up.
+    """
+    try:
+        headband = read_event_columns(headband_file, ["ai_hb"])
+        psg = read_event_columns(psg_file, ["majority", "ai_psg"])
+    except OSError as e:
+        logging.error(f"Error reading files: {e}")
+        return None
+    except ValueError as e:
+        # Missing stage columns, or values that are not stage codes
+        logging.warning("%s Skipping night.", e)
+        return None
+
+    # Both files describe the same 30-second epochs, so they must have the same length
+    if len(headband["ai_hb"]) != len(psg["majority"]):
+        logging.warning("Mismatch in epoch counts between %s and %s. Skipping night.", headband_file, psg_file)
+        return None
+
+    try:
+        majority = remap_stages(psg["majority"], scheme)
+        ai_psg = remap_stages(psg["ai_psg"], scheme)
+        ai_hb = remap_stages(headband["ai_hb"], scheme)
+    except ValueError as e:
+        # A stage code the scheme cannot remap
+        logging.warning("%s Skipping night.", e)
+        return None
+    return majority, ai_psg, ai_hb
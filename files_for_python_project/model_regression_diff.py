@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+import logging
+import os
+from functools import lru_cache
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.multi_model_evaluation import PSG_COLUMNS, load_prediction_sources
+from files_for_python_project.results_database import file_fingerprint
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION, remap_stages, scheme_stages, stage_positions
+
+# Default change (in percentage points) above which a night is flagged
+DEFAULT_THRESHOLD = 1.0
+
+# Number of nights whose arrays are kept in memory between diffs
+CACHED_NIGHTS = 4096
+
+
+@lru_cache(maxsize=CACHED_NIGHTS)
+def _cached_sources(headband_file, psg_file, headband_fingerprint, psg_fingerprint):
+    # The fingerprints are part of the cache key, so a rescored file is read again
+    loaded = load_prediction_sources(headband_file, psg_file)
+    if loaded is None:
+        return None
+    majority, predictions = loaded
+    for array in [majority, *predictions.values()]:
+        array.flags.writeable = False
+    return majority, predictions
+
+
+# Function to read the prediction sources of a night through the in-memory cache
+def cached_prediction_sources(headband_file, psg_file):
+    """
+    Returns load_prediction_sources of a night, reading the files only when they changed since the last call.
+
+    The returned arrays are shared between calls and read-only.
+
+    Parameters:
+    headband_file (str): Path to the headband event file (headband_events.tsv).
+    psg_file (str): Path to the PSG event file (psg_events.tsv).
+
+    Returns:
+    tuple or None: (majority, predictions), see load_prediction_sources.
+    """
+    try:
+        headband_fingerprint = file_fingerprint(headband_file)[2]
+        psg_fingerprint = file_fingerprint(psg_file)[2]
+    except OSError as e:
+        logging.error(f"Error reading files: {e}")
+        return None
+    return _cached_sources(headband_file, psg_file, headband_fingerprint, psg_fingerprint)
+
+
+# Function to compare two predictions of the same nights
+def compare_predictions(nights, threshold=DEFAULT_THRESHOLD, scheme=None, missing_as_error=(False, False)):
+    """
+    Compares a baseline and a candidate prediction against the experts over all nights at once.
+
+    The nights are concatenated into flat arrays with a night index, so every number below is one
+    vectorized comparison followed by an np.bincount.
+
+    Parameters:
+    nights (list): (night_id, majority, baseline, candidate) tuples of aligned stage arrays.
+    threshold (float): Change in agreement (percentage points) above which a night is flagged. Default is 1.0.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+    missing_as_error (tuple): For the baseline and the candidate, whether epochs without AI data count as
+                              disagreements (the PSG AI convention of aispg_vs_majority) instead of being
+                              left out (the headband convention). Default is (False, False).
+
+    Returns:
+    dict: 'nights' (per-night agreement of both predictions, its change and the flag), 'stages'
+          (per expert stage agreement of both predictions and its change) and 'flipped' (the epoch
+          ranges where the two predictions differ), all pandas DataFrames.
+    """
+    night_ids = [night_id for night_id, _, _, _ in nights]
+    n_nights = len(nights)
+    lengths = np.array([len(majority) for _, majority, _, _ in nights], dtype=np.int64)
+    night_index = np.repeat(np.arange(n_nights), lengths)
+    night_starts = np.cumsum(lengths) - lengths
+
+    def flat(position):
+        arrays = [night[position] for night in nights]
+        return remap_stages(np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64), scheme)
+
+    majority, baseline, candidate = flat(1), flat(2), flat(3)
+    expert_valid = majority != PSG_DISCONNECTION
+
+    def per_night(values):
+        return np.bincount(night_index, weights=values, minlength=n_nights)
+
+    # Agreement of each prediction with the experts, per night
+    scores = {}
+    scored = {}
+    correct = {}
+    for name, prediction, count_missing in zip(("baseline", "candidate"), (baseline, candidate), missing_as_error):
+        scored[name] = expert_valid if count_missing else expert_valid & (prediction != NO_DATA_COLLECTED)
+        correct[name] = scored[name] & (prediction == majority)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores[name] = per_night(correct[name]) / per_night(scored[name]) * 100
+
+    changed = baseline != candidate
+    night_table = pd.DataFrame({
+        "night": night_ids,
+        "epochs": lengths,
+        "changed_epochs": per_night(changed).astype(np.int64),
+        "baseline_match": scores["baseline"],
+        "candidate_match": scores["candidate"],
+    })
+    night_table["change"] = night_table["candidate_match"] - night_table["baseline_match"]
+    night_table["flagged"] = night_table["change"].abs() > threshold
+
+    # Agreement per expert stage, pooled over all nights
+    stages = scheme_stages(scheme)
+    stage_index = stage_positions(majority, stages)
+    in_stages = stage_index >= 0
+    stage_columns = {"stage": stages}
+    for name in ("baseline", "candidate"):
+        valid = in_stages & scored[name]
+        epochs = np.bincount(stage_index[valid], minlength=len(stages))
+        matched = np.bincount(stage_index[valid & correct[name]], minlength=len(stages))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stage_columns[f"{name}_match"] = matched / epochs * 100
+        stage_columns[f"{name}_epochs"] = epochs
+    stage_table = pd.DataFrame(stage_columns)
+    stage_table["change"] = stage_table["candidate_match"] - stage_table["baseline_match"]
+
+    # Ranges of consecutive changed epochs; a range never crosses into the next night
+    first_epoch = np.zeros(len(changed), dtype=bool)
+    first_epoch[night_starts[lengths > 0]] = True
+    previous_changed = np.concatenate([[False], changed[:-1]]) & ~first_epoch
+    range_starts = np.flatnonzero(changed & ~previous_changed)
+    range_id = np.cumsum(changed & ~previous_changed) - 1
+    range_epochs = np.bincount(range_id[changed], minlength=len(range_starts))
+    fixed = np.bincount(range_id[changed], weights=(correct["candidate"] & ~correct["baseline"])[changed],
+                        minlength=len(range_starts))
+    broken = np.bincount(range_id[changed], weights=(correct["baseline"] & ~correct["candidate"])[changed],
+                         minlength=len(range_starts))
+
+    range_nights = night_index[range_starts]
+    start_epoch = range_starts - night_starts[range_nights]
+    flipped_table = pd.DataFrame({
+        "night": np.array(night_ids, dtype=object)[range_nights],
+        "start_epoch": start_epoch,
+        "end_epoch": start_epoch + range_epochs,
+        "baseline_stage": baseline[range_starts],
+        "candidate_stage": candidate[range_starts],
+        "fixed_epochs": fixed.astype(np.int64),
+        "broken_epochs": broken.astype(np.int64),
+    })
+
+    return {"nights": night_table, "stages": stage_table, "flipped": flipped_table}
+
+
+# Function to diff two prediction columns of the same dataset
+def diff_models(headband_files, psg_files, baseline, candidate, threshold=DEFAULT_THRESHOLD, scheme=None):
+    """
+    Diffs two prediction sources of the same nights (columns or sidecar sources, see load_prediction_sources),
+    e.g. two builds of the same model. 'ai_psg' sources count missing epochs as disagreements, like
+    aispg_vs_majority; other sources leave them out.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    baseline (str): Name of the baseline source, e.g. 'ai_hb'.
+    candidate (str): Name of the candidate source, e.g. 'v2:ai_hb'.
+    threshold (float): Change in agreement (percentage points) above which a night is flagged. Default is 1.0.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    dict: See compare_predictions.
+    """
+    nights = []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        loaded = cached_prediction_sources(headband_file, psg_file)
+        if loaded is None:
+            continue
+        majority, predictions = loaded
+        if baseline not in predictions or candidate not in predictions:
+            logging.warning(f"{psg_file} does not have both '{baseline}' and '{candidate}'. Skipping night.")
+            continue
+        night_id = os.path.basename(psg_file).split("_")[0]
+        nights.append((night_id, majority, predictions[baseline], predictions[candidate]))
+
+    missing_as_error = tuple(name.split(":")[-1] in PSG_COLUMNS for name in (baseline, candidate))
+    return compare_predictions(nights, threshold, scheme, missing_as_error)
+
+
+# Function to diff the same prediction column between two copies of the dataset
+def diff_datasets(baseline_folder, candidate_folder, column="ai_hb", threshold=DEFAULT_THRESHOLD, scheme=None):
+    """
+    Diffs one prediction source between two dataset roots, e.g. the archive before and after a rescoring.
+
+    Nights are matched by their PSG file path relative to the root; the experts of the baseline root are used.
+
+    Parameters:
+    baseline_folder (str): Root of the baseline dataset.
+    candidate_folder (str): Root of the candidate dataset.
+    column (str): Name of the prediction source to compare. Default is 'ai_hb'.
+    threshold (float): Change in agreement (percentage points) above which a night is flagged. Default is 1.0.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    dict: See compare_predictions.
+    """
+    candidate_pairs = {os.path.relpath(psg_file, candidate_folder): (headband_file, psg_file)
+                       for headband_file, psg_file in iter_event_files(candidate_folder)}
+
+    nights = []
+    for headband_file, psg_file in iter_event_files(baseline_folder):
+        relative_path = os.path.relpath(psg_file, baseline_folder)
+        if relative_path not in candidate_pairs:
+            logging.warning(f"{relative_path} is missing from {candidate_folder}. Skipping night.")
+            continue
+        baseline_loaded = cached_prediction_sources(headband_file, psg_file)
+        candidate_loaded = cached_prediction_sources(*candidate_pairs[relative_path])
+        if baseline_loaded is None or candidate_loaded is None:
+            continue
+        majority, baseline_predictions = baseline_loaded
+        candidate_predictions = candidate_loaded[1]
+        if column not in baseline_predictions or column not in candidate_predictions:
+            logging.warning(f"'{column}' is missing for {relative_path}. Skipping night.")
+            continue
+        if len(candidate_predictions[column]) != len(majority):
+            logging.warning(f"{relative_path} has a different number of epochs in {candidate_folder}. Skipping night.")
+            continue
+        night_id = os.path.basename(psg_file).split("_")[0]
+        nights.append((night_id, majority, baseline_predictions[column], candidate_predictions[column]))
+
+    count_missing = column.split(":")[-1] in PSG_COLUMNS
+    return compare_predictions(nights, threshold, scheme, (count_missing, count_missing))
@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import logging
+import os
+import re
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION, remap_stages, scheme_stages
+
+# Constants
+MAX_ERROR_PERCENTAGE = 40
+
+# Prediction columns scored like aispg_vs_majority (missing epochs are disagreements, no night is skipped);
+# every other column is scored like headband_vs_majority
+PSG_COLUMNS = ("ai_psg",)
+
+# Sidecar prediction files follow the BIDS "desc" entity, e.g. sub-1_task-Sleep_desc-modelv2_events.tsv
+SIDECAR_PATTERN = re.compile(r"_desc-([A-Za-z0-9]+)_events\.tsv$")
+
+
+# Function to read every AI prediction column available for one night
+def load_prediction_sources(headband_file, psg_file):
+    """
+    Reads the expert stages and every AI prediction source of one night in one pass.
+
+    Prediction sources are all 'ai_*' columns of the PSG and headband files (named by their column,
+    e.g. 'ai_psg', 'ai_hb') and of any sidecar '*_desc-<label>_events.tsv' file in the same folder
+    (named '<label>:<column>').
+
+    Parameters:
+    headband_file (str): Path to the headband event file (headband_events.tsv).
+    psg_file (str): Path to the PSG event file (psg_events.tsv).
+
+    Returns:
+    tuple or None: (majority, predictions) where predictions is a dict of source name -> int array,
+                   or None if the expert file cannot be read.
+    """
+    try:
+        psg_df = pd.read_csv(psg_file, sep="\t")
+    except Exception as e:
+        logging.error(f"Error reading file: {e}")
+        return None
+
+    if "majority" not in psg_df.columns:
+        logging.warning(f"Missing 'majority' column in {psg_file}. Skipping night.")
+        return None
+
+    majority = psg_df["majority"].to_numpy(dtype=np.int64)
+    sources = [(psg_df, None)]
+
+    # Collect the headband file and sidecar prediction files of the same night
+    other_files = [(headband_file, None)]
+    eeg_folder = os.path.dirname(psg_file)
+    for entry in sorted(os.scandir(eeg_folder), key=lambda e: e.name):
+        match = SIDECAR_PATTERN.search(entry.name)
+        if entry.is_file() and match:
+            other_files.append((entry.path, match.group(1)))
+
+    for path, label in other_files:
+        try:
+            sources.append((pd.read_csv(path, sep="\t"), label))
+        except Exception as e:
+            logging.error(f"Error reading file: {e}")
+
+    predictions = {}
+    for df, label in sources:
+        for column in df.columns:
+            if not column.startswith("ai_"):
+                continue
+            name = column if label is None else f"{label}:{column}"
+            if len(df) != len(majority):
+                logging.warning(f"Source '{name}' has {len(df)} epochs instead of {len(majority)}. Skipping it.")
+                continue
+            predictions[name] = df[column].fillna(NO_DATA_COLLECTED).to_numpy(dtype=np.int64)
+
+    return majority, predictions
+
+
+# Function to evaluate any number of AI models against the experts in one pass
+def evaluate_models(headband_files, psg_files, models=None, scheme=None):
+    """
+    Evaluates every prediction source of every night against the expert majority, and against each other.
+
+    Each night is read once. Every source follows the comparison of its column: 'ai_psg' sources
+    (PSG_COLUMNS, also from sidecars) count their missing epochs as disagreements, like aispg_vs_majority,
+    while the other sources ignore them and get no score on a night whose error rate reaches the
+    threshold used by headband_vs_majority. Nights with codes the scheme cannot remap are skipped.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    models (list, optional): Source names to evaluate. Default is None (every source found).
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    tuple: (agreement, pairwise)
+           - agreement (pandas.DataFrame): model x night percentage of agreement with the majority
+             (NaN where a model has no score for a night).
+           - pairwise (pandas.DataFrame): model x model percentage of agreement, pooled over all
+             epochs that both models scored.
+    """
+    nights = []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        loaded = load_prediction_sources(headband_file, psg_file)
+        if loaded is None:
+            continue
+        file_id = os.path.basename(psg_file).split("_")[0]
+        nights.append((file_id, *loaded))
+
+    if models is None:
+        models = sorted({name for _, _, predictions in nights for name in predictions})
+    models = list(models)
+    n_models = len(models)
+    stages = scheme_stages(scheme)
+    n_stages = len(stages)
+    psg_rule = np.array([name.split(":")[-1] in PSG_COLUMNS for name in models], dtype=bool)
+    kept_nights = []
+
+    agreement = np.full((n_models, len(nights)), np.nan)
+    pair_matches = np.zeros((n_models, n_models))
+    pair_epochs = np.zeros((n_models, n_models))
+
+    for night_index, (file_id, majority, predictions) in enumerate(nights):
+        # Stack the night into one (models x epochs) array, missing models count as no data
+        stacked = np.full((n_models, len(majority)), NO_DATA_COLLECTED, dtype=np.int64)
+        present = np.array([name in predictions for name in models], dtype=bool)
+        for model_index, name in enumerate(models):
+            if name in predictions:
+                stacked[model_index] = predictions[name]
+
+        # Remap the whole stack and the experts with one lookup each
+        try:
+            stacked = remap_stages(stacked, scheme)
+            majority = remap_stages(majority, scheme)
+        except ValueError as e:
+            logging.warning("%s Skipping night %s.", e, file_id)
+            continue
+        kept_nights.append(night_index)
+
+        expert_valid = majority != PSG_DISCONNECTION
+        valid = expert_valid & (stacked != NO_DATA_COLLECTED)
+        n_expert = expert_valid.sum()
+        n_valid = valid.sum(axis=1)
+
+        # Agreement of every model with the experts at once; PSG sources are scored on every expert epoch
+        if n_expert:
+            matches = ((stacked == majority) & valid).sum(axis=1)
+            n_scored = np.where(psg_rule, n_expert, n_valid)
+            error_percentage = (1 - n_valid / n_expert) * 100
+            scored = present & (n_scored > 0) & (psg_rule | (error_percentage < MAX_ERROR_PERCENTAGE))
+            agreement[scored, night_index] = matches[scored] / n_scored[scored] * 100
+
+        # Model-vs-model agreement from one-hot stage indicators: (models x stages x epochs)
+        one_hot = (stacked[:, None, :] == stages[None, :, None]) & valid[:, None, :]
+        one_hot = one_hot.reshape(n_models, n_stages * len(majority)).astype(float)
+        pair_matches += one_hot @ one_hot.T
+        valid_float = valid.astype(float)
+        pair_epochs += valid_float @ valid_float.T
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pairwise = np.where(pair_epochs > 0, pair_matches / pair_epochs * 100, np.nan)
+
+    agreement = pd.DataFrame(agreement[:, kept_nights], index=models,
+                             columns=[nights[night_index][0] for night_index in kept_nights])
+    pairwise = pd.DataFrame(pairwise, index=models, columns=models)
+    return agreement, pairwise
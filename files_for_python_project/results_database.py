@@ -0,0 +1,249 @@
+import sqlite3
+import hashlib
+import logging
+import os
+import re
+import time
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.streaming_pipeline import summarize_night, batched
+
+# Tables and indexes of the results database
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    subject_id TEXT PRIMARY KEY,
+    subject_number INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    subject_id TEXT NOT NULL REFERENCES subjects(subject_id),
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS night_metrics (
+    subject_id TEXT PRIMARY KEY REFERENCES subjects(subject_id),
+    headband_file TEXT NOT NULL,
+    psg_file TEXT NOT NULL,
+    hb_match REAL,
+    psg_match REAL,
+    error_hours REAL NOT NULL,
+    total_hours REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_subject ON files(subject_id);
+CREATE INDEX IF NOT EXISTS idx_metrics_hb_match ON night_metrics(hb_match);
+CREATE INDEX IF NOT EXISTS idx_metrics_psg_match ON night_metrics(psg_match);
+CREATE INDEX IF NOT EXISTS idx_metrics_error_hours ON night_metrics(error_hours);
+"""
+
+# Filters accepted by query_nights: keyword -> SQL condition
+QUERY_FILTERS = {
+    "max_hb_match": "hb_match < ?",
+    "min_hb_match": "hb_match >= ?",
+    "max_psg_match": "psg_match < ?",
+    "min_psg_match": "psg_match >= ?",
+    "min_error_hours": "error_hours > ?",
+    "max_error_hours": "error_hours <= ?",
+}
+
+
+# Function to open (and create if needed) the results database
+def connect_database(database_path):
+    """
+    Opens the SQLite results database, creating its tables and indexes if needed.
+
+    Parameters:
+    database_path (str): Path to the SQLite file.
+
+    Returns:
+    sqlite3.Connection: An open connection whose rows can be read by column name.
+    """
+    connection = sqlite3.connect(database_path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# Function to fingerprint an event file without reading it
+def file_fingerprint(path):
+    """
+    Computes a cheap fingerprint of a file from its size and modification time.
+
+    Parameters:
+    path (str): Path to the file.
+
+    Returns:
+    tuple: (size, mtime_ns, fingerprint) where fingerprint is a short hex string.
+    """
+    stat = os.stat(path)
+    fingerprint = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+    return stat.st_size, stat.st_mtime_ns, fingerprint
+
+
+# Function to get the subject ID and number from an event file name
+def subject_from_path(path):
+    """
+    Extracts the subject ID (e.g. 'sub-12') and its number (12) from an event file path.
+
+    Parameters:
+    path (str): Path to an event file.
+
+    Returns:
+    tuple: (subject_id, subject_number), where subject_number is None if it is not numeric.
+    """
+    subject_id = os.path.basename(path).split("_")[0]
+    match = re.match(r"sub-(\d+)$", subject_id)
+    return subject_id, int(match.group(1)) if match else None
+
+
+# Function to find which nights changed since they were last indexed
+def stale_pairs(connection, file_pairs):
+    """
+    Yields the file pairs whose files are new or changed compared to the fingerprints in the database.
+
+    Parameters:
+    connection (sqlite3.Connection): Open results database.
+    file_pairs (iterable): Pairs of headband and PSG event file paths.
+
+    Yields:
+    tuple: (headband_file, psg_file) of every new or changed night.
+    """
+    for headband_file, psg_file in file_pairs:
+        for path in (headband_file, psg_file):
+            stored = connection.execute("SELECT fingerprint FROM files WHERE path = ?", (path,)).fetchone()
+            if stored is None or stored["fingerprint"] != file_fingerprint(path)[2]:
+                yield headband_file, psg_file
+                break
+
+
+# Function to write a batch of per-night rows in one transaction
+def upsert_nights(connection, rows):
+    """
+    Inserts or replaces subjects, file fingerprints and metrics of a batch of nights in one transaction.
+
+    Parameters:
+    connection (sqlite3.Connection): Open results database.
+    rows (list): Per-night rows created by summarize_night.
+
+    Returns:
+    int: Number of nights written.
+    """
+    subjects, files, metrics = [], [], []
+    now = time.time()
+
+    for row in rows:
+        subject_id, subject_number = subject_from_path(row["psg_file"])
+        subjects.append((subject_id, subject_number))
+        for kind, path in (("headband", row["headband_file"]), ("psg", row["psg_file"])):
+            files.append((path, subject_id, kind, *file_fingerprint(path)))
+        metrics.append((subject_id, row["headband_file"], row["psg_file"], row["hb_match"], row["psg_match"],
+                        row["error_hours"], row["total_hours"], now))
+
+    # The connection context manager commits the whole batch at once (or rolls it back on error)
+    with connection:
+        connection.executemany("INSERT OR REPLACE INTO subjects VALUES (?, ?)", subjects)
+        connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", files)
+        connection.executemany("INSERT OR REPLACE INTO night_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", metrics)
+
+    return len(metrics)
+
+
+# Function to remove nights whose files disappeared
+def delete_nights(connection, subject_ids):
+    """
+    Removes the metrics and file fingerprints of the given subjects in one transaction.
+
+    Parameters:
+    connection (sqlite3.Connection): Open results database.
+    subject_ids (list): Subject IDs (e.g. 'sub-12') to remove.
+
+    Returns:
+    None
+    """
+    keys = [(subject_id,) for subject_id in subject_ids]
+    with connection:
+        connection.executemany("DELETE FROM night_metrics WHERE subject_id = ?", keys)
+        connection.executemany("DELETE FROM files WHERE subject_id = ?", keys)
+
+
+# Function to index a whole dataset into the results database
+def index_dataset(database_path, base_folder, batch_size=500, only_changed=True):
+    """
+    Computes the per-night metrics of the dataset and stores them in the results database.
+
+    Parameters:
+    database_path (str): Path to the SQLite file.
+    base_folder (str): The path to the base folder containing the subject data folders.
+    batch_size (int): Nights written per transaction. Default is 500.
+    only_changed (bool): Skip nights whose files did not change since they were indexed. Default is True.
+
+    Returns:
+    int: Number of nights (re)indexed.
+    """
+    connection = connect_database(database_path)
+    try:
+        pairs = iter_event_files(base_folder)
+        if only_changed:
+            pairs = stale_pairs(connection, pairs)
+
+        indexed = 0
+        for batch in batched(pairs, batch_size):
+            rows = [row for row in (summarize_night(*pair) for pair in batch) if row is not None]
+            indexed += upsert_nights(connection, rows)
+    finally:
+        connection.close()
+
+    logging.info(f"Indexed {indexed} nights into {database_path}.")
+    return indexed
+
+
+# Function to query nights by their metrics
+def query_nights(database_path, order_by="subject_number", **filters):
+    """
+    Returns the nights whose metrics match the given filters.
+
+    Example: query_nights(db, max_hb_match=60, min_error_hours=1) finds all nights with headband
+    agreement under 60% and more than 1 hour of artifacts.
+
+    Parameters:
+    database_path (str): Path to the SQLite file.
+    order_by (str): Column to sort by ('subject_number', 'hb_match', 'psg_match' or 'error_hours').
+                    Default is 'subject_number'.
+    **filters: Any of the QUERY_FILTERS keywords.
+
+    Returns:
+    list: One dictionary per matching night.
+    """
+    unknown = set(filters) - set(QUERY_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown filters: {sorted(unknown)}. Available filters: {sorted(QUERY_FILTERS)}")
+    if order_by not in ("subject_number", "hb_match", "psg_match", "error_hours"):
+        raise ValueError(f"Cannot order by '{order_by}'.")
+
+    conditions = [QUERY_FILTERS[name] for name in filters]
+    query = ("SELECT s.subject_number, m.* FROM night_metrics m JOIN subjects s USING (subject_id)"
+             + (" WHERE " + " AND ".join(conditions) if conditions else "")
+             + f" ORDER BY {order_by}")
+
+    connection = connect_database(database_path)
+    try:
+        return [dict(row) for row in connection.execute(query, list(filters.values()))]
+    finally:
+        connection.close()
+
+
+# Function to list the subject numbers that match some filters
+def suggest_subjects(database_path, **filters):
+    """
+    Returns the subject numbers (as strings, like the user types them) of the nights matching the filters.
+
+    Parameters:
+    database_path (str): Path to the SQLite file.
+    **filters: Any of the QUERY_FILTERS keywords.
+
+    Returns:
+    list: Subject numbers as strings.
+    """
+    return [str(row["subject_number"]) for row in query_nights(database_path, **filters)
+            if row["subject_number"] is not None]
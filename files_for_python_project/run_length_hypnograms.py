@@ -0,0 +1,234 @@
+import numpy as np
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.streaming_pipeline import EPOCH_SECONDS, MAX_ERROR_PERCENTAGE
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION, SLEEP_STAGES, stage_positions
+
+# Names of the three hypnograms of a night, in the order of load_night_stages
+NIGHT_SOURCES = ("majority", "ai_psg", "ai_hb")
+
+
+# Function to run-length encode a hypnogram
+def encode_runs(hypnogram):
+    """
+    Run-length encodes a hypnogram of one stage per epoch.
+
+    Parameters:
+    hypnogram (array-like): Stage code of every epoch.
+
+    Returns:
+    tuple: (ends, stages) where ends (int64) is the exclusive end epoch of every run and
+           stages (int8) is the stage of every run. ends[-1] is the number of epochs.
+    """
+    hypnogram = np.asarray(hypnogram)
+    if len(hypnogram) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8)
+    changes = np.flatnonzero(hypnogram[1:] != hypnogram[:-1]) + 1
+    ends = np.append(changes, len(hypnogram)).astype(np.int64)
+    return ends, hypnogram[ends - 1].astype(np.int8)
+
+
+# Function to expand a run-length encoded hypnogram back to one stage per epoch
+def decode_runs(ends, stages):
+    """
+    Expands a run-length encoded hypnogram to one stage per epoch.
+
+    Parameters:
+    ends (numpy.ndarray): Exclusive end epoch of every run.
+    stages (numpy.ndarray): Stage of every run.
+
+    Returns:
+    numpy.ndarray: Stage of every epoch.
+    """
+    return np.repeat(stages, np.diff(ends, prepend=0))
+
+
+# Function to split several run lists on their common boundaries
+def intersect_runs(*runs):
+    """
+    Splits several run-length encoded hypnograms of the same night on the union of their run boundaries.
+
+    The cost grows with the number of runs (stage transitions), not with the number of epochs.
+
+    Parameters:
+    *runs (tuple): (ends, stages) pairs created by encode_runs, all covering the same number of epochs.
+
+    Returns:
+    tuple: (lengths, stages) where lengths (int64) is the number of epochs of every common interval and
+           stages is a list with, for every input, its stage in each common interval.
+    """
+    totals = {int(ends[-1]) if len(ends) else 0 for ends, _ in runs}
+    if len(totals) > 1:
+        raise ValueError(f"The hypnograms cover different numbers of epochs: {sorted(totals)}.")
+
+    boundaries = np.unique(np.concatenate([ends for ends, _ in runs]))
+    lengths = np.diff(boundaries, prepend=0)
+    # The run that contains an interval is the first one that ends at or after the interval's end
+    stages = [run_stages[np.searchsorted(ends, boundaries)] for ends, run_stages in runs]
+    return lengths, stages
+
+
+# Function to count how many epochs of every expert stage were scored as every AI stage
+def run_confusion_counts(majority_runs, ai_runs, stages=SLEEP_STAGES):
+    """
+    Builds the confusion matrix of expert stages (rows) against AI stages (columns) from run lists.
+
+    Gives the same counts as bootstrap_confidence.confusion_counts on the decoded hypnograms.
+
+    Parameters:
+    majority_runs (tuple): Run-length encoded expert hypnogram.
+    ai_runs (tuple): Run-length encoded AI hypnogram.
+    stages (array-like): Stage codes that make up the rows and columns. Default is 0-4.
+
+    Returns:
+    numpy.ndarray: K x K matrix of epoch counts, where K is the number of stages.
+    """
+    stages = np.asarray(stages)
+    n_stages = len(stages)
+    lengths, (majority, ai) = intersect_runs(majority_runs, ai_runs)
+
+    expert_index = stage_positions(majority, stages)
+    ai_index = stage_positions(ai, stages)
+
+    valid = (expert_index >= 0) & (ai_index >= 0)
+    flat = expert_index[valid] * n_stages + ai_index[valid]
+    counts = np.bincount(flat, weights=lengths[valid], minlength=n_stages * n_stages)
+    return counts.astype(np.int64).reshape(n_stages, n_stages)
+
+
+# Function to count the epochs of one stage in a run list
+def run_stage_epochs(runs, stage):
+    """
+    Counts the epochs scored as one stage.
+
+    Parameters:
+    runs (tuple): Run-length encoded hypnogram.
+    stage (int): The stage code to count.
+
+    Returns:
+    int: Number of epochs with that stage.
+    """
+    ends, stages = runs
+    return int(np.diff(ends, prepend=0)[stages == stage].sum())
+
+
+# Function to compute the artifact duration of a headband night from its runs
+def run_artifact_hours(hb_runs):
+    """
+    Calculates the hours of missing headband data, like error_hours_count.
+
+    Parameters:
+    hb_runs (tuple): Run-length encoded headband AI hypnogram.
+
+    Returns:
+    float: Hours of epochs without headband data.
+    """
+    return run_stage_epochs(hb_runs, NO_DATA_COLLECTED) * EPOCH_SECONDS / 3600
+
+
+# Function to compute every per-night number of the main report from the runs of a night
+def summarize_runs(majority_runs, psg_runs, hb_runs):
+    """
+    Computes the per-night results of the main report by interval intersection of the three run lists.
+
+    Gives the same numbers as streaming_pipeline.summarize_stages on the decoded hypnograms.
+
+    Parameters:
+    majority_runs (tuple): Run-length encoded expert hypnogram.
+    psg_runs (tuple): Run-length encoded PSG AI hypnogram.
+    hb_runs (tuple): Run-length encoded headband AI hypnogram.
+
+    Returns:
+    dict: 'hb_match' and 'psg_match' (percentages, may be None), 'error_hours' and 'total_hours'.
+    """
+    lengths, (majority, ai_psg, ai_hb) = intersect_runs(majority_runs, psg_runs, hb_runs)
+    expert_valid = majority != PSG_DISCONNECTION
+    expert_epochs = lengths[expert_valid].sum()
+    hb_match = None
+    psg_match = None
+
+    if expert_epochs:
+        # PSG AI: every epoch that is not a PSG disconnection
+        psg_match = float(lengths[expert_valid & (ai_psg == majority)].sum() / expert_epochs * 100)
+
+        # Headband AI: skip nights with too much missing data, then ignore the missing epochs
+        hb_missing = lengths[expert_valid & (ai_hb == NO_DATA_COLLECTED)].sum()
+        if hb_missing / expert_epochs * 100 < MAX_ERROR_PERCENTAGE:
+            hb_valid = expert_valid & (ai_hb != NO_DATA_COLLECTED)
+            hb_match = float(lengths[hb_valid & (ai_hb == majority)].sum() / lengths[hb_valid].sum() * 100)
+
+    # Same convention as total_sleeping_hours, which leaves out the first row
+    n_epochs = int(lengths.sum())
+    return {
+        "hb_match": hb_match,
+        "psg_match": psg_match,
+        "error_hours": run_artifact_hours(hb_runs),
+        "total_hours": max(n_epochs - 1, 0) * EPOCH_SECONDS / 3600,
+    }
+
+
+# Function to read a night straight into run-length encoded hypnograms
+def read_night_runs(headband_file, psg_file, scheme=None):
+    """
+    Reads one night and run-length encodes its three hypnograms.
+
+    Parameters:
+    headband_file (str): Path to the headband event file (headband_events.tsv).
+    psg_file (str): Path to the PSG event file (psg_events.tsv).
+    scheme (str, optional): Stage encoding scheme to encode in (see stage_encoding). Default is None.
+
+    Returns:
+    dict or None: Maps 'majority', 'ai_psg' and 'ai_hb' to their (ends, stages) runs,
+                  or None if the night cannot be read.
+    """
+    stages = load_night_stages(headband_file, psg_file, scheme=scheme)
+    if stages is None:
+        return None
+    return {source: encode_runs(hypnogram) for source, hypnogram in zip(NIGHT_SOURCES, stages)}
+
+
+# Function to store the runs of many nights in one compact file
+def save_night_runs(path, nights):
+    """
+    Saves the run-length encoded hypnograms of many nights into one compressed NPZ file.
+
+    The runs of all nights are concatenated per source, with an offset array marking where every night starts.
+
+    Parameters:
+    path (str): Path to the NPZ file.
+    nights (dict): Maps a night name to its read_night_runs dictionary.
+
+    Returns:
+    None
+    """
+    names = list(nights)
+    arrays = {"names": np.array(names, dtype=str)}
+    for source in NIGHT_SOURCES:
+        runs = [nights[name][source] for name in names]
+        arrays[f"{source}_offsets"] = np.cumsum([0] + [len(ends) for ends, _ in runs]).astype(np.int64)
+        # Run ends fit in 32 bits for any recording shorter than two thousand years
+        arrays[f"{source}_ends"] = np.concatenate([ends for ends, _ in runs] or [np.zeros(0)]).astype(np.int32)
+        arrays[f"{source}_stages"] = np.concatenate([stages for _, stages in runs] or [np.zeros(0)]).astype(np.int8)
+    np.savez_compressed(path, **arrays)
+
+
+# Function to read the file written by save_night_runs
+def load_night_runs(path):
+    """
+    Loads the run-length encoded hypnograms written by save_night_runs.
+
+    Parameters:
+    path (str): Path to the NPZ file.
+
+    Returns:
+    dict: Maps every night name to its dictionary of (ends, stages) runs.
+    """
+    with np.load(path) as data:
+        nights = {str(name): {} for name in data["names"]}
+        for source in NIGHT_SOURCES:
+            offsets = data[f"{source}_offsets"]
+            ends = data[f"{source}_ends"].astype(np.int64)
+            stages = data[f"{source}_stages"]
+            for index, name in enumerate(nights):
+                start, stop = offsets[index], offsets[index + 1]
+                nights[name][source] = (ends[start:stop], stages[start:stop])
+    return nights
@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import os
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.streaming_pipeline import EPOCH_SECONDS
+from files_for_python_project.stage_encoding import scheme_stages, stage_positions
+
+# The scorers of a night, in the order of load_night_stages
+SCORERS = ("majority", "ai_psg", "ai_hb")
+
+
+# Function to count the stage-to-stage transitions of one hypnogram
+def transition_counts(hypnogram, scheme=None):
+    """
+    Counts how often every stage is followed by every stage in the next epoch (staying included).
+
+    Pairs with an epoch outside of the scheme's stages are not counted.
+
+    Parameters:
+    hypnogram (array-like): Stage code of every epoch of one night.
+    scheme (str, optional): Stage encoding scheme the hypnogram is in (see stage_encoding). Default is None.
+
+    Returns:
+    numpy.ndarray: K x K matrix where entry (i, j) counts epochs of stage i followed by stage j.
+    """
+    stages = scheme_stages(scheme)
+    n_stages = len(stages)
+    positions = stage_positions(hypnogram, stages)
+    valid = (positions[:-1] >= 0) & (positions[1:] >= 0)
+    pairs = positions[:-1][valid] * n_stages + positions[1:][valid]
+    return np.bincount(pairs, minlength=n_stages * n_stages).reshape(n_stages, n_stages)
+
+
+# Function to turn transition counts into probabilities
+def transition_probabilities(counts):
+    """
+    Normalizes transition counts per row, giving the probability of the next stage given the current one.
+
+    Parameters:
+    counts (numpy.ndarray): Array of shape (..., K, K) of transition counts.
+
+    Returns:
+    numpy.ndarray: Same shape; rows of stages that never occur are NaN.
+    """
+    counts = np.asarray(counts, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return counts / counts.sum(axis=-1, keepdims=True)
+
+
+# Function to measure how different two sets of transition counts are
+def transition_distance(reference_counts, other_counts):
+    """
+    Measures the difference between two transition matrices as the total variation distance between
+    their next-stage distributions, averaged over the current stages weighted by how often the
+    reference is in each stage.
+
+    0 means identical dynamics, 1 means the next stage never agrees in distribution.
+
+    Parameters:
+    reference_counts (numpy.ndarray): Array of shape (..., K, K), e.g. the expert transition counts.
+    other_counts (numpy.ndarray): Array of the same shape, e.g. an AI's transition counts.
+
+    Returns:
+    float or numpy.ndarray: The distance for every matrix (NaN when the reference has no transitions).
+    """
+    reference_counts = np.asarray(reference_counts, dtype=float)
+    reference = transition_probabilities(reference_counts)
+    other = transition_probabilities(other_counts)
+
+    # A stage the AI never scored has no next-stage distribution: it counts as completely different
+    row_distance = 0.5 * np.abs(reference - other).sum(axis=-1)
+    row_distance = np.where(np.isnan(row_distance), 1.0, row_distance)
+
+    weights = reference_counts.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (row_distance * weights).sum(axis=-1) / weights.sum(axis=-1)
+
+
+# Function to build the transition matrices of every scorer of every night
+def collect_transition_counts(headband_files, psg_files, scheme=None):
+    """
+    Reads every night once and counts the transitions of the experts and both AIs with one np.bincount.
+
+    Consecutive epoch pairs of all nights and scorers are encoded as
+    ((night * 3 + scorer) * K + current) * K + next; pairs that cross into the next night
+    or contain an epoch outside of the scheme's stages are dropped.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    scheme (str, optional): Stage encoding scheme to count in (see stage_encoding). Default is None.
+
+    Returns:
+    dict: 'nights' (night IDs), 'stages' (stage codes of the rows/columns), 'epochs' (epochs per night)
+          and 'counts' (array of shape nights x 3 scorers x K x K, scorers in the order of SCORERS).
+    """
+    stages = scheme_stages(scheme)
+    n_stages = len(stages)
+    night_ids = []
+    hypnograms = []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        night = load_night_stages(headband_file, psg_file, scheme)
+        if night is None:
+            continue
+        night_ids.append(os.path.basename(psg_file).split("_")[0])
+        hypnograms.append(np.stack(night))
+
+    n_nights = len(hypnograms)
+    epochs = np.array([hypnogram.shape[1] for hypnogram in hypnograms], dtype=np.int64)
+    if n_nights == 0:
+        counts = np.zeros((0, len(SCORERS), n_stages, n_stages), dtype=np.int64)
+        return {"nights": night_ids, "stages": stages, "epochs": epochs, "counts": counts}
+
+    # One (scorers x epochs) array for the whole dataset, with the night of every epoch
+    positions = stage_positions(np.concatenate(hypnograms, axis=1), stages)
+    night_of_epoch = np.repeat(np.arange(n_nights), epochs)
+
+    current, following = positions[:, :-1], positions[:, 1:]
+    valid = (current >= 0) & (following >= 0) & (night_of_epoch[:-1] == night_of_epoch[1:])
+    scorer = np.arange(len(SCORERS))[:, None]
+    codes = ((night_of_epoch[:-1] * len(SCORERS) + scorer) * n_stages + current) * n_stages + following
+
+    counts = np.bincount(codes[valid], minlength=n_nights * len(SCORERS) * n_stages * n_stages)
+    counts = counts.reshape(n_nights, len(SCORERS), n_stages, n_stages)
+    return {"nights": night_ids, "stages": stages, "epochs": epochs, "counts": counts}
+
+
+# Function to compare the sleep dynamics of both AIs with the experts
+def compare_dynamics(headband_files, psg_files, scheme=None):
+    """
+    Compares the stage transition dynamics of the PSG and headband AI with the experts, per night and pooled.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    dict: 'per_night' (pandas.DataFrame with the stage changes per hour of every scorer and the
+          transition distance of each AI to the experts), 'pooled_counts' and 'pooled_probabilities'
+          (arrays of shape 3 scorers x K x K), 'pooled_distance' (dict AI -> distance) and the
+          collect_transition_counts result under 'transitions'.
+    """
+    transitions = collect_transition_counts(headband_files, psg_files, scheme)
+    counts = transitions["counts"]
+    hours = transitions["epochs"] * EPOCH_SECONDS / 3600
+
+    # Stage changes are the off-diagonal transitions; more of them per hour means more fragmented sleep
+    changes = counts.sum(axis=(2, 3)) - np.trace(counts, axis1=2, axis2=3)
+    per_night = pd.DataFrame({"night": transitions["nights"]})
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for index, scorer in enumerate(SCORERS):
+            per_night[f"{scorer}_changes_per_hour"] = changes[:, index] / hours
+    for index, scorer in enumerate(SCORERS[1:], start=1):
+        per_night[f"{scorer}_distance"] = transition_distance(counts[:, 0], counts[:, index])
+
+    pooled_counts = counts.sum(axis=0)
+    return {
+        "per_night": per_night,
+        "pooled_counts": pooled_counts,
+        "pooled_probabilities": transition_probabilities(pooled_counts),
+        "pooled_distance": {scorer: float(transition_distance(pooled_counts[0], pooled_counts[index]))
+                            for index, scorer in enumerate(SCORERS[1:], start=1)},
+        "transitions": transitions,
+    }
@@ -0,0 +1,173 @@
+import numpy as np
+
+# Stage codes used in the event files
+NO_DATA_COLLECTED = -2  # Artifacts and missing data (AI-scored only)
+WAKE = 0
+N1 = 1
+N2 = 2
+N3 = 3
+REM = 4
+PSG_DISCONNECTION = 8  # PSG disconnections, e.g. bathroom breaks (human-scored only)
+
+# Valid sleep stage codes (everything that is not a disconnection or missing data)
+SLEEP_STAGES = np.array([WAKE, N1, N2, N3, REM])
+
+# Lookup tables cover every code from MIN_CODE to MAX_CODE, indexed by (code - MIN_CODE)
+MIN_CODE = NO_DATA_COLLECTED
+MAX_CODE = PSG_DISCONNECTION
+
+# Registry of stage encoding schemes: name -> {"mapping": {source code: target code}, "labels": {target code: label}}
+# Codes that are not listed in a mapping become NO_DATA_COLLECTED. NO_DATA_COLLECTED and
+# PSG_DISCONNECTION always keep their codes so every function can keep ignoring them.
+STAGE_SCHEMES = {
+    "aasm": {
+        "mapping": {WAKE: 0, N1: 1, N2: 2, N3: 3, REM: 4},
+        "labels": {0: "Wake", 1: "N1", 2: "N2", 3: "N3", 4: "REM"},
+    },
+    "rk": {
+        # R&K splits deep sleep into S3 and S4; the AASM N3 stage is reported as S3
+        "mapping": {WAKE: 0, N1: 1, N2: 2, N3: 3, REM: 5},
+        "labels": {0: "Wake", 1: "S1", 2: "S2", 3: "S3/S4", 5: "REM"},
+    },
+    "light_deep": {
+        "mapping": {WAKE: 0, N1: 1, N2: 1, N3: 2, REM: 3},
+        "labels": {0: "Wake", 1: "Light", 2: "Deep", 3: "REM"},
+    },
+    "wake_nrem_rem": {
+        "mapping": {WAKE: 0, N1: 1, N2: 1, N3: 1, REM: 2},
+        "labels": {0: "Wake", 1: "NREM", 2: "REM"},
+    },
+}
+
+# Lookup arrays are built once per scheme and reused for every hypnogram
+_lookup_tables = {}
+
+
+# Function to add a new stage encoding scheme to the registry
+def register_scheme(name, mapping, labels=None):
+    """
+    Adds (or replaces) a stage encoding scheme in the registry.
+
+    Parameters:
+    name (str): Name of the scheme.
+    mapping (dict): Source stage code -> target stage code. Target codes must be between 0 and MAX_CODE - 1.
+    labels (dict, optional): Target stage code -> readable label. Default is the code itself.
+
+    Returns:
+    None
+    """
+    for source, target in mapping.items():
+        if source not in SLEEP_STAGES:
+            raise ValueError(f"Unknown source stage code {source} in scheme '{name}'.")
+        if not 0 <= target < PSG_DISCONNECTION:
+            raise ValueError(f"Target stage code {target} of scheme '{name}' is out of range.")
+
+    labels = labels or {target: str(target) for target in mapping.values()}
+    STAGE_SCHEMES[name] = {"mapping": dict(mapping), "labels": dict(labels)}
+    _lookup_tables.pop(name, None)
+
+
+# Function to get the lookup array of a scheme
+def get_lookup_table(scheme):
+    """
+    Returns the lookup array that remaps every stage code of the event files for the given scheme.
+
+    Parameters:
+    scheme (str): Name of a registered scheme.
+
+    Returns:
+    numpy.ndarray: int8 array of length MAX_CODE - MIN_CODE + 1, indexed by (code - MIN_CODE).
+    """
+    if scheme not in STAGE_SCHEMES:
+        raise ValueError(f"Unknown stage scheme '{scheme}'. Available schemes: {sorted(STAGE_SCHEMES)}")
+
+    if scheme not in _lookup_tables:
+        table = np.full(MAX_CODE - MIN_CODE + 1, NO_DATA_COLLECTED, dtype=np.int8)
+        table[PSG_DISCONNECTION - MIN_CODE] = PSG_DISCONNECTION
+        for source, target in STAGE_SCHEMES[scheme]["mapping"].items():
+            table[source - MIN_CODE] = target
+        table.setflags(write=False)
+        _lookup_tables[scheme] = table
+
+    return _lookup_tables[scheme]
+
+
+# Function to remap a hypnogram to another stage encoding
+def remap_stages(hypnogram, scheme=None):
+    """
+    Remaps a hypnogram to the given scheme with a single NumPy take over the lookup array.
+
+    The source hypnogram is never modified.
+
+    Parameters:
+    hypnogram (array-like): Stage codes of every epoch.
+    scheme (str, optional): Name of a registered scheme. Default is None (return the hypnogram unchanged).
+
+    Returns:
+    numpy.ndarray: The remapped stage codes (int8), or the input as an array when scheme is None.
+    """
+    hypnogram = np.asarray(hypnogram)
+    if scheme is None:
+        return hypnogram
+
+    table = get_lookup_table(scheme)
+    if hypnogram.size and (hypnogram.min() < MIN_CODE or hypnogram.max() > MAX_CODE):
+        raise ValueError(f"Stage codes must be between {MIN_CODE} and {MAX_CODE}.")
+
+    return np.take(table, hypnogram - MIN_CODE)
+
+
+# Function to list the valid stage codes of a scheme
+def scheme_stages(scheme=None):
+    """
+    Returns the sorted valid stage codes of a scheme (used as rows/columns of confusion matrices).
+
+    Parameters:
+    scheme (str, optional): Name of a registered scheme. Default is None (the original 0-4 stages).
+
+    Returns:
+    numpy.ndarray: Sorted stage codes.
+    """
+    if scheme is None:
+        return SLEEP_STAGES
+    get_lookup_table(scheme)
+    return np.array(sorted(set(STAGE_SCHEMES[scheme]["mapping"].values())))
+
+
+# Function to translate stage codes into row/column positions of a confusion or transition matrix
+def stage_positions(hypnogram, stages=SLEEP_STAGES):
+    """
+    Translates stage codes into their position in `stages`, -1 for codes outside of it
+    (PSG disconnections, missing AI data).
+
+    Parameters:
+    hypnogram (array-like): Stage code of every epoch.
+    stages (array-like): Sorted stage codes that make up the matrix. Default is 0-4.
+
+    Returns:
+    numpy.ndarray: Position of every epoch's stage, or -1.
+    """
+    stages = np.asarray(stages)
+    hypnogram = np.asarray(hypnogram)
+    positions = np.searchsorted(stages, hypnogram).clip(0, len(stages) - 1)
+    return np.where(stages[positions] == hypnogram, positions, -1)
+
+
+# Function to get the readable label of a stage code
+def stage_label(code, scheme=None):
+    """
+    Returns the readable label of a stage code in the given scheme.
+
+    Parameters:
+    code (int): Stage code.
+    scheme (str, optional): Name of a registered scheme. Default is None (the original AASM labels).
+
+    Returns:
+    str: The label of the stage.
+    """
+    if code == NO_DATA_COLLECTED:
+        return "No data"
+    if code == PSG_DISCONNECTION:
+        return "PSG disconnection"
+    labels = STAGE_SCHEMES[scheme or "aasm"]["labels"]
+    return labels.get(int(code), str(code))
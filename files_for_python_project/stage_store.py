@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.streaming_pipeline import summarize_stages
+
+# Version of the store layout
+STORE_VERSION = 2
+
+# Files of a build: the stage array of all nights and the index that says where every night is
+STORE_ARRAY = "stages.npy"
+STORE_INDEX = "index.json"
+
+# Every build goes into its own folder; the pointer file names the current one
+STORE_BUILDS = "builds"
+STORE_POINTER = "CURRENT"
+
+# The store rows, in the order of load_night_stages
+STORE_SOURCES = ("majority", "ai_psg", "ai_hb")
+
+# The store a worker process attached to in its initializer
+_WORKER_STORE = None
+
+
+# Function to load the stages of all nights once into a memory-mapped store
+def build_stage_store(headband_files, psg_files, store_dir, scheme=None):
+    """
+    Reads every night once and writes the stages of all nights into one memory-mapped array.
+
+    Every build is written into a new folder under STORE_BUILDS, holding STORE_ARRAY, an int8 array
+    of shape 3 x total epochs (rows in the order of STORE_SOURCES, the nights one after the other),
+    and STORE_INDEX with the offset of every night. Only when both are complete is the STORE_POINTER
+    file swapped to the new build, so a reader always gets an array and index of the same build,
+    also when the store is rebuilt in place. Builds older than the previous one are removed.
+    A folder on a RAM-backed file system such as /dev/shm keeps the store in shared memory only.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    store_dir (str): Folder to write the store to (created if needed).
+    scheme (str, optional): Stage encoding scheme to store the stages in (see stage_encoding). Default is None.
+
+    Returns:
+    str: The store folder.
+    """
+    nights, used_headband_files, used_psg_files, hypnograms = [], [], [], []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        night = load_night_stages(headband_file, psg_file, scheme)
+        if night is None:
+            continue
+        nights.append(os.path.basename(psg_file).split("_")[0])
+        used_headband_files.append(headband_file)
+        used_psg_files.append(psg_file)
+        hypnograms.append(night)
+
+    lengths = [len(night[0]) for night in hypnograms]
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+    builds_dir = os.path.join(store_dir, STORE_BUILDS)
+    os.makedirs(builds_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix="build-", dir=builds_dir)
+    shape = (len(STORE_SOURCES), int(offsets[-1]))
+
+    stages = np.lib.format.open_memmap(os.path.join(build_dir, STORE_ARRAY), mode="w+", dtype=np.int8, shape=shape)
+    for index, night in enumerate(hypnograms):
+        stages[:, offsets[index]:offsets[index + 1]] = night
+    stages.flush()
+    del stages
+
+    with open(os.path.join(build_dir, STORE_INDEX), "w") as index_file:
+        json.dump({
+            "version": STORE_VERSION,
+            "scheme": scheme,
+            "sources": list(STORE_SOURCES),
+            "shape": list(shape),
+            "nights": nights,
+            "headband_files": used_headband_files,
+            "psg_files": used_psg_files,
+            "offsets": offsets.tolist(),
+        }, index_file)
+
+    # Swap the pointer in one rename; readers of the previous build keep a complete build
+    pointer_path = os.path.join(store_dir, STORE_POINTER)
+    previous_build = _current_build(store_dir)
+    with open(f"{pointer_path}.tmp", "w") as pointer_file:
+        pointer_file.write(os.path.basename(build_dir))
+    os.replace(f"{pointer_path}.tmp", pointer_path)
+
+    for name in os.listdir(builds_dir):
+        if name not in (os.path.basename(build_dir), previous_build):
+            shutil.rmtree(os.path.join(builds_dir, name), ignore_errors=True)
+
+    logging.info(f"Stored {len(nights)} nights ({offsets[-1]} epochs) in {build_dir}.")
+    return store_dir
+
+
+# Function to read the name of the current build of a store
+def _current_build(store_dir):
+    try:
+        with open(os.path.join(store_dir, STORE_POINTER)) as pointer_file:
+            return pointer_file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+# Function to attach to a store without reading it
+def open_stage_store(store_dir):
+    """
+    Opens the current build of a store written by build_stage_store. The stage array is memory-mapped
+    read-only, so every process that opens the same build shares the same pages instead of holding its own copy.
+
+    Parameters:
+    store_dir (str): The store folder, or the folder of one build (see the 'build' key).
+
+    Returns:
+    dict: 'stages' (read-only memory-mapped array), 'offsets' (numpy.ndarray, night i covers
+          offsets[i]:offsets[i + 1]), 'build' (folder of the opened build) and the 'nights',
+          'headband_files', 'psg_files' and 'scheme' of the index.
+    """
+    build_dir = store_dir
+    if not os.path.exists(os.path.join(store_dir, STORE_INDEX)):
+        build = _current_build(store_dir)
+        if build is None:
+            raise FileNotFoundError(f"No stage store found in {store_dir}.")
+        build_dir = os.path.join(store_dir, STORE_BUILDS, build)
+
+    with open(os.path.join(build_dir, STORE_INDEX)) as index_file:
+        index = json.load(index_file)
+    if index.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported store version {index.get('version')} in {build_dir}.")
+
+    index["offsets"] = np.array(index["offsets"], dtype=np.int64)
+    index["stages"] = np.load(os.path.join(build_dir, STORE_ARRAY), mmap_mode="r")
+    index["build"] = build_dir
+    # The index must describe exactly this array, or every night would be read at the wrong place
+    if list(index["stages"].shape) != index["shape"] or index["offsets"][-1] != index["shape"][1]:
+        raise ValueError(f"The index of {build_dir} does not match its stage array.")
+    return index
+
+
+# Function to get the stages of one night of a store
+def night_stages(store, index):
+    """
+    Returns the stages of one night as views into the store (nothing is copied).
+
+    Parameters:
+    store (dict): Store opened with open_stage_store.
+    index (int): Position of the night in store['nights'].
+
+    Returns:
+    tuple: (majority, ai_psg, ai_hb) read-only int8 arrays, like load_night_stages.
+    """
+    start, end = store["offsets"][index], store["offsets"][index + 1]
+    return tuple(store["stages"][:, start:end])
+
+
+# Function run once in every worker process
+def _attach_worker(store_dir):
+    global _WORKER_STORE
+    _WORKER_STORE = open_stage_store(store_dir)
+
+
+# Function run in a worker process for one night
+def _run_night(function, index):
+    return function(_WORKER_STORE["nights"][index], *night_stages(_WORKER_STORE, index))
+
+
+# Function to run an analysis over the nights of a store, optionally in worker processes
+def map_store_nights(function, store_dir, workers=1, indices=None, chunksize=16):
+    """
+    Calls function(night_id, majority, ai_psg, ai_hb) for every night of a store.
+
+    Worker processes attach to the store once and receive only night positions, so no stage
+    array or DataFrame is pickled or read again from the event files. All workers attach to the
+    build that was current when the call started, even if the store is rebuilt meanwhile.
+
+    Parameters:
+    function (callable): A module-level function (it is sent to the workers by name).
+    store_dir (str): The store folder.
+    workers (int): Number of worker processes. Default is 1.
+    indices (list, optional): Positions of the nights to process. Default is None (all nights).
+    chunksize (int): Nights sent to a worker at a time. Default is 16.
+
+    Returns:
+    list: The result of every night, in the order of indices.
+    """
+    store = open_stage_store(store_dir)
+    indices = range(len(store["nights"])) if indices is None else indices
+    if workers <= 1:
+        return [function(store["nights"][index], *night_stages(store, index)) for index in indices]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(store["build"],)) as executor:
+        return list(executor.map(_run_night, [function] * len(indices), indices, chunksize=chunksize))
+
+
+# Function to compute the main report numbers of one stored night
+def summarize_stored_night(night_id, majority, ai_psg, ai_hb):
+    """
+    Computes the summarize_stages numbers of one night, for use with map_store_nights.
+
+    Parameters:
+    night_id (str): The night (subject) ID.
+    majority (numpy.ndarray): Expert majority stage of every epoch.
+    ai_psg (numpy.ndarray): PSG AI stage of every epoch.
+    ai_hb (numpy.ndarray): Headband AI stage of every epoch.
+
+    Returns:
+    dict: 'subject' and the summarize_stages results.
+    """
+    row = {"subject": night_id}
+    row.update(summarize_stages(majority, ai_psg, ai_hb))
+    return row
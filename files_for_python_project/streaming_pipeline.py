@@ -0,0 +1,248 @@
+import csv
+import itertools
+import os
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION
+from files_for_python_project.telemetry import new_progress, update_progress, finish_progress
+
+# Constants
+EPOCH_SECONDS = 30
+MAX_ERROR_PERCENTAGE = 40
+# Rough peak memory needed to read and summarize one night (two small DataFrames and their arrays).
+# A fixed estimate for a night of normal length; it is not measured, so longer nights need more
+ESTIMATED_NIGHT_BYTES = 2 * 1024 * 1024
+
+# Columns of the per-night rows written to the spill file
+NIGHT_COLUMNS = ["subject", "headband_file", "psg_file", "hb_match", "psg_match", "error_hours", "total_hours"]
+
+
+# Function to compute every per-night number of the main report from the stage arrays of a night
+def summarize_stages(majority, ai_psg, ai_hb):
+    """
+    Computes the per-night results of the main report from the aligned stage arrays of one night.
+
+    The numbers follow headband_vs_majority, aispg_vs_majority, error_hours_count and total_sleeping_hours.
+
+    Parameters:
+    majority (numpy.ndarray): Expert majority stage of every epoch.
+    ai_psg (numpy.ndarray): PSG AI stage of every epoch.
+    ai_hb (numpy.ndarray): Headband AI stage of every epoch.
+
+    Returns:
+    dict: 'hb_match' and 'psg_match' (percentages, may be None), 'error_hours' and 'total_hours'.
+    """
+    expert_valid = majority != PSG_DISCONNECTION
+    hb_match = None
+    psg_match = None
+
+    if expert_valid.any():
+        # PSG AI: every epoch that is not a PSG disconnection
+        psg_match = float((ai_psg[expert_valid] == majority[expert_valid]).mean() * 100)
+
+        # Headband AI: skip nights with too much missing data, then ignore the missing epochs
+        hb_missing = ai_hb[expert_valid] == NO_DATA_COLLECTED
+        if hb_missing.mean() * 100 < MAX_ERROR_PERCENTAGE:
+            hb_valid = expert_valid & (ai_hb != NO_DATA_COLLECTED)
+            hb_match = float((ai_hb[hb_valid] == majority[hb_valid]).mean() * 100)
+
+    # Same conventions as error_hours_count and total_sleeping_hours (which leaves out the first row)
+    error_hours = int((ai_hb == NO_DATA_COLLECTED).sum()) * EPOCH_SECONDS / 3600
+    total_hours = max(len(ai_hb) - 1, 0) * EPOCH_SECONDS / 3600
+
+    return {"hb_match": hb_match, "psg_match": psg_match, "error_hours": error_hours, "total_hours": total_hours}
+
+
+# Function to compute every per-night number of the main report from one read of the night
+def summarize_night(headband_file, psg_file):
+    """
+    Computes the per-night results of the main report after reading each file once.
+
+    Parameters:
+    headband_file (str): Path to the headband event file (headband_events.tsv).
+    psg_file (str): Path to the PSG event file (psg_events.tsv).
+
+    Returns:
+    dict or None: One row with the NIGHT_COLUMNS keys ('hb_match' and 'psg_match' may be None),
+                  or None if the night cannot be read.
+    """
+    stages = load_night_stages(headband_file, psg_file)
+    if stages is None:
+        return None
+
+    row = {
+        "subject": os.path.basename(psg_file).split("_")[0],
+        "headband_file": headband_file,
+        "psg_file": psg_file,
+    }
+    row.update(summarize_stages(*stages))
+    return row
+
+
+# Generator that yields the per-night rows of a stream of file pairs
+def iter_night_results(file_pairs):
+    """
+    Lazily summarizes every night of a stream of (headband_file, psg_file) pairs.
+
+    Parameters:
+    file_pairs (iterable): Pairs of headband and PSG event file paths.
+
+    Yields:
+    dict: The summarize_night row of every readable night.
+    """
+    for headband_file, psg_file in file_pairs:
+        row = summarize_night(headband_file, psg_file)
+        if row is not None:
+            yield row
+
+
+# Generator that groups any iterable into lists of a fixed size
+def batched(iterable, batch_size):
+    """
+    Yields lists of at most batch_size consecutive items from the iterable.
+
+    Parameters:
+    iterable (iterable): Items to group.
+    batch_size (int): Maximum number of items per batch.
+
+    Yields:
+    list: The next batch of items.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# Function to create an empty set of running aggregates
+def new_aggregates():
+    """
+    Creates the running sums from which the dataset-wide report is computed.
+
+    Returns:
+    dict: Running sums, all starting at zero.
+    """
+    return {"nights": 0, "hb_sum": 0.0, "hb_nights": 0, "psg_sum": 0.0, "psg_nights": 0,
+            "error_hours": 0.0, "total_hours": 0.0}
+
+
+# Function to add (or remove) per-night rows to the running aggregates
+def update_aggregates(aggregates, rows, sign=1):
+    """
+    Adds a batch of per-night rows to the running aggregates (in place).
+
+    Parameters:
+    aggregates (dict): Running sums created by new_aggregates.
+    rows (iterable): Per-night rows created by summarize_night.
+    sign (int): 1 to add the rows, -1 to remove rows that were added before. Default is 1.
+
+    Returns:
+    dict: The updated aggregates.
+    """
+    for row in rows:
+        aggregates["nights"] += sign
+        if row["hb_match"] is not None:
+            aggregates["hb_sum"] += sign * row["hb_match"]
+            aggregates["hb_nights"] += sign
+        if row["psg_match"] is not None:
+            aggregates["psg_sum"] += sign * row["psg_match"]
+            aggregates["psg_nights"] += sign
+        aggregates["error_hours"] += sign * row["error_hours"]
+        aggregates["total_hours"] += sign * row["total_hours"]
+    return aggregates
+
+
+# Function to turn running aggregates into the numbers of the main report
+def final_report(aggregates):
+    """
+    Computes the dataset-wide numbers of the main report from the running aggregates.
+
+    Parameters:
+    aggregates (dict): Running sums created by new_aggregates and update_aggregates.
+
+    Returns:
+    dict: 'nights', 'hb_match' and 'psg_match' (mean per-night percentages, None without nights),
+          'error_hours' and 'total_hours'.
+    """
+    return {
+        "nights": aggregates["nights"],
+        "hb_match": aggregates["hb_sum"] / aggregates["hb_nights"] if aggregates["hb_nights"] else None,
+        "psg_match": aggregates["psg_sum"] / aggregates["psg_nights"] if aggregates["psg_nights"] else None,
+        "error_hours": aggregates["error_hours"],
+        "total_hours": aggregates["total_hours"],
+    }
+
+
+# Function to append per-night rows to the spill file on disk
+def spill_rows(spill_path, rows):
+    """
+    Appends per-night rows to a tab-separated spill file, writing the header when the file is new.
+
+    Parameters:
+    spill_path (str): Path to the spill file.
+    rows (list): Per-night rows created by summarize_night.
+
+    Returns:
+    None
+    """
+    write_header = not os.path.exists(spill_path) or os.path.getsize(spill_path) == 0
+    with open(spill_path, "a", newline="") as spill_file:
+        writer = csv.DictWriter(spill_file, fieldnames=NIGHT_COLUMNS, delimiter="\t")
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+# Function to estimate the batch size that fits in a memory budget
+def batch_size_for_budget(memory_budget_mb):
+    """
+    Estimates the number of nights per batch from a memory budget, assuming every night takes
+    ESTIMATED_NIGHT_BYTES. The budget is a sizing hint: memory is not measured or enforced, and
+    nights longer than the estimate take more.
+
+    Parameters:
+    memory_budget_mb (float): Approximate memory budget in megabytes.
+
+    Returns:
+    int: Number of nights per batch (at least 1).
+    """
+    return max(1, int(memory_budget_mb * 1024 * 1024 // ESTIMATED_NIGHT_BYTES))
+
+
+# Function to run the whole analysis in bounded memory
+def stream_dataset(base_folder, spill_path=None, memory_budget_mb=64, batch_size=None):
+    """
+    Runs the analysis of main.py as a stream, from discovery to the final aggregates.
+
+    Nights are discovered lazily and processed in fixed-size batches; per-night rows are spilled
+    to disk after every batch, so memory use stays flat however many nights there are.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+    spill_path (str, optional): Tab-separated file the per-night rows are written to; an existing file is
+                                replaced. Default is None (no spill).
+    memory_budget_mb (float): Approximate memory budget used to estimate the batch size (see
+                              batch_size_for_budget; not measured or enforced). Default is 64.
+    batch_size (int, optional): Nights per batch, overrides memory_budget_mb. Default is None.
+
+    Returns:
+    dict: The final_report of the dataset.
+    """
+    batch_size = batch_size or batch_size_for_budget(memory_budget_mb)
+    aggregates = new_aggregates()
+    progress = new_progress()
+    # Start a fresh spill file, so a rerun does not append every night a second time
+    if spill_path is not None and os.path.exists(spill_path):
+        os.remove(spill_path)
+
+    rows = iter_night_results(iter_event_files(base_folder))
+    for batch in batched(rows, batch_size):
+        update_aggregates(aggregates, batch)
+        if spill_path is not None:
+            spill_rows(spill_path, batch)
+        update_progress(progress, len(batch))
+
+    finish_progress(progress)
+    return final_report(aggregates)
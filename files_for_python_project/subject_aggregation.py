@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+import os
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.streaming_pipeline import EPOCH_SECONDS, MAX_ERROR_PERCENTAGE
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION
+
+# Label of attributes that are missing from the participants file (the BIDS convention)
+MISSING_ATTRIBUTE = "n/a"
+
+# Label of the dataset-wide row of aggregate_groups
+DATASET_LABEL = "all"
+
+# Per-night epoch counts kept by night_count_table
+COUNT_COLUMNS = ["hb_matched", "hb_epochs", "psg_matched", "psg_epochs", "error_epochs", "total_epochs"]
+
+
+# Function to count the epochs behind the per-night numbers of the main report
+def night_epoch_counts(majority, ai_psg, ai_hb):
+    """
+    Counts the matching and compared epochs of one night, with the rules of summarize_stages.
+
+    Parameters:
+    majority (numpy.ndarray): Expert majority stage of every epoch.
+    ai_psg (numpy.ndarray): PSG AI stage of every epoch.
+    ai_hb (numpy.ndarray): Headband AI stage of every epoch.
+
+    Returns:
+    dict: The COUNT_COLUMNS epoch counts. A headband night with too much missing data has hb_epochs == 0.
+    """
+    expert_valid = majority != PSG_DISCONNECTION
+    psg_epochs = int(expert_valid.sum())
+    psg_matched = int((ai_psg[expert_valid] == majority[expert_valid]).sum())
+
+    hb_epochs = 0
+    hb_matched = 0
+    hb_missing = int((ai_hb[expert_valid] == NO_DATA_COLLECTED).sum())
+    if psg_epochs and hb_missing * 100 / psg_epochs < MAX_ERROR_PERCENTAGE:
+        hb_valid = expert_valid & (ai_hb != NO_DATA_COLLECTED)
+        hb_epochs = int(hb_valid.sum())
+        hb_matched = int((ai_hb[hb_valid] == majority[hb_valid]).sum())
+
+    return {
+        "hb_matched": hb_matched,
+        "hb_epochs": hb_epochs,
+        "psg_matched": psg_matched,
+        "psg_epochs": psg_epochs,
+        "error_epochs": int((ai_hb == NO_DATA_COLLECTED).sum()),
+        # Same convention as total_sleeping_hours, which leaves out the first row
+        "total_epochs": max(len(ai_hb) - 1, 0),
+    }
+
+
+# Function to read every night once into a table of epoch counts
+def night_count_table(headband_files, psg_files, scheme=None):
+    """
+    Reads every night once and keeps only its epoch counts.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    pandas.DataFrame: One row per readable night with 'subject', 'psg_file' and the COUNT_COLUMNS.
+    """
+    rows = []
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        stages = load_night_stages(headband_file, psg_file, scheme=scheme)
+        if stages is None:
+            continue
+        row = {"subject": os.path.basename(psg_file).split("_")[0], "psg_file": psg_file}
+        row.update(night_epoch_counts(*stages))
+        rows.append(row)
+
+    table = pd.DataFrame(rows, columns=["subject", "psg_file"] + COUNT_COLUMNS)
+    return table.astype({column: np.int64 for column in COUNT_COLUMNS})
+
+
+# Function to read a BIDS participants.tsv-style sidecar
+def read_participants(participants_file):
+    """
+    Reads the subject attributes (e.g. site, cohort, device) of a participants.tsv-style file.
+
+    Parameters:
+    participants_file (str): Path to a tab-separated file with a 'participant_id' column.
+
+    Returns:
+    pandas.DataFrame: One row per participant, indexed by participant_id, all values as strings.
+    """
+    participants = pd.read_csv(participants_file, sep="\t", dtype=str, keep_default_na=False)
+    if "participant_id" not in participants.columns:
+        raise ValueError(f"{participants_file} has no 'participant_id' column.")
+    return participants.set_index("participant_id")
+
+
+# Function to aggregate nights by subject and participant attributes
+def aggregate_groups(nights, participants=None, group_by=("subject",), weight="epochs"):
+    """
+    Computes the agreement and missing-data numbers per group of nights and for the whole dataset.
+
+    All groups are reduced at once: every night gets a group code and every statistic is one
+    np.bincount over those codes. The dataset-wide row is the sum of the group sums.
+
+    Parameters:
+    nights (pandas.DataFrame): Table created by night_count_table.
+    participants (pandas.DataFrame, optional): Table created by read_participants. Default is None.
+    group_by (sequence): 'subject' and/or participant attributes to group by, e.g. ('site',) or
+                         ('site', 'subject'). Default is ('subject',).
+    weight (str): 'epochs' to pool the epochs of the group, or 'nights' to average the per-night
+                  percentages (the convention of main.py). Default is 'epochs'.
+
+    Returns:
+    pandas.DataFrame: One row per group, plus a last row labelled DATASET_LABEL, with 'nights',
+                      'subjects', 'hb_match', 'psg_match' (percentages, NaN without compared epochs),
+                      'error_hours' and 'total_hours'.
+    """
+    if weight not in ("epochs", "nights"):
+        raise ValueError(f"Unknown weight '{weight}'. Use 'epochs' or 'nights'.")
+    group_by = list(group_by)
+
+    # Attach the participant attributes to every night
+    table = nights
+    attributes = [column for column in group_by if column != "subject"]
+    if attributes:
+        if participants is None:
+            raise ValueError(f"Grouping by {', '.join(attributes)} needs a participants table.")
+        missing = [column for column in attributes if column not in participants.columns]
+        if missing:
+            raise ValueError(f"Unknown participant attributes: {', '.join(missing)}.")
+        table = nights.join(participants[attributes], on="subject")
+        table[attributes] = table[attributes].fillna(MISSING_ATTRIBUTE).replace("", MISSING_ATTRIBUTE)
+
+    # One integer code per group of nights
+    keys = [pd.factorize(table[column], sort=True) for column in group_by]
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([key_codes for key_codes, _ in keys]), sort=True)
+    n_groups = len(uniques)
+
+    def group_sum(values):
+        sums = np.bincount(codes, weights=values, minlength=n_groups)
+        return np.append(sums, sums.sum())
+
+    counts = {column: table[column].to_numpy(dtype=float) for column in COUNT_COLUMNS}
+    nights_per_group = group_sum(np.ones(len(table)))
+
+    # Distinct subjects per group: count every (group, subject) pair once
+    subject_codes = pd.factorize(table["subject"])[0]
+    pairs = np.unique(np.stack([codes, subject_codes]), axis=1)
+    subjects = np.append(np.bincount(pairs[0], minlength=n_groups), len(np.unique(subject_codes)))
+
+    result = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for source in ("hb", "psg"):
+            matched = counts[f"{source}_matched"]
+            compared = counts[f"{source}_epochs"]
+            if weight == "epochs":
+                result[f"{source}_match"] = 100 * group_sum(matched) / group_sum(compared)
+            else:
+                has_epochs = compared > 0
+                percentages = np.where(has_epochs, 100 * matched / np.where(has_epochs, compared, 1), 0)
+                result[f"{source}_match"] = group_sum(percentages) / group_sum(has_epochs.astype(float))
+
+    # Group labels, with DATASET_LABEL in every column of the dataset-wide row
+    labels = {}
+    for level, column in enumerate(group_by):
+        level_values = keys[level][1][uniques.get_level_values(level)]
+        labels[column] = list(level_values) + [DATASET_LABEL]
+
+    summary = pd.DataFrame(labels)
+    summary["nights"] = nights_per_group.astype(np.int64)
+    summary["subjects"] = subjects.astype(np.int64)
+    summary["hb_match"] = result["hb_match"]
+    summary["psg_match"] = result["psg_match"]
+    summary["error_hours"] = group_sum(counts["error_epochs"]) * EPOCH_SECONDS / 3600
+    summary["total_hours"] = group_sum(counts["total_epochs"]) * EPOCH_SECONDS / 3600
+    return summary
+
+
+# Function to aggregate the dataset at several levels at once
+def hierarchical_summary(headband_files, psg_files, participants_file=None, levels=(("subject",),),
+                         weight="epochs", scheme=None):
+    """
+    Reads every night once and aggregates it at each of the given grouping levels.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    participants_file (str, optional): Path to a participants.tsv-style file. Default is None.
+    levels (sequence): Grouping levels, each a sequence of columns for aggregate_groups,
+                       e.g. (('site',), ('site', 'subject')). Default is (('subject',),).
+    weight (str): 'epochs' or 'nights', see aggregate_groups. Default is 'epochs'.
+    scheme (str, optional): Stage encoding scheme to compare in (see stage_encoding). Default is None.
+
+    Returns:
+    dict: Maps every level (joined with '/', e.g. 'site/subject') to its aggregate_groups table.
+    """
+    nights = night_count_table(headband_files, psg_files, scheme=scheme)
+    participants = read_participants(participants_file) if participants_file is not None else None
+    return {"/".join(level): aggregate_groups(nights, participants, level, weight) for level in levels}
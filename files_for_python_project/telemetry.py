@@ -0,0 +1,161 @@
+import json
+import logging
+import time
+
+# Default seconds between two progress reports
+DEFAULT_INTERVAL = 5.0
+
+# Settings used by every new progress tracker, changed once by the entry point with configure_progress
+PROGRESS_SETTINGS = {"interval": DEFAULT_INTERVAL, "stream_path": None}
+
+
+# Function to set how often progress is reported and where the machine-readable stream goes
+def configure_progress(interval=DEFAULT_INTERVAL, stream_path=None):
+    """
+    Sets the defaults of every progress tracker created afterwards.
+
+    Parameters:
+    interval (float): Seconds between two progress reports. Default is DEFAULT_INTERVAL.
+    stream_path (str, optional): File every progress report is appended to as one line of JSON, for a
+                                 scheduler to poll. Default is None (no stream).
+
+    Returns:
+    dict: The current settings.
+    """
+    PROGRESS_SETTINGS["interval"] = interval
+    PROGRESS_SETTINGS["stream_path"] = stream_path
+    return PROGRESS_SETTINGS
+
+
+# Function to start tracking the progress of a run
+def new_progress(total=None, label="nights", interval=None, stream_path=None, clock=time.monotonic):
+    """
+    Creates the progress state of a run. Updating it costs one clock call; reports are rate-limited.
+
+    Parameters:
+    total (int, optional): Number of items of the run, if known. Default is None.
+    label (str): Name of the items, used in the log line. Default is 'nights'.
+    interval (float, optional): Seconds between two reports. Default is None (PROGRESS_SETTINGS).
+    stream_path (str, optional): NDJSON progress file. Default is None (PROGRESS_SETTINGS).
+    clock (callable): Returns the current time in seconds. Default is time.monotonic.
+
+    Returns:
+    dict: The progress state, to pass to update_progress and finish_progress.
+    """
+    started = clock()
+    return {
+        "label": label,
+        "total": total,
+        "done": 0,
+        "started": started,
+        "last_report": started,
+        "interval": PROGRESS_SETTINGS["interval"] if interval is None else interval,
+        "stream_path": stream_path or PROGRESS_SETTINGS["stream_path"],
+        "clock": clock,
+    }
+
+
+# Function to describe the progress of a run as plain values
+def progress_snapshot(progress, now=None, finished=False):
+    """
+    Computes the done/total counts, throughput and estimated time left of a run.
+
+    Parameters:
+    progress (dict): State created by new_progress.
+    now (float, optional): Current clock time. Default is None (read the clock).
+    finished (bool): Whether the run is over. Default is False.
+
+    Returns:
+    dict: 'label', 'done', 'total', 'elapsed' (s), 'rate' (items/s), 'eta' (s, None when unknown) and 'finished'.
+    """
+    now = progress["clock"]() if now is None else now
+    elapsed = now - progress["started"]
+    rate = progress["done"] / elapsed if elapsed > 0 else None
+    eta = None
+    if progress["total"] is not None and rate:
+        eta = max(progress["total"] - progress["done"], 0) / rate
+    return {"label": progress["label"], "done": progress["done"], "total": progress["total"],
+            "elapsed": elapsed, "rate": rate, "eta": eta, "finished": finished}
+
+
+# Function to log a progress line and append it to the progress stream
+def report_progress(progress, now=None, finished=False):
+    """
+    Logs the progress of a run at INFO level and appends it to the NDJSON progress stream, if any.
+
+    Parameters:
+    progress (dict): State created by new_progress.
+    now (float, optional): Current clock time. Default is None (read the clock).
+    finished (bool): Whether the run is over. Default is False.
+
+    Returns:
+    dict: The progress_snapshot that was reported.
+    """
+    snapshot = progress_snapshot(progress, now, finished)
+    progress["last_report"] = snapshot["elapsed"] + progress["started"]
+
+    done = f"{snapshot['done']}/{snapshot['total']}" if snapshot["total"] is not None else str(snapshot["done"])
+    rate = f"{snapshot['rate']:.1f}" if snapshot["rate"] is not None else "-"
+    eta = f"{snapshot['eta']:.0f} s" if snapshot["eta"] is not None else "unknown"
+    logging.info("%s %s %s (%s/s, %s)", "Finished" if finished else "Progress:", done, snapshot["label"], rate,
+                 f"{snapshot['elapsed']:.1f} s" if finished else f"ETA {eta}")
+
+    if progress["stream_path"] is not None:
+        with open(progress["stream_path"], "a") as stream:
+            stream.write(json.dumps({**snapshot, "time": time.time()}) + "\n")
+    return snapshot
+
+
+# Function to count finished items, reporting at most once per interval
+def update_progress(progress, count=1):
+    """
+    Adds finished items to the run and reports the progress when the interval has passed.
+
+    Parameters:
+    progress (dict): State created by new_progress.
+    count (int): Number of items finished since the last update. Default is 1.
+
+    Returns:
+    None
+    """
+    progress["done"] += count
+    now = progress["clock"]()
+    if now - progress["last_report"] >= progress["interval"]:
+        report_progress(progress, now)
+
+
+# Function to report the end of a run
+def finish_progress(progress):
+    """
+    Reports the final count, throughput and duration of a run.
+
+    Parameters:
+    progress (dict): State created by new_progress.
+
+    Returns:
+    dict: The final progress_snapshot.
+    """
+    return report_progress(progress, finished=True)
+
+
+# Generator that tracks the progress of a loop
+def track_progress(iterable, total=None, label="nights", **options):
+    """
+    Yields the items of an iterable and counts every item as finished when the next one is asked for.
+
+    Parameters:
+    iterable (iterable): The items of the run.
+    total (int, optional): Number of items, if known (taken from len() when available). Default is None.
+    label (str): Name of the items. Default is 'nights'.
+    **options: Other new_progress arguments.
+
+    Yields:
+    The items of the iterable.
+    """
+    if total is None and hasattr(iterable, "__len__"):
+        total = len(iterable)
+    progress = new_progress(total, label, **options)
+    for item in iterable:
+        yield item
+        update_progress(progress)
+    finish_progress(progress)
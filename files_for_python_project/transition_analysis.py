@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+import logging
+import os
+from files_for_python_project.functions_for_comparing_data import load_night_stages
+from files_for_python_project.stage_encoding import NO_DATA_COLLECTED, PSG_DISCONNECTION
+
+# Constants
+MAX_ERROR_PERCENTAGE = 40
+
+
+# Function to measure how far every epoch is from the nearest expert stage change
+def distance_to_transition(majority):
+    """
+    Calculates, for each epoch, the distance in epochs to the nearest change in the expert stage.
+
+    The two epochs on either side of a stage change both have distance 0.
+
+    Parameters:
+    majority (array-like): Expert majority stage of every epoch of one night.
+
+    Returns:
+    numpy.ndarray: Distance (in epochs) to the nearest stage change. Nights without
+                   any change get the length of the night for every epoch.
+    """
+    majority = np.asarray(majority)
+    n_epochs = len(majority)
+    if n_epochs == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    index = np.arange(n_epochs)
+
+    # An epoch starts a new run when its stage differs from the previous epoch
+    run_start = np.zeros(n_epochs, dtype=bool)
+    run_start[1:] = majority[1:] != majority[:-1]
+    if not run_start.any():
+        return np.full(n_epochs, n_epochs, dtype=np.int64)
+
+    # Index of the latest run start at or before each epoch (epochs after a change)
+    previous_start = np.where(run_start, index, -n_epochs)
+    previous_start = np.maximum.accumulate(previous_start)
+    distance_after = index - previous_start
+
+    # Index of the next run start after each epoch (epochs before a change)
+    next_start = np.where(run_start, index, 2 * n_epochs)
+    next_start = np.minimum.accumulate(next_start[::-1])[::-1]
+    next_start = np.append(next_start[1:], 2 * n_epochs)
+    distance_before = next_start - 1 - index
+
+    return np.minimum(distance_after, distance_before).astype(np.int64)
+
+
+# Function to count the epochs where the AI matches the experts within a few epochs
+def transition_tolerant_counts(majority, ai, k=1, valid=None):
+    """
+    Counts the epochs where the AI stage matches any expert stage within +-k epochs.
+
+    Parameters:
+    majority (array-like): Expert majority stage of every epoch.
+    ai (array-like): AI stage of every epoch (same length as majority).
+    k (int): Number of epochs the AI may be shifted in either direction. Default is 1.
+    valid (array-like, optional): Epochs to count. Default is None (every epoch that is not a
+                                  PSG disconnection and where the AI has data).
+
+    Returns:
+    tuple: (hits, epochs), the number of matching epochs and of counted epochs.
+    """
+    # int64, so the padding value below fits whatever type the stages were read as
+    majority = np.asarray(majority, dtype=np.int64)
+    ai = np.asarray(ai)
+    if valid is None:
+        valid = (majority != PSG_DISCONNECTION) & (ai != NO_DATA_COLLECTED)
+    valid = np.asarray(valid, dtype=bool)
+    if not valid.any():
+        return 0, 0
+
+    # Pad with a value that never matches, then compare the AI against every shifted expert view
+    padded = np.pad(majority, k, constant_values=np.iinfo(np.int64).min)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * k + 1)
+    matched = (windows == ai[:, None]).any(axis=1)
+
+    return int(matched[valid].sum()), int(valid.sum())
+
+
+# Function to compute agreement when the AI may be off by a few epochs
+def transition_tolerant_agreement(majority, ai, k=1):
+    """
+    Calculates the percentage of epochs where the AI stage matches any expert stage within +-k epochs.
+
+    Epochs the experts marked as PSG disconnection and epochs where the AI has no data are ignored.
+
+    Parameters:
+    majority (array-like): Expert majority stage of every epoch.
+    ai (array-like): AI stage of every epoch (same length as majority).
+    k (int): Number of epochs the AI may be shifted in either direction. Default is 1.
+
+    Returns:
+    float or None: Percentage of tolerant agreement, or None if there are no valid epochs.
+    """
+    hits, epochs = transition_tolerant_counts(majority, ai, k)
+    if not epochs:
+        return None
+    return hits / epochs * 100
+
+
+# Function to compute the agreement of both AI sources as a function of the distance to a stage change
+def agreement_by_transition_distance(headband_files, psg_files, max_distance=10, tolerance=1, scheme=None):
+    """
+    Measures headband and PSG AI agreement with the experts as a function of the
+    distance (in epochs) to the nearest expert stage change, across all nights.
+
+    Headband nights whose error rate reaches the same threshold used by
+    headband_vs_majority are left out of the headband figures.
+
+    Parameters:
+    headband_files (list): Paths to the headband event files.
+    psg_files (list): Paths to the PSG event files (same order as headband_files).
+    max_distance (int): Distances of max_distance or more are pooled into the last row. Default is 10.
+    tolerance (int): Shift (in epochs) allowed by the transition-tolerant agreement score. Default is 1.
+    scheme (str, optional): Stage encoding scheme to analyse in (see stage_encoding). Transitions are
+                            measured in the remapped stages. Default is None.
+
+    Returns:
+    tuple: (pandas.DataFrame, dict)
+           - DataFrame with one row per distance and the columns 'distance', 'psg_epochs',
+             'psg_agreement', 'hb_epochs' and 'hb_agreement' (percentages, NaN when there are no epochs).
+           - Dictionary with the dataset-wide transition-tolerant agreement of 'psg' and 'hb'.
+    """
+    distances, psg_match, psg_valid, hb_match, hb_valid = [], [], [], [], []
+    tolerant_hits = {"psg": 0, "hb": 0}
+    tolerant_epochs = {"psg": 0, "hb": 0}
+
+    for headband_file, psg_file in zip(headband_files, psg_files):
+        stages = load_night_stages(headband_file, psg_file, scheme)
+        if stages is None:
+            continue
+        majority, ai_psg, ai_hb = stages
+
+        expert_valid = majority != PSG_DISCONNECTION
+        night_hb_valid = expert_valid & (ai_hb != NO_DATA_COLLECTED)
+
+        # Skip the headband part of nights with too much missing data
+        if expert_valid.any():
+            error_percentage = (ai_hb[expert_valid] == NO_DATA_COLLECTED).mean() * 100
+            if error_percentage >= MAX_ERROR_PERCENTAGE:
+                file_id = os.path.basename(headband_file).split("_")[0]
+                logging.debug("Error rate is too high for %s (%.2f%%), skipping headband epochs.", file_id, error_percentage)
+                night_hb_valid[:] = False
+
+        distances.append(np.minimum(distance_to_transition(majority), max_distance))
+        psg_match.append(ai_psg == majority)
+        psg_valid.append(expert_valid)
+        hb_match.append(ai_hb == majority)
+        hb_valid.append(night_hb_valid)
+
+        # Count the tolerant hits over the same epochs as the binned agreement, so nights are weighted
+        # by epochs and tolerance=0 gives the pooled plain agreement
+        for key, ai, valid in (("psg", ai_psg, expert_valid), ("hb", ai_hb, night_hb_valid)):
+            hits, epochs = transition_tolerant_counts(majority, ai, tolerance, valid)
+            tolerant_hits[key] += hits
+            tolerant_epochs[key] += epochs
+
+    n_bins = max_distance + 1
+    result = {"distance": np.arange(n_bins)}
+
+    if distances:
+        distances = np.concatenate(distances)
+        for key, match, valid in (("psg", psg_match, psg_valid), ("hb", hb_match, hb_valid)):
+            match = np.concatenate(match)
+            valid = np.concatenate(valid)
+
+            # One bincount per source gives epochs and matches for every distance at once
+            epochs = np.bincount(distances[valid], minlength=n_bins)
+            matches = np.bincount(distances[valid], weights=match[valid], minlength=n_bins)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                agreement = np.where(epochs > 0, matches / epochs * 100, np.nan)
+            result[f"{key}_epochs"] = epochs
+            result[f"{key}_agreement"] = agreement
+    else:
+        logging.warning("No valid nights found for the transition analysis.")
+        for key in ("psg", "hb"):
+            result[f"{key}_epochs"] = np.zeros(n_bins, dtype=np.int64)
+            result[f"{key}_agreement"] = np.full(n_bins, np.nan)
+
+    tolerant = {
+        key: (tolerant_hits[key] / tolerant_epochs[key] * 100) if tolerant_epochs[key] else None
+        for key in ("psg", "hb")
+    }
+
+    return pd.DataFrame(result), tolerant
@@ -0,0 +1,171 @@
+import logging
+import time
+from files_for_python_project.find_file_function import iter_event_files
+from files_for_python_project.streaming_pipeline import summarize_night, new_aggregates, update_aggregates, final_report
+from files_for_python_project.results_database import (
+    connect_database,
+    file_fingerprint,
+    subject_from_path,
+    upsert_nights,
+    delete_nights,
+)
+
+# Function to take a snapshot of every event file pair and its fingerprints
+def scan_dataset(base_folder):
+    """
+    Lists every complete event file pair of the dataset with the fingerprints of both files.
+
+    Only directory entries and file metadata are read, never the file contents.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+
+    Returns:
+    dict: subject_id -> (headband_file, psg_file, (headband_fingerprint, psg_fingerprint))
+    """
+    snapshot = {}
+    for headband_file, psg_file in iter_event_files(base_folder):
+        try:
+            fingerprints = (file_fingerprint(headband_file)[2], file_fingerprint(psg_file)[2])
+        except OSError:
+            # The file was removed (or is being replaced) between listing and stat
+            continue
+        snapshot[subject_from_path(psg_file)[0]] = (headband_file, psg_file, fingerprints)
+    return snapshot
+
+
+# Function to create the state kept between watch cycles
+def new_watch_state(database_path=None):
+    """
+    Creates the state of a watch session: last snapshot, per-night rows and running aggregates.
+
+    When a results database is given, the nights it already holds are loaded so they are not recomputed.
+
+    Parameters:
+    database_path (str, optional): Path to the SQLite results database. Default is None.
+
+    Returns:
+    dict: The watch state.
+    """
+    state = {"snapshot": {}, "rows": {}, "aggregates": new_aggregates(), "connection": None}
+    if database_path is None:
+        return state
+
+    connection = connect_database(database_path)
+    state["connection"] = connection
+
+    # Rebuild the snapshot and the aggregates from what the database already knows
+    fingerprints = {row["path"]: row["fingerprint"] for row in connection.execute("SELECT path, fingerprint FROM files")}
+    for row in connection.execute("SELECT * FROM night_metrics"):
+        row = dict(row)
+        subject_id = row["subject_id"]
+        state["snapshot"][subject_id] = (row["headband_file"], row["psg_file"],
+                                         (fingerprints.get(row["headband_file"]), fingerprints.get(row["psg_file"])))
+        state["rows"][subject_id] = row
+        update_aggregates(state["aggregates"], [row])
+
+    return state
+
+
+# Function to run one watch cycle
+def watch_cycle(state, base_folder):
+    """
+    Detects new, changed and removed nights since the last cycle and updates the state incrementally.
+
+    Only the new or changed nights are read and summarized; their old contribution to the running
+    aggregates is removed before the new one is added. A night that leaves the snapshot, because its
+    files were removed or can no longer be read, loses its contribution, row and database entry at
+    once, so nothing of it is left behind. Changes are written to the results database of the state,
+    if there is one.
+
+    Parameters:
+    state (dict): Watch state created by new_watch_state.
+    base_folder (str): The path to the base folder containing the subject data folders.
+
+    Returns:
+    dict: {'changed': list of processed subject IDs, 'removed': list of subject IDs that left the dataset numbers}
+    """
+    snapshot = scan_dataset(base_folder)
+    previous = state["snapshot"]
+
+    changed = [subject_id for subject_id, entry in snapshot.items()
+               if subject_id not in previous or previous[subject_id] != entry]
+    removed = [subject_id for subject_id in previous if subject_id not in snapshot]
+
+    new_rows = []
+    for subject_id in changed:
+        headband_file, psg_file, _ = snapshot[subject_id]
+        row = summarize_night(headband_file, psg_file)
+        if row is None:
+            # Unreadable for now (e.g. still being copied): forget it so it is retried next cycle,
+            # and drop what an earlier version of it contributed
+            snapshot.pop(subject_id)
+            if subject_id in state["rows"]:
+                removed.append(subject_id)
+            continue
+        new_rows.append(row)
+
+    # Replace the contribution of every changed night and drop the one of every night that left
+    for subject_id in [row["subject"] for row in new_rows] + removed:
+        old_row = state["rows"].pop(subject_id, None)
+        if old_row is not None:
+            update_aggregates(state["aggregates"], [old_row], sign=-1)
+    for row in new_rows:
+        state["rows"][row["subject"]] = row
+    update_aggregates(state["aggregates"], new_rows)
+
+    if state["connection"] is not None:
+        if new_rows:
+            upsert_nights(state["connection"], new_rows)
+        if removed:
+            delete_nights(state["connection"], removed)
+
+    state["snapshot"] = snapshot
+    return {"changed": [row["subject"] for row in new_rows], "removed": removed}
+
+
+# Function to keep the dataset-wide numbers up to date while new nights arrive
+def watch_dataset(base_folder, interval=5.0, database_path=None, on_update=None, max_cycles=None):
+    """
+    Polls the dataset folder and processes new or changed 'sub-*/eeg' event file pairs as they land.
+
+    Polling is used because it works on every platform and on network file systems; a cycle only
+    lists directories and reads file metadata, so it stays cheap between arrivals.
+
+    Parameters:
+    base_folder (str): The path to the base folder containing the subject data folders.
+    interval (float): Seconds between two scans. Default is 5.
+    database_path (str, optional): Results database kept up to date (see results_database). Default is None.
+    on_update (callable, optional): Called with the final_report dictionary and the cycle changes after
+                                    every cycle that changed something. Default is None (log the report).
+    max_cycles (int, optional): Stop after this many cycles. Default is None (run until interrupted).
+
+    Returns:
+    dict: The final_report of the last cycle.
+    """
+    state = new_watch_state(database_path)
+    cycles = 0
+
+    try:
+        while max_cycles is None or cycles < max_cycles:
+            changes = watch_cycle(state, base_folder)
+            cycles += 1
+
+            if changes["changed"] or changes["removed"]:
+                report = final_report(state["aggregates"])
+                if on_update is not None:
+                    on_update(report, changes)
+                else:
+                    logging.info(f"{len(changes['changed'])} new or changed nights, {len(changes['removed'])} removed. "
+                                 f"Dataset: {report['nights']} nights, headband match {report['hb_match']}, "
+                                 f"PSG match {report['psg_match']}")
+
+            if max_cycles is None or cycles < max_cycles:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        logging.info("Stopped watching the dataset.")
+    finally:
+        if state["connection"] is not None:
+            state["connection"].close()
+
+    return final_report(state["aggregates"])
@@ -5,6 +5,8 @@ from files_for_python_project.find_file_function import find_event_files
 from files_for_python_project.functions_for_comparing_data import headband_vs_majority , aispg_vs_majority
 from files_for_python_project.error_counts_and_full_sleep_functions import error_hours_count , total_sleeping_hours
 from files_for_python_project.function_for_reviewing_patients import review_subjects
+from files_for_python_project.bootstrap_confidence import collect_night_counts, bootstrap_agreement_ci
+from files_for_python_project.telemetry import track_progress
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,7 +25,7 @@ sleeping_houers = 0
 headband_files, psg_files = find_event_files('files_for_python_project')
 
 # Iterate over the headband and PSG files to calculate statistics
-for headband_file, psg_file in zip(headband_files, psg_files):
+for headband_file, psg_file in track_progress(list(zip(headband_files, psg_files))):
     hb_vs_mj_sec.append(headband_vs_majority(headband_file, psg_file))
     psgai_vs_mj_sec.append(aispg_vs_majority(psg_file))
     error_houers += error_hours_count(headband_file)
@@ -35,6 +37,14 @@ hb_vs_mj_sec = [x for x in hb_vs_mj_sec if x is not None]
 # Display results using logger instead of print
 logging.info(f"We found {round(statistics.mean(hb_vs_mj_sec), 2)}% match between the headband AI and the majority")
 logging.info(f"We found {round(statistics.mean(psgai_vs_mj_sec), 2)}% match between the PSG AI and the majority")
+
+# Bootstrap confidence intervals over nights for the match percentages and kappa
+for source, name in (("hb", "headband AI"), ("psg", "PSG AI")):
+    ci = bootstrap_agreement_ci(collect_night_counts(headband_files, psg_files, source=source))
+    if ci is not None:
+        logging.info(f"Bootstrap {name} match: {ci['match'][0]:.2f}% (95% CI {ci['match'][1]:.2f}%-{ci['match'][2]:.2f}%), "
+                     f"kappa {ci['kappa'][0]:.3f} ({ci['kappa'][1]:.3f}-{ci['kappa'][2]:.3f})")
+
 logging.info(f"There were {round(error_houers, 2)} hours of missing data out of a total of {round(sleeping_houers, 2)} DATA hours collected in the headband experiment")
 
 # Call the review function
@@ -0,0 +1,58 @@
+import pytest
+import pandas as pd
+
+# Function to write the events files of one synthetic night in the dataset layout
+def write_night_files(base_path, subject, majority, ai_psg, ai_hb, session=None, onset=False):
+    """
+    Writes the headband and PSG events files of one night into <subject>/eeg (or <subject>/<session>/eeg).
+    Existing files of the night are overwritten.
+
+    Parameters:
+    base_path (pathlib.Path): The dataset folder.
+    subject (str): The subject ID, e.g. 'sub-1'.
+    majority (list): Expert majority stage of every epoch.
+    ai_psg (list): PSG AI stage of every epoch.
+    ai_hb (list): Headband AI stage of every epoch.
+    session (str, optional): Session ID, added to the folders and the file names. Default is None.
+    onset (bool): Whether to add an 'onset' column (30 s epochs) to both files. Default is False.
+
+    Returns:
+    tuple: Paths to the headband file and the PSG file.
+    """
+    eeg_path = base_path / subject / session / "eeg" if session else base_path / subject / "eeg"
+    eeg_path.mkdir(parents=True, exist_ok=True)
+    prefix = f"{subject}_{session}" if session else subject
+    headband_file = eeg_path / f"{prefix}_task-Sleep_acq-headband_events.tsv"
+    psg_file = eeg_path / f"{prefix}_task-Sleep_acq-psg_events.tsv"
+
+    headband_columns = {"ai_hb": ai_hb}
+    psg_columns = {"majority": majority, "ai_psg": ai_psg}
+    if onset:
+        headband_columns = {"onset": list(range(0, 30 * len(ai_hb), 30)), **headband_columns}
+        psg_columns = {"onset": list(range(0, 30 * len(majority), 30)), **psg_columns}
+    pd.DataFrame(headband_columns).to_csv(headband_file, sep="\t", index=False)
+    pd.DataFrame(psg_columns).to_csv(psg_file, sep="\t", index=False)
+    return str(headband_file), str(psg_file)
+
+@pytest.fixture
+def write_night():
+    """
+    Gives write_night_files to the tests, to write one night at a time (e.g. between watch cycles).
+    """
+    return write_night_files
+
+@pytest.fixture
+def write_nights(tmp_path):
+    """
+    Gives a function that writes a dict of nights, subject -> (majority, ai_psg, ai_hb), into a dataset
+    folder (tmp_path unless base_path is given) and returns the lists of headband and PSG files.
+    """
+    def write(nights, base_path=None, onset=False):
+        headband_files, psg_files = [], []
+        for subject, (majority, ai_psg, ai_hb) in nights.items():
+            headband_file, psg_file = write_night_files(base_path or tmp_path, subject, majority, ai_psg, ai_hb,
+                                                        onset=onset)
+            headband_files.append(headband_file)
+            psg_files.append(psg_file)
+        return headband_files, psg_files
+    return write
@@ -0,0 +1,126 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.bootstrap_confidence import (
+    confusion_counts,
+    cohen_kappa,
+    collect_night_counts,
+    bootstrap_agreement_ci,
+)
+from files_for_python_project.functions_for_comparing_data import aispg_vs_majority
+
+@pytest.fixture
+def night_files(write_nights):
+    """
+    Creates three nights of headband and PSG events files and returns their paths.
+    The third night has only missing headband data and should be skipped for the headband AI.
+    """
+    nights = {
+        "sub-1": ([0, 1, 2, 2, 3, 4], [0, 1, 2, 2, 3, 4], [0, 1, 2, 2, 3, 4]),
+        "sub-2": ([0, 0, 2, 2, 4, 4], [0, 1, 2, 3, 4, 4], [0, 1, 2, 2, 2, 4]),
+        "sub-3": ([2, 2, 2, 2, 2, 2], [2, 2, 2, 2, 2, 2], [-2, -2, -2, -2, -2, -2]),
+    }
+    return write_nights(nights)
+
+def test_confusion_counts_ignores_invalid_codes():
+    """
+    PSG disconnections (8) and missing AI data (-2) are not counted.
+    """
+    confusion = confusion_counts([0, 1, 8, 2], [0, 2, 1, -2])
+    assert confusion.sum() == 2
+    assert confusion[0, 0] == 1
+    assert confusion[1, 2] == 1
+
+def test_cohen_kappa():
+    """
+    Perfect agreement gives kappa 1, and a stack of matrices gives one kappa each.
+    """
+    perfect = np.diag([5, 5, 0, 0, 0])
+    assert cohen_kappa(perfect) == pytest.approx(1.0)
+    chance = np.full((5, 5), 1)
+    assert cohen_kappa(np.stack([perfect, chance])) == pytest.approx([1.0, 0.0])
+
+def test_collect_night_counts(night_files):
+    """
+    Counts are kept per night (or per block) and high-error headband nights are skipped.
+    """
+    headband_files, psg_files = night_files
+    counts = collect_night_counts(headband_files, psg_files, source="hb")
+    assert counts["night_ids"] == ["sub-1", "sub-2"]
+    assert counts["confusion"].shape == (2, 5, 5)
+
+    blocks = collect_night_counts(headband_files, psg_files, source="psg", block_size=4)
+    assert len(blocks["night_ids"]) == 3
+    assert blocks["night"].tolist() == [0, 0, 1, 1, 2, 2]
+
+    with pytest.raises(ValueError):
+        collect_night_counts(headband_files, psg_files, source="eeg")
+
+def test_bootstrap_agreement_ci_night_level(night_files):
+    """
+    The estimate matches the mean of the per-night percentages and lies inside its interval.
+    """
+    headband_files, psg_files = night_files
+    counts = collect_night_counts(headband_files, psg_files, source="hb")
+    result = bootstrap_agreement_ci(counts, n_resamples=500, seed=0, chunk_size=128)
+
+    estimate, low, high = result["match"]
+    assert estimate == pytest.approx((100 + 4 / 6 * 100) / 2)
+    assert low <= estimate <= high
+    assert 0 <= low and high <= 100
+    assert result["nights"] == 2
+    assert result["kappa"][1] <= result["kappa"][2]
+
+def test_bootstrap_agreement_ci_block_level(night_files):
+    """
+    Block-level resampling keeps every night and is reproducible with a seed.
+    """
+    headband_files, psg_files = night_files
+    counts = collect_night_counts(headband_files, psg_files, source="psg", block_size=2)
+    first = bootstrap_agreement_ci(counts, level="block", n_resamples=200, seed=1)
+    second = bootstrap_agreement_ci(counts, level="block", n_resamples=200, seed=1)
+    assert first == second
+    assert first["nights"] == 3
+
+def test_block_level_pooled_kappa_matches_full_matrices(night_files):
+    """
+    The block bootstrap computes kappa from row and column sums only; with one block per night every
+    resample is the original data, so the interval collapses onto the full-matrix estimate.
+    """
+    headband_files, psg_files = night_files
+    counts = collect_night_counts(headband_files, psg_files, source="psg", block_size=100)
+    result = bootstrap_agreement_ci(counts, level="block", n_resamples=50, seed=0, chunk_size=7)
+    assert result["kappa"][1:] == pytest.approx((result["kappa"][0],) * 2)
+    assert result["kappa"][0] == pytest.approx(cohen_kappa(counts["confusion"].sum(axis=0)))
+    assert result["match"][1:] == pytest.approx((result["match"][0],) * 2)
+
+def test_bootstrap_agreement_ci_no_nights():
+    """
+    Without any night, the bootstrap returns None.
+    """
+    counts = {"confusion": np.zeros((0, 5, 5)), "night": np.zeros(0, dtype=int), "night_ids": []}
+    assert bootstrap_agreement_ci(counts) is None
+
+def test_psg_estimate_matches_aispg_vs_majority(write_nights):
+    """
+    Missing PSG AI epochs count as disagreements, so the point estimate is the mean of aispg_vs_majority.
+    """
+    headband_files, psg_files = write_nights({
+        "sub-1": ([0, 1, 2, 2, 8, 4], [0, -2, 2, 2, 2, 4], [0, 1, 2, 2, 8, 4]),
+        "sub-2": ([2, 2, 2, 3, 3, 3], [2, 1, -2, 3, -2, 3], [2, 2, 2, 3, 3, 3]),
+    })
+
+    counts = collect_night_counts(headband_files, psg_files, source="psg")
+    assert counts["confusion"].shape == (2, 5, 6)
+    result = bootstrap_agreement_ci(counts, n_resamples=200, seed=0)
+    expected = np.mean([aispg_vs_majority(psg_file) for psg_file in psg_files])
+    assert result["match"][0] == pytest.approx(expected)
+    assert result["match"][1] <= result["match"][0] <= result["match"][2]
+    # Missing epochs are never on the diagonal, so kappa stays below perfect agreement
+    assert result["kappa"][0] < 1
@@ -0,0 +1,82 @@
+import pytest
+import json
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project import checkpointed_runs
+from files_for_python_project.checkpointed_runs import run_with_checkpoints, load_checkpoint
+
+@pytest.fixture
+def dataset(tmp_path, write_nights):
+    """
+    Creates a dataset of five nights with different agreement levels.
+    """
+    base = tmp_path / "data"
+    write_nights({f"sub-{number}": ([2] * 6, [2] * 6, [2] * number + [1] * (6 - number)) for number in range(1, 6)},
+                 base)
+    return str(base)
+
+def test_run_with_checkpoints_writes_final_checkpoint(dataset, tmp_path):
+    """
+    A full run ends with a finished checkpoint listing every night.
+    """
+    checkpoint_path = str(tmp_path / "run.json")
+    report = run_with_checkpoints(dataset, checkpoint_path, checkpoint_every=2)
+
+    assert report["nights"] == 5
+    with open(checkpoint_path) as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    assert checkpoint["finished"] is True
+    assert len(checkpoint["completed"]) == 5
+
+def test_resume_after_crash_gives_same_report(dataset, tmp_path, monkeypatch):
+    """
+    A run that crashes part-way and is resumed gives the same report and spill file as an uninterrupted run.
+    """
+    reference_spill = str(tmp_path / "reference.tsv")
+    reference = run_with_checkpoints(dataset, str(tmp_path / "reference.json"), spill_path=reference_spill)
+
+    # Crash on the fourth night
+    original_summarize = checkpointed_runs.summarize_night
+    calls = {"count": 0}
+
+    def crashing_summarize(headband_file, psg_file):
+        calls["count"] += 1
+        if calls["count"] == 4:
+            raise RuntimeError("Job preempted")
+        return original_summarize(headband_file, psg_file)
+
+    checkpoint_path = str(tmp_path / "run.json")
+    spill_path = str(tmp_path / "nights.tsv")
+    monkeypatch.setattr(checkpointed_runs, "summarize_night", crashing_summarize)
+    with pytest.raises(RuntimeError):
+        run_with_checkpoints(dataset, checkpoint_path, checkpoint_every=2, spill_path=spill_path)
+    assert len(load_checkpoint(checkpoint_path, dataset)["completed"]) == 2
+
+    # Resume: only the remaining nights are processed
+    monkeypatch.setattr(checkpointed_runs, "summarize_night", original_summarize)
+    resumed = run_with_checkpoints(dataset, checkpoint_path, resume=True, checkpoint_every=2, spill_path=spill_path)
+
+    assert resumed == reference
+    assert sorted(pd.read_csv(spill_path, sep="\t")["subject"]) == sorted(pd.read_csv(reference_spill, sep="\t")["subject"])
+
+def test_resume_without_checkpoint_starts_over(dataset, tmp_path):
+    """
+    Resuming without a checkpoint file runs the whole dataset.
+    """
+    report = run_with_checkpoints(dataset, str(tmp_path / "missing.json"), resume=True)
+    assert report["nights"] == 5
+
+def test_load_checkpoint_rejects_other_dataset(dataset, tmp_path):
+    """
+    A checkpoint of another dataset folder cannot be resumed.
+    """
+    checkpoint_path = str(tmp_path / "run.json")
+    run_with_checkpoints(dataset, checkpoint_path)
+    with pytest.raises(ValueError):
+        load_checkpoint(checkpoint_path, str(tmp_path / "other"))
@@ -0,0 +1,124 @@
+import pytest
+import json
+import threading
+import urllib.request
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.command_line import main, make_server
+from files_for_python_project.results_database import index_dataset
+
+@pytest.fixture
+def dataset(tmp_path, write_nights):
+    """
+    Creates a dataset of three nights; the third one has an unknown stage code.
+    """
+    base = tmp_path / "data"
+    nights = {
+        "sub-1": ([2] * 4, [2] * 4, [2, 2, 2, 2]),
+        "sub-2": ([2] * 4, [2] * 4, [2, 2, 1, 1]),
+        "sub-3": ([2] * 4, [2] * 4, [2, 2, 2, 7]),
+    }
+    write_nights(nights, base, onset=True)
+    return str(base)
+
+def run(capsys, *argv):
+    """
+    Runs the command line and returns its exit code and the JSON records written to stdout.
+    """
+    code = main(["-q", *argv])
+    lines = capsys.readouterr().out.splitlines()
+    return code, [json.loads(line) for line in lines]
+
+def test_discover_and_validate(dataset, capsys):
+    """
+    discover lists every night, validate reports the bad one and exits with code 1.
+    """
+    code, records = run(capsys, "discover", dataset)
+    assert code == 0
+    assert [record["subject"] for record in records] == ["sub-1", "sub-2", "sub-3"]
+
+    code, records = run(capsys, "validate", dataset)
+    assert code == 1
+    assert [record["valid"] for record in records] == [True, True, False]
+    assert "unknown stage codes in ai_hb: 7" in records[2]["problems"]
+
+def test_analyze_with_cache_and_shards(dataset, tmp_path, capsys):
+    """
+    analyze emits the per-night records and a report; shard reports add up to the full report.
+    """
+    code, records = run(capsys, "analyze", dataset, "--nights", "--cache", str(tmp_path / "results.db"))
+    assert code == 0
+    assert [record["type"] for record in records] == ["night", "night", "night", "report"]
+    report = records[-1]
+    assert report["nights"] == 3
+
+    shard_nights = 0
+    for shard in ("0/2", "1/2"):
+        _, records = run(capsys, "analyze", dataset, "--shard", shard)
+        assert records[-1]["shard"] == shard
+        shard_nights += records[-1]["aggregates"]["nights"]
+    assert shard_nights == 3
+
+def test_analyze_rejects_checkpoint_with_workers(dataset, tmp_path):
+    """
+    A checkpointed run cannot be combined with parallel workers.
+    """
+    with pytest.raises(SystemExit):
+        main(["analyze", dataset, "--checkpoint", str(tmp_path / "run.json"), "--workers", "2"])
+
+def test_plot_writes_figures(dataset, tmp_path, capsys):
+    """
+    plot writes one figure per selected subject without opening a window.
+    """
+    code, records = run(capsys, "plot", dataset, "--subjects", "sub-2", "--output-dir", str(tmp_path / "figures"))
+    assert code == 0
+    assert [figure["subject"] for figure in records[0]["figures"]] == ["sub-2"]
+    assert os.path.exists(records[0]["figures"][0]["path"])
+
+def test_serve_answers_queries(dataset, tmp_path):
+    """
+    The server answers filtered night queries and the report as JSON.
+    """
+    database = str(tmp_path / "results.db")
+    index_dataset(database, dataset)
+    server = make_server(database, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base_url}/nights?max_hb_match=60") as response:
+            assert [row["subject_id"] for row in json.load(response)] == ["sub-2"]
+        with urllib.request.urlopen(f"{base_url}/report") as response:
+            assert json.load(response)["nights"] == 3
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_closed_stdout_exits_quietly(dataset, tmp_path, monkeypatch):
+    """
+    When the reader of stdout exits early (e.g. `| head`), the command stops with code 1 instead of a traceback.
+    """
+    class ClosedPipe:
+        def __init__(self, path):
+            self.file = open(path, "w")
+
+        def write(self, text):
+            raise BrokenPipeError(32, "Broken pipe")
+
+        def flush(self):
+            pass
+
+        def fileno(self):
+            return self.file.fileno()
+
+    stdout = ClosedPipe(tmp_path / "stdout")
+    monkeypatch.setattr(sys, "stdout", stdout)
+    try:
+        assert main(["-q", "discover", dataset]) == 1
+    finally:
+        stdout.file.close()
@@ -8,7 +8,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import the functions to be tested from the project module.
-from files_for_python_project.functions_for_comparing_data import headband_vs_majority, aispg_vs_majority  
+from files_for_python_project.functions_for_comparing_data import headband_vs_majority, aispg_vs_majority, load_night_stages
 
 # Fixture to set up temporary test files for testing.
 @pytest.fixture(scope="module")
@@ -131,3 +131,40 @@ def test_aispg_vs_majority_empty(setup_test_files):
     result = aispg_vs_majority(empty_file)
     # Assert that the function returns None.
     assert result is None
+
+# Test function for the comparisons in a coarser stage encoding.
+def test_comparisons_with_stage_scheme(setup_test_files):
+    """
+    Test that comparing in the wake/NREM/REM scheme counts N3 scored as REM as a mismatch,
+    while stages inside the same class would match.
+    """
+    # Unpack the file paths from the fixture.
+    headband_file, psg_file, _, _ = setup_test_files
+    # In the PSG file, one epoch is N3 for the experts and REM for the AI.
+    assert aispg_vs_majority(psg_file, scheme="wake_nrem_rem") == pytest.approx(80.0)
+    # The headband file matches on all valid epochs in any scheme.
+    assert headband_vs_majority(headband_file, psg_file, scheme="light_deep") == pytest.approx(100.0)
+
+# Test function for files with stage codes outside of the stage encoding.
+def test_comparisons_with_stage_scheme_invalid_codes(tmp_path):
+    """
+    Test that a stage code the scheme cannot remap makes both comparisons return None instead of raising.
+    """
+    headband_file = tmp_path / "sub-1_headband_events.tsv"
+    psg_file = tmp_path / "sub-1_psg_events.tsv"
+    pd.DataFrame({"ai_hb": [1, 2, 42]}).to_csv(headband_file, sep="\t", index=False)
+    pd.DataFrame({"majority": [1, 2, 3], "ai_psg": [1, 2, 42]}).to_csv(psg_file, sep="\t", index=False)
+    assert headband_vs_majority(str(headband_file), str(psg_file), scheme="wake_nrem_rem") is None
+    assert aispg_vs_majority(str(psg_file), scheme="wake_nrem_rem") is None
+
+# Test function for loading a night with stage codes outside of the stage encoding.
+def test_load_night_stages_with_stage_scheme_invalid_codes(tmp_path):
+    """
+    Test that a stage code the scheme cannot remap makes load_night_stages return None instead of raising.
+    """
+    headband_file = tmp_path / "sub-1_headband_events.tsv"
+    psg_file = tmp_path / "sub-1_psg_events.tsv"
+    pd.DataFrame({"ai_hb": [1, 2, 42]}).to_csv(headband_file, sep="\t", index=False)
+    pd.DataFrame({"majority": [1, 2, 3], "ai_psg": [1, 2, 3]}).to_csv(psg_file, sep="\t", index=False)
+    assert load_night_stages(str(headband_file), str(psg_file), scheme="light_deep") is None
+    assert load_night_stages(str(headband_file), str(psg_file)) is not None
@@ -0,0 +1,67 @@
+import pytest
+import os
+import sys
+import matplotlib
+matplotlib.use("Agg")
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project import creating_pdf_report
+from files_for_python_project.creating_pdf_report import write_pdf_report, collect_summary_rows
+from files_for_python_project.find_file_function import find_event_files
+
+@pytest.fixture
+def dataset(tmp_path, write_nights):
+    """
+    Creates a dataset of three short nights and returns the lists of headband and PSG files.
+    """
+    base = tmp_path / "data"
+    write_nights({f"sub-{number}": ([0, 1, 2, 2], [0, 1, 1, 2], [0, 1, 2, -2]) for number in range(1, 4)},
+                 base, onset=True)
+    return find_event_files(str(base))
+
+def test_collect_summary_rows(dataset):
+    """
+    Every readable night gets one summary row.
+    """
+    headband_files, psg_files = dataset
+    rows = collect_summary_rows(headband_files, psg_files)
+    assert len(rows) == 3
+    assert rows[0]["psg_match"] == pytest.approx(75.0)
+
+def test_write_pdf_report(dataset, tmp_path):
+    """
+    The report has a summary page followed by one page per night.
+    """
+    pypdf = pytest.importorskip("pypdf")
+    headband_files, psg_files = dataset
+    output_path = str(tmp_path / "report.pdf")
+
+    assert write_pdf_report(headband_files, psg_files, output_path) == [output_path]
+    assert len(pypdf.PdfReader(output_path).pages) == 4
+
+def test_write_pdf_report_parallel_shards(dataset, tmp_path):
+    """
+    Rendering in parallel shards gives the same number of pages and removes the shard files.
+    """
+    pypdf = pytest.importorskip("pypdf")
+    headband_files, psg_files = dataset
+    output_path = str(tmp_path / "report.pdf")
+
+    assert write_pdf_report(headband_files, psg_files, output_path, workers=2, shard_size=2) == [output_path]
+    assert len(pypdf.PdfReader(output_path).pages) == 4
+    assert sorted(os.listdir(tmp_path)) == ["data", "report.pdf"]
+
+def test_write_pdf_report_keeps_shards_without_pypdf(dataset, tmp_path, monkeypatch):
+    """
+    Without pypdf, the parallel shards are kept and returned in order.
+    """
+    monkeypatch.setattr(creating_pdf_report, "PdfWriter", None)
+    headband_files, psg_files = dataset
+    paths = write_pdf_report(headband_files, psg_files, str(tmp_path / "report.pdf"), workers=2, shard_size=2)
+
+    assert [os.path.basename(path) for path in paths] == [
+        "report.shard-0000.pdf", "report.shard-0001.pdf", "report.shard-0002.pdf"]
+    assert all(os.path.exists(path) for path in paths)
@@ -0,0 +1,92 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.disagreement_heatmap import (
+    NOT_RECORDED, AGREE, DISAGREE, ARTIFACT, DISCONNECTED,
+    epoch_status,
+    build_status_matrix,
+    bin_status_matrix,
+    night_order,
+    render_disagreement_heatmap,
+)
+
+@pytest.fixture
+def dataset(write_nights):
+    """
+    Creates a short night that fully agrees and a longer one with disagreements and artifacts.
+    """
+    nights = {
+        "sub-1": ([0, 2, 2, 4], [0, 2, 2, 4], [0, 2, 2, 4]),
+        "sub-2": ([2, 2, 8, 2, 3, 3], [2, 2, 2, 2, 3, 3], [1, 2, 2, -2, 2, 3]),
+    }
+    return write_nights(nights)
+
+def test_epoch_status():
+    """
+    Disconnections take precedence over missing AI data, which takes precedence over (dis)agreement.
+    """
+    status = epoch_status(np.array([2, 2, 2, 8, 8]), np.array([2, 1, -2, -2, 2]))
+    assert status.tolist() == [AGREE, DISAGREE, ARTIFACT, DISCONNECTED, DISCONNECTED]
+
+def test_build_status_matrix_pads_shorter_nights(dataset):
+    """
+    Nights are aligned on the first epoch and padded with NOT_RECORDED.
+    """
+    matrix, night_ids, files = build_status_matrix(*dataset)
+    assert night_ids == ["sub-1", "sub-2"]
+    assert files[1] == (dataset[0][1], dataset[1][1])
+    assert matrix.dtype == np.int8
+    assert matrix.tolist() == [
+        [AGREE, AGREE, AGREE, AGREE, NOT_RECORDED, NOT_RECORDED],
+        [DISAGREE, AGREE, DISCONNECTED, ARTIFACT, DISAGREE, AGREE],
+    ]
+    # The PSG AI agrees everywhere the experts scored
+    psg_matrix = build_status_matrix(*dataset, source="ai_psg")[0]
+    assert psg_matrix[1].tolist() == [AGREE, AGREE, DISCONNECTED, AGREE, AGREE, AGREE]
+
+def test_bin_status_matrix(dataset):
+    """
+    Bins hold the fraction of the view's status; bins without any counted epoch are NaN.
+    """
+    matrix = build_status_matrix(*dataset)[0]
+    values = bin_status_matrix(matrix, "agreement", bin_epochs=4)
+    assert values[0].tolist()[0] == 0.0 and np.isnan(values[0, 1])
+    assert values[1].tolist() == pytest.approx([1 / 2, 1 / 2])
+    artifacts = bin_status_matrix(matrix, "artifact", bin_epochs=4)
+    assert artifacts[1].tolist() == pytest.approx([1 / 4, 0.0])
+    with pytest.raises(ValueError):
+        bin_status_matrix(matrix, "unknown")
+
+def test_night_order(dataset):
+    """
+    Sorting by score puts the night with the most disagreement first.
+    """
+    matrix = build_status_matrix(*dataset)[0]
+    assert night_order(matrix).tolist() == [0, 1]
+    assert night_order(matrix, sort_by="score").tolist() == [1, 0]
+
+def test_render_disagreement_heatmap_tiles_and_cache(dataset, tmp_path):
+    """
+    Every tile is written as a PNG and served from the cache on the second run.
+    """
+    cache_dir = tmp_path / "cache"
+    output = str(tmp_path / "heatmap.png")
+    paths = render_disagreement_heatmap(*dataset, output, rows_per_tile=1, cache_dir=str(cache_dir))
+    assert [os.path.basename(path) for path in paths] == ["heatmap.tile-0000.png", "heatmap.tile-0001.png"]
+    for path in paths:
+        with open(path, "rb") as image_file:
+            assert image_file.read(8) == b"\x89PNG\r\n\x1a\n"
+    cached = sorted(os.listdir(cache_dir))
+    assert len(cached) == 2
+
+    render_disagreement_heatmap(*dataset, output, rows_per_tile=1, cache_dir=str(cache_dir))
+    assert sorted(os.listdir(cache_dir)) == cached
+
+    assert render_disagreement_heatmap(*dataset, output, sort_by="score") == [output]
+    assert os.path.getsize(output) > 0
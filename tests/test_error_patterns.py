@@ -0,0 +1,92 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.error_patterns import (
+    pair_codes,
+    error_window_keys,
+    decode_pattern,
+    mine_error_patterns,
+)
+from files_for_python_project.stage_encoding import SLEEP_STAGES
+
+@pytest.fixture
+def dataset(write_nights):
+    """
+    Creates two nights where the headband AI scores a short N1 interruption of N2 as N2, and a
+    third night with too much missing headband data.
+    """
+    nights = {
+        "sub-1": ([2, 2, 1, 2, 2, 3, 3], [2, 2, 1, 2, 2, 3, 3], [2, 2, 2, 2, 2, 3, 2]),
+        "sub-2": ([0, 2, 1, 2, 8, 2, 1, 2], [0, 2, 1, 2, 2, 2, 1, 2], [0, 2, 2, 2, 2, 2, 2, 2]),
+        "sub-3": ([2, 1, 2, 2], [2, 1, 2, 2], [2, 2, -2, -2]),
+    }
+    return write_nights(nights)
+
+def test_window_keys_round_trip():
+    """
+    Keys decode back to their stage sequences; windows crossing nights or invalid epochs are dropped.
+    """
+    majority = np.array([2, 1, 2, 2, 1, 2, 8, 1])
+    ai = np.array([2, 2, 2, 2, 2, 2, 2, 2])
+    night_of_epoch = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+    codes = pair_codes(majority, ai, SLEEP_STAGES)
+    assert codes[6] == -1
+
+    keys, epochs = error_window_keys(codes, (codes >= 0) & (majority != ai), night_of_epoch, 25)
+    # The errors at epochs 4 (starts a night) and 7 (ends the data) have no full window
+    assert epochs.tolist() == [1]
+    expert, predicted = decode_pattern(keys[0], SLEEP_STAGES)
+    assert expert.tolist() == [2, 1, 2]
+    assert predicted.tolist() == [2, 2, 2]
+
+def test_mine_error_patterns(dataset):
+    """
+    The N1 interruption is the top pattern, found in both nights, with its first location.
+    """
+    patterns = mine_error_patterns(*dataset)
+    top = patterns.iloc[0]
+    assert top["expert"] == "N2 > N1 > N2"
+    assert top["ai"] == "N2 > N2 > N2"
+    assert top["occurrences"] == 3
+    assert top["nights"] == 2
+    assert (top["example_night"], top["example_onset"]) == ("sub-1", 60)
+    assert top["locations"] == [("sub-1", 60), ("sub-2", 60), ("sub-2", 180)]
+    # The error in the last epoch of sub-1 has no full window
+    assert len(patterns) == 1
+    assert patterns["share"].sum() == pytest.approx(100)
+
+    # The PSG AI agrees everywhere, so there is nothing to mine
+    assert mine_error_patterns(*dataset, source="ai_psg").empty
+
+def test_mine_error_patterns_matches_brute_force(dataset):
+    """
+    Counting the windows with a plain loop gives the same occurrences for longer patterns.
+    """
+    patterns = mine_error_patterns(*dataset, length=2, top=100, max_examples=1)
+    expected = {}
+    for headband_file, psg_file in zip(*dataset[:2]):
+        majority = pd.read_csv(psg_file, sep="\t")["majority"].tolist()
+        ai = pd.read_csv(headband_file, sep="\t")["ai_hb"].tolist()
+        if ai.count(-2) / len(ai) >= 0.4:
+            continue
+        for start in range(len(majority) - 1):
+            window = list(zip(majority[start:start + 2], ai[start:start + 2]))
+            if majority[start + 1] != ai[start + 1] and all(m != 8 and a != -2 for m, a in window):
+                expected[tuple(window)] = expected.get(tuple(window), 0) + 1
+    assert sorted(patterns["occurrences"]) == sorted(expected.values())
+
+def test_pattern_length_must_be_positive(dataset):
+    """
+    A pattern of zero epochs is rejected with a clear error instead of a NumPy broadcast error.
+    """
+    with pytest.raises(ValueError, match="at least one epoch"):
+        mine_error_patterns(*dataset, length=0)
+    with pytest.raises(ValueError, match="at least one epoch"):
+        error_window_keys(np.zeros(4, dtype=np.int64), np.ones(4, dtype=bool), np.zeros(4, dtype=np.int64), 25, 0)
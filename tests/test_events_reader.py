@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.events_reader import read_event_columns, read_events_bulk, read_night_epochs
+
+def write_events(path, **columns):
+    """
+    Writes an events TSV with the standard timing columns followed by the given stage columns.
+    """
+    n_epochs = len(next(iter(columns.values())))
+    onset = np.arange(n_epochs) * 30
+    table = pd.DataFrame({"onset": onset, "duration": 30, "begsample": onset * 256 + 1,
+                          "endsample": (onset + 30) * 256, "offset": 0, **columns})
+    table.to_csv(path, sep="\t", index=False)
+    return str(path)
+
+def test_read_event_columns(tmp_path):
+    """
+    Only the requested columns are returned, typed int32 (timing) and int8 (stages).
+    """
+    path = write_events(tmp_path / "night.tsv", majority=[0, 2, 8], ai_psg=[0, 1, -2])
+    columns = read_event_columns(path, ["onset", "ai_psg"])
+
+    assert list(columns) == ["onset", "ai_psg"]
+    assert columns["onset"].dtype == np.int32
+    assert columns["ai_psg"].dtype == np.int8
+    assert list(columns["ai_psg"]) == [0, 1, -2]
+
+def test_read_event_columns_errors(tmp_path):
+    """
+    Missing columns, values that are not integers and ragged rows are reported as ValueError.
+    """
+    path = write_events(tmp_path / "night.tsv", majority=[0, 2])
+    with pytest.raises(ValueError, match="Missing columns ai_psg"):
+        read_event_columns(path, ["majority", "ai_psg"])
+
+    bad_value = tmp_path / "bad_value.tsv"
+    bad_value.write_text("onset\tmajority\n0\t2\n30\tn/a\n")
+    with pytest.raises(ValueError):
+        read_event_columns(str(bad_value), ["majority"])
+
+    ragged = tmp_path / "ragged.tsv"
+    ragged.write_text("onset\tmajority\n0\t2\n30\n")
+    with pytest.raises(ValueError):
+        read_event_columns(str(ragged), ["majority"])
+
+def test_read_event_columns_empty_night(tmp_path):
+    """
+    A file with only a header gives empty arrays.
+    """
+    path = tmp_path / "empty.tsv"
+    path.write_text("onset\tmajority\n")
+    assert len(read_event_columns(str(path), ["majority"])["majority"]) == 0
+
+def test_read_events_bulk_keeps_file_order(tmp_path):
+    """
+    Files with different layouts are read together and come back in the order of the paths.
+    """
+    first = write_events(tmp_path / "first.tsv", majority=[1, 1], ai_psg=[1, 2])
+    second = tmp_path / "second.tsv"
+    second.write_text("ai_psg\tmajority\n3\t4\n\n")
+    third = write_events(tmp_path / "third.tsv", majority=[0], ai_psg=[0])
+
+    arrays, offsets = read_events_bulk([first, str(second), third], ["majority", "ai_psg"])
+    assert list(offsets) == [0, 2, 3, 4]
+    assert list(arrays["majority"]) == [1, 1, 4, 0]
+    assert list(arrays["ai_psg"]) == [1, 2, 3, 0]
+    assert arrays["majority"].dtype == np.int8
+
+def test_read_night_epochs(tmp_path):
+    """
+    The two files of a night are read into one dict; missing files and differing lengths give None.
+    """
+    psg_file = write_events(tmp_path / "psg.tsv", majority=[0, 2, 4], ai_psg=[0, 2, 2])
+    headband_file = write_events(tmp_path / "headband.tsv", ai_hb=[1, 2, -2])
+
+    epochs = read_night_epochs(headband_file, psg_file)
+    assert list(epochs["onset"]) == [0, 30, 60]
+    assert list(epochs["ai_hb"]) == [1, 2, -2]
+    assert epochs["majority"].dtype == np.int8
+
+    short_file = write_events(tmp_path / "short.tsv", ai_hb=[1, 2])
+    assert read_night_epochs(short_file, psg_file) is None
+    assert read_night_epochs(str(tmp_path / "missing.tsv"), psg_file) is None
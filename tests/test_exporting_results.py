@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project import exporting_results
+from files_for_python_project.exporting_results import export_results, load_exported_table, resolve_format
+
+@pytest.fixture
+def dataset(tmp_path):
+    """
+    Creates a dataset of two nights with onset, stage and extra integer columns.
+    """
+    nights = {
+        "sub-1": ([0, 1, 2], [0, 1, 1], [0, 1, -2]),
+        "sub-2": ([2, 2, 3, 8], [2, 2, 3, 0], [2, 3, 3, 3]),
+    }
+    base = tmp_path / "data"
+    for subject, (majority, ai_psg, ai_hb) in nights.items():
+        eeg_path = base / subject / "eeg"
+        eeg_path.mkdir(parents=True)
+        onset = list(range(0, 30 * len(majority), 30))
+        pd.DataFrame({"onset": onset, "duration": 30, "ai_hb": ai_hb}).to_csv(
+            eeg_path / f"{subject}_task-Sleep_acq-headband_events.tsv", sep="\t", index=False)
+        pd.DataFrame({"onset": onset, "duration": 30, "majority": majority, "ai_psg": ai_psg}).to_csv(
+            eeg_path / f"{subject}_task-Sleep_acq-psg_events.tsv", sep="\t", index=False)
+    return str(base)
+
+def test_export_results_npz(dataset, tmp_path):
+    """
+    The NPZ export writes a typed per-night table and an aligned per-epoch table.
+    """
+    paths = export_results(dataset, str(tmp_path / "out"), export_format="npz", include_epochs=True, batch_size=1)
+
+    nights = load_exported_table(paths["nights"]).sort_values("subject").reset_index(drop=True)
+    assert nights["subject"].tolist() == ["sub-1", "sub-2"]
+    assert nights["n_epochs"].tolist() == [3, 4]
+    assert nights.loc[0, "hb_match"] == pytest.approx(100.0)
+
+    epochs = load_exported_table(paths["epochs"])
+    assert len(epochs) == 7
+    assert epochs["majority"].dtype == np.int8
+    assert epochs["ai_hb"].dtype == np.int8
+    assert epochs["onset"].dtype == np.int32
+    # Every epoch points back to its night in the summary table
+    assert sorted(epochs.groupby("night").size().tolist()) == [3, 4]
+
+def test_export_results_parquet(dataset, tmp_path):
+    """
+    The Parquet export (when pyarrow is installed) gives the same tables as the NPZ export.
+    """
+    pytest.importorskip("pyarrow")
+    paths = export_results(dataset, str(tmp_path / "out"), export_format="parquet", include_epochs=True)
+    assert paths["nights"].endswith(".parquet")
+
+    epochs = load_exported_table(paths["epochs"])
+    assert len(epochs) == 7
+    assert epochs["ai_psg"].dtype == np.int8
+
+def test_export_results_without_epochs(dataset, tmp_path):
+    """
+    Without include_epochs only the per-night table is written.
+    """
+    paths = export_results(dataset, str(tmp_path / "out"), export_format="npz")
+    assert list(paths) == ["nights"]
+    assert not os.path.exists(tmp_path / "out" / "epochs.npz")
+
+def test_export_results_empty_dataset(tmp_path):
+    """
+    An empty dataset still writes an empty table with the expected columns.
+    """
+    paths = export_results(str(tmp_path), str(tmp_path / "out"), export_format="npz", include_epochs=True)
+    assert load_exported_table(paths["epochs"]).empty
+    assert "hb_match" in load_exported_table(paths["nights"]).columns
+
+def test_resolve_format(monkeypatch):
+    """
+    'auto' falls back to NPZ without pyarrow, and unknown or unavailable formats raise errors.
+    """
+    monkeypatch.setattr(exporting_results, "pq", None)
+    assert resolve_format("auto") == "npz"
+    with pytest.raises(ImportError):
+        resolve_format("parquet")
+    with pytest.raises(ValueError):
+        resolve_format("csv")
@@ -0,0 +1,81 @@
+import pytest
+import os
+import sys
+import matplotlib
+matplotlib.use("Agg")
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project import creating_plots
+from files_for_python_project.creating_plots import cached_sleep_stages, plot_sleep_stages
+from files_for_python_project.figure_cache import figure_cache_key, store_figure, load_cached_figure, evict_figures
+
+@pytest.fixture
+def night(tmp_path, write_night):
+    """
+    Writes the headband and PSG events files of one short night and returns their paths.
+    """
+    return write_night(tmp_path, "sub-1", [0, 1, 2, 2], [0, 1, 1, 2], [0, 1, 2, 2], onset=True)
+
+def test_figure_cache_key_changes_with_files_and_options(night):
+    """
+    The key depends on the plot options and on the fingerprints of the input files.
+    """
+    headband_file, psg_file = night
+    key = figure_cache_key([psg_file, headband_file], colormap="viridis", title=None)
+
+    assert key == figure_cache_key([psg_file, headband_file], colormap="viridis", title=None)
+    assert key != figure_cache_key([psg_file, headband_file], colormap="plasma", title=None)
+
+    os.utime(psg_file, ns=(1, 1))
+    assert key != figure_cache_key([psg_file, headband_file], colormap="viridis", title=None)
+
+def test_cache_hit_skips_parsing_and_drawing(night, tmp_path, mocker):
+    """
+    The second request of the same figure comes from the cache without reading the files or drawing.
+    """
+    headband_file, psg_file = night
+    cache_dir = str(tmp_path / "cache")
+    path = cached_sleep_stages(headband_file, psg_file, cache_dir)
+    assert path.endswith(".png") and os.path.getsize(path) > 0
+
+    read = mocker.patch.object(creating_plots, "read_night_epochs")
+    draw = mocker.patch.object(creating_plots, "draw_sleep_stages")
+    assert cached_sleep_stages(headband_file, psg_file, cache_dir) == path
+    read.assert_not_called()
+    draw.assert_not_called()
+
+    # Another render mode is another entry
+    assert cached_sleep_stages(headband_file, psg_file, cache_dir, render_mode="svg") != path
+
+def test_evict_least_recently_used(tmp_path):
+    """
+    Above the size limit, the least recently used figures are evicted first.
+    """
+    cache_dir = str(tmp_path)
+    store_figure(cache_dir, "a", b"x" * 10)
+    store_figure(cache_dir, "b", b"x" * 10)
+    os.utime(os.path.join(cache_dir, "a.png"), ns=(1, 1))
+    os.utime(os.path.join(cache_dir, "b.png"), ns=(2, 2))
+
+    # Using 'a' makes 'b' the least recently used figure
+    assert load_cached_figure(cache_dir, "a") is not None
+    store_figure(cache_dir, "c", b"x" * 10, max_bytes=25)
+
+    assert load_cached_figure(cache_dir, "b") is None
+    assert load_cached_figure(cache_dir, "a") is not None
+    assert load_cached_figure(cache_dir, "c") is not None
+    assert evict_figures(cache_dir, max_bytes=0, keep=os.path.join(cache_dir, "c.png")) == 1
+
+def test_plot_sleep_stages_with_cache(night, tmp_path, mocker):
+    """
+    With a cache folder, plot_sleep_stages shows the cached image and returns its path.
+    """
+    headband_file, psg_file = night
+    show = mocker.patch("matplotlib.pyplot.show")
+    path = plot_sleep_stages([psg_file], [headband_file], cache_dir=str(tmp_path / "cache"))
+
+    assert os.path.exists(path)
+    show.assert_called_once()
@@ -0,0 +1,94 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project import model_regression_diff
+from files_for_python_project.model_regression_diff import compare_predictions, diff_models, diff_datasets
+from files_for_python_project.functions_for_comparing_data import aispg_vs_majority
+
+def test_compare_predictions():
+    """
+    Per-night and per-stage changes and the flipped ranges are computed over all nights at once.
+    """
+    nights = [
+        ("sub-1", np.array([2, 2, 2, 3]), np.array([2, 1, 1, 3]), np.array([2, 2, 2, 3])),
+        ("sub-2", np.array([0, 0, 8, 0]), np.array([0, 0, 0, 0]), np.array([0, 0, 2, 0])),
+    ]
+    result = compare_predictions(nights, threshold=10)
+
+    night_table = result["nights"].set_index("night")
+    assert night_table.loc["sub-1", "change"] == pytest.approx(50.0)
+    assert night_table.loc["sub-1", "flagged"]
+    assert night_table.loc["sub-2", "change"] == pytest.approx(0.0)
+    assert not night_table.loc["sub-2", "flagged"]
+
+    stage_table = result["stages"].set_index("stage")
+    assert stage_table.loc[2, "baseline_match"] == pytest.approx(100 / 3)
+    assert stage_table.loc[2, "candidate_match"] == pytest.approx(100.0)
+
+    flipped = result["flipped"]
+    assert list(flipped["night"]) == ["sub-1", "sub-2"]
+    assert list(flipped["start_epoch"]) == [1, 2]
+    assert list(flipped["end_epoch"]) == [3, 3]
+    assert list(flipped["fixed_epochs"]) == [2, 0]
+
+def test_flipped_ranges_do_not_cross_nights():
+    """
+    A change at the end of one night and at the start of the next gives two ranges.
+    """
+    nights = [
+        ("sub-1", np.array([1, 1]), np.array([1, 1]), np.array([1, 2])),
+        ("sub-2", np.array([1, 1]), np.array([1, 1]), np.array([2, 1])),
+    ]
+    flipped = compare_predictions(nights)["flipped"]
+    assert list(flipped["night"]) == ["sub-1", "sub-2"]
+    assert list(flipped["broken_epochs"]) == [1, 1]
+
+def test_diff_datasets_uses_cached_arrays(tmp_path, mocker, write_night):
+    """
+    Two dataset roots are matched night by night; unchanged files are not read again.
+    """
+    write_night(tmp_path / "old", "sub-1", [2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 1, 1])
+    write_night(tmp_path / "new", "sub-1", [2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 2, 1])
+    result = diff_datasets(str(tmp_path / "old"), str(tmp_path / "new"))
+    assert result["nights"]["change"].tolist() == [pytest.approx(25.0)]
+
+    spy = mocker.spy(model_regression_diff, "load_prediction_sources")
+    diff_datasets(str(tmp_path / "old"), str(tmp_path / "new"))
+    spy.assert_not_called()
+
+def test_diff_models_between_columns(tmp_path, write_night):
+    """
+    Two prediction columns of the same dataset can be diffed as well.
+    """
+    write_night(tmp_path, "sub-1", [2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 1, 1])
+    folder = tmp_path / "sub-1" / "eeg"
+    result = diff_models([str(folder / "sub-1_task-Sleep_acq-headband_events.tsv")],
+                         [str(folder / "sub-1_task-Sleep_acq-psg_events.tsv")], "ai_hb", "ai_psg")
+    assert result["nights"]["changed_epochs"].tolist() == [2]
+
+def test_psg_source_counts_missing_epochs_as_errors(tmp_path, write_night):
+    """
+    A diff of the PSG AI counts its missing epochs as disagreements, so its score equals aispg_vs_majority.
+    """
+    _, old_psg = write_night(tmp_path / "old", "sub-1", [2, 2, 8, 2, 3], [2, -2, 2, 2, 1], [2, 2, 2, 2, 3])
+    _, new_psg = write_night(tmp_path / "new", "sub-1", [2, 2, 8, 2, 3], [2, -2, 2, 2, 3], [2, 2, 2, 2, 3])
+    result = diff_datasets(str(tmp_path / "old"), str(tmp_path / "new"), column="ai_psg")
+
+    nights = result["nights"]
+    assert nights["baseline_match"].tolist() == [pytest.approx(aispg_vs_majority(old_psg))]
+    assert nights["candidate_match"].tolist() == [pytest.approx(aispg_vs_majority(new_psg))]
+    assert nights["change"].tolist() == [pytest.approx(25.0)]
+
+def test_diff_models_needs_both_sources(tmp_path, write_night):
+    """
+    The baseline and candidate sources are always chosen by the caller.
+    """
+    headband_file, psg_file = write_night(tmp_path, "sub-1", [2, 2], [2, 2], [2, 2])
+    with pytest.raises(TypeError):
+        diff_models([headband_file], [psg_file])
@@ -0,0 +1,99 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.multi_model_evaluation import load_prediction_sources, evaluate_models
+from files_for_python_project.functions_for_comparing_data import aispg_vs_majority
+
+@pytest.fixture
+def two_nights(tmp_path, write_nights):
+    """
+    Creates two nights; only the first one has a sidecar file with a second headband model.
+    """
+    nights = write_nights({
+        "sub-1": ([0, 1, 2, 8], [0, 1, 2, 0], [0, 1, 1, 0]),
+        "sub-2": ([2, 2, 3, 3], [2, 2, 3, 2], [-2, 2, 3, 3]),
+    }, onset=True)
+    pd.DataFrame({"ai_hb": [0, 1, 2, 2]}).to_csv(
+        tmp_path / "sub-1" / "eeg" / "sub-1_task-Sleep_desc-v2_events.tsv", sep="\t", index=False)
+    return nights
+
+def test_load_prediction_sources(two_nights):
+    """
+    All 'ai_*' columns of the night and its sidecars are returned under their source names.
+    """
+    headband_files, psg_files = two_nights
+    majority, predictions = load_prediction_sources(headband_files[0], psg_files[0])
+    assert majority.tolist() == [0, 1, 2, 8]
+    assert sorted(predictions) == ["ai_hb", "ai_psg", "v2:ai_hb"]
+    assert predictions["v2:ai_hb"].tolist() == [0, 1, 2, 2]
+
+def test_load_prediction_sources_missing_file(tmp_path):
+    """
+    An unreadable expert file returns None.
+    """
+    assert load_prediction_sources(str(tmp_path / "hb.tsv"), str(tmp_path / "missing.tsv")) is None
+
+def test_evaluate_models(two_nights):
+    """
+    Every model is scored on every night in one pass, and missing models give NaN.
+    """
+    headband_files, psg_files = two_nights
+    agreement, pairwise = evaluate_models(headband_files, psg_files)
+
+    assert list(agreement.columns) == ["sub-1", "sub-2"]
+    assert agreement.loc["ai_psg", "sub-1"] == pytest.approx(100.0)
+    assert agreement.loc["ai_hb", "sub-1"] == pytest.approx(200 / 3)
+    assert agreement.loc["ai_hb", "sub-2"] == pytest.approx(100.0)
+    assert agreement.loc["ai_psg", "sub-2"] == pytest.approx(75.0)
+    assert np.isnan(agreement.loc["v2:ai_hb", "sub-2"])
+
+    # Models agree fully with themselves and the matrix is symmetric
+    assert np.diag(pairwise.to_numpy()) == pytest.approx([100.0, 100.0, 100.0])
+    assert pairwise.loc["ai_hb", "ai_psg"] == pairwise.loc["ai_psg", "ai_hb"]
+    # ai_hb and ai_psg agree on 2/3 epochs of night 1 and 2/3 of night 2
+    assert pairwise.loc["ai_hb", "ai_psg"] == pytest.approx(4 / 6 * 100)
+
+def test_evaluate_models_selected_models(two_nights):
+    """
+    Only the requested models are evaluated, in the requested order.
+    """
+    headband_files, psg_files = two_nights
+    agreement, pairwise = evaluate_models(headband_files, psg_files, models=["v2:ai_hb", "ai_psg"])
+    assert list(agreement.index) == ["v2:ai_hb", "ai_psg"]
+    assert pairwise.shape == (2, 2)
+
+def test_evaluate_models_psg_rule_matches_aispg_vs_majority(write_nights):
+    """
+    Missing PSG AI epochs count as disagreements and PSG nights are never skipped, like in aispg_vs_majority,
+    while the headband AI still skips nights with too much missing data.
+    """
+    headband_files, psg_files = write_nights({
+        "sub-1": ([0, 1, 2, 8, 2], [0, -2, 2, 2, 1], [0, 1, 2, 2, 2]),
+        "sub-2": ([2, 2, 3, 3, 3], [-2, -2, -2, 3, 3], [-2, -2, 3, 3, 3]),
+    })
+    agreement, _ = evaluate_models(headband_files, psg_files)
+
+    expected = [aispg_vs_majority(psg_file) for psg_file in psg_files]
+    assert agreement.loc["ai_psg"].tolist() == pytest.approx(expected)
+    assert agreement.loc["ai_psg", "sub-2"] == pytest.approx(40.0)
+    assert agreement.loc["ai_hb", "sub-1"] == pytest.approx(100.0)
+    assert np.isnan(agreement.loc["ai_hb", "sub-2"])
+
+def test_evaluate_models_skips_nights_the_scheme_cannot_remap(write_nights):
+    """
+    A night with a code outside of the stage encoding is skipped instead of stopping the evaluation.
+    """
+    headband_files, psg_files = write_nights({
+        "sub-1": ([0, 1, 2, 2], [0, 1, 2, 2], [0, 1, 2, 42]),
+        "sub-2": ([2, 2, 3, 3], [2, 2, 3, 3], [2, 2, 3, 3]),
+    })
+    agreement, _ = evaluate_models(headband_files, psg_files, scheme="light_deep")
+    assert list(agreement.columns) == ["sub-2"]
+    assert agreement.loc["ai_psg", "sub-2"] == pytest.approx(100.0)
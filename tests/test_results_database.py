@@ -0,0 +1,81 @@
+import pytest
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.results_database import (
+    connect_database,
+    index_dataset,
+    query_nights,
+    suggest_subjects,
+    subject_from_path,
+)
+
+@pytest.fixture
+def dataset(tmp_path, write_night):
+    """
+    Creates three nights: a good one, a poor one with one artifact epoch, and a poor one without artifacts.
+    """
+    base = tmp_path / "data"
+    write_night(base, "sub-1", [0, 1, 2, 2], [0, 1, 2, 2], [0, 1, 2, 2])
+    write_night(base, "sub-2", [0, 1, 2, 2, 3], [0, 1, 2, 2, 3], [0, 0, 0, -2, 3])
+    write_night(base, "sub-3", [2, 2, 2, 2], [2, 2, 2, 2], [1, 1, 1, 2])
+    return base
+
+def test_subject_from_path():
+    """
+    The subject ID and number are taken from the file name.
+    """
+    assert subject_from_path("/data/sub-12/eeg/sub-12_task-Sleep_acq-psg_events.tsv") == ("sub-12", 12)
+    assert subject_from_path("sub-x_events.tsv") == ("sub-x", None)
+
+def test_index_dataset_and_query(dataset, tmp_path):
+    """
+    Indexed metrics can be filtered, and unchanged nights are not indexed twice.
+    """
+    database = str(tmp_path / "results.db")
+    assert index_dataset(database, str(dataset)) == 3
+    assert index_dataset(database, str(dataset)) == 0
+
+    low_agreement = query_nights(database, max_hb_match=60)
+    assert [row["subject_id"] for row in low_agreement] == ["sub-2", "sub-3"]
+
+    with_artifacts = query_nights(database, max_hb_match=60, min_error_hours=0)
+    assert [row["subject_id"] for row in with_artifacts] == ["sub-2"]
+
+    assert suggest_subjects(database, min_hb_match=90) == ["1"]
+
+def test_index_dataset_reindexes_changed_nights(dataset, tmp_path, write_night):
+    """
+    A night whose files change is indexed again with its new metrics.
+    """
+    database = str(tmp_path / "results.db")
+    index_dataset(database, str(dataset))
+
+    write_night(dataset, "sub-3", [2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 2, 2])
+    psg_file = dataset / "sub-3" / "eeg" / "sub-3_task-Sleep_acq-psg_events.tsv"
+    os.utime(psg_file, ns=(1, 1))
+    assert index_dataset(database, str(dataset)) == 1
+    assert suggest_subjects(database, min_hb_match=90) == ["1", "3"]
+
+def test_connect_database_creates_indexes(tmp_path):
+    """
+    The schema includes indexes on the metrics used for filtering.
+    """
+    connection = connect_database(str(tmp_path / "results.db"))
+    names = {row["name"] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    connection.close()
+    assert {"idx_metrics_hb_match", "idx_metrics_error_hours"} <= names
+
+def test_query_nights_rejects_unknown_filters(tmp_path):
+    """
+    Unknown filters and sort columns raise a ValueError.
+    """
+    database = str(tmp_path / "results.db")
+    with pytest.raises(ValueError):
+        query_nights(database, max_kappa=0.5)
+    with pytest.raises(ValueError):
+        query_nights(database, order_by="subject_id; DROP TABLE subjects")
@@ -252,3 +252,31 @@ def test_review_subjects_plot_error(mocker, headband_files, psg_files, caplog):
     
     # Verify that the expected warning is logged.
     assert "No valid data found in mocked_headband_file.tsv. Skipping plot." in caplog.text
+
+def test_review_subjects_with_database_filters(mocker, headband_files, psg_files, caplog):
+    """
+    Test review_subjects with a results database and filters.
+
+    The suggested subjects are logged, and a subject that does not match the filters is refused
+    before the matching one is plotted.
+    """
+    # Simulate user input: a filtered-out subject '2', then subject '1', then 'n' to exit.
+    mocker.patch('builtins.input', side_effect=['2', '1', 'n'])
+
+    # Patch the database lookup so that only subject '1' matches the filters.
+    mock_suggest = mocker.patch('files_for_python_project.function_for_reviewing_patients.suggest_subjects',
+                                return_value=['1'])
+
+    # Patch the plot function to monitor its call without executing actual plotting.
+    mock_plot_sleep_stages = mocker.patch('files_for_python_project.function_for_reviewing_patients.plot_sleep_stages')
+
+    with caplog.at_level(logging.INFO):
+        review_subjects(headband_files, psg_files, database="results.db", filters={'max_hb_match': 60})
+
+    # The database was queried with the filters, and the suggestions were logged.
+    mock_suggest.assert_called_once_with("results.db", max_hb_match=60)
+    assert "Suggested subjects: 1" in caplog.text
+    assert "does not match the filters" in caplog.text
+
+    # Only the matching subject was plotted.
+    mock_plot_sleep_stages.assert_called_once_with([psg_files[0]], [headband_files[0]])
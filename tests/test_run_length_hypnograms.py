@@ -0,0 +1,76 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.run_length_hypnograms import (
+    encode_runs,
+    decode_runs,
+    intersect_runs,
+    run_confusion_counts,
+    run_artifact_hours,
+    summarize_runs,
+    read_night_runs,
+    save_night_runs,
+    load_night_runs,
+)
+from files_for_python_project.bootstrap_confidence import confusion_counts
+from files_for_python_project.streaming_pipeline import summarize_stages
+
+def test_encode_and_decode_runs():
+    """
+    A hypnogram is stored as one entry per run and decodes back to the same epochs.
+    """
+    hypnogram = np.array([0, 0, 1, 2, 2, 2, -2, -2])
+    ends, stages = encode_runs(hypnogram)
+
+    assert list(ends) == [2, 3, 6, 8]
+    assert list(stages) == [0, 1, 2, -2]
+    assert list(decode_runs(ends, stages)) == list(hypnogram)
+    assert len(encode_runs([])[0]) == 0
+
+def test_intersect_runs():
+    """
+    Two run lists are split on the union of their boundaries.
+    """
+    lengths, (first, second) = intersect_runs(encode_runs([1, 1, 1, 2]), encode_runs([1, 3, 3, 3]))
+    assert list(lengths) == [1, 2, 1]
+    assert list(first) == [1, 1, 2]
+    assert list(second) == [1, 3, 3]
+
+    with pytest.raises(ValueError):
+        intersect_runs(encode_runs([1, 1]), encode_runs([1, 1, 1]))
+
+def test_run_comparison_matches_epoch_comparison():
+    """
+    Confusion counts and the per-night numbers computed on runs equal the ones computed on epochs.
+    """
+    rng = np.random.default_rng(3)
+    # Long runs of random stages, with some disconnections and missing headband data
+    majority = np.repeat(rng.choice([0, 1, 2, 3, 4, 8], size=60), rng.integers(1, 20, size=60))
+    ai_psg = np.where(rng.random(len(majority)) < 0.8, majority, 2)
+    ai_hb = np.repeat(rng.choice([0, 1, 2, 3, 4, -2], size=len(majority) // 5 + 1), 5)[:len(majority)]
+
+    runs = [encode_runs(hypnogram) for hypnogram in (majority, ai_psg, ai_hb)]
+    assert (run_confusion_counts(runs[0], runs[2]) == confusion_counts(majority, ai_hb)).all()
+    assert summarize_runs(*runs) == summarize_stages(majority, ai_psg, ai_hb)
+    assert run_artifact_hours(runs[2]) == pytest.approx((ai_hb == -2).sum() * 30 / 3600)
+
+def test_save_and_load_night_runs(tmp_path, write_night):
+    """
+    The runs of several nights are stored in one file and read back unchanged.
+    """
+    night = read_night_runs(*write_night(tmp_path, "sub-1", [0, 1, 1, 2], [0, 1, 2, 2], [0, 0, 1, 2]))
+
+    path = str(tmp_path / "runs.npz")
+    save_night_runs(path, {"sub-1": night, "sub-2": night})
+    loaded = load_night_runs(path)
+
+    assert list(loaded) == ["sub-1", "sub-2"]
+    for source, (ends, stages) in night.items():
+        assert list(loaded["sub-2"][source][0]) == list(ends)
+        assert list(loaded["sub-2"][source][1]) == list(stages)
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.stage_dynamics import (
+    transition_counts,
+    transition_probabilities,
+    transition_distance,
+    collect_transition_counts,
+    compare_dynamics,
+)
+
+@pytest.fixture
+def dataset(write_nights):
+    """
+    Creates two nights: in the second one the headband AI fragments the sleep of the experts.
+    """
+    nights = {
+        "sub-1": ([0, 0, 2, 2, 2, 4], [0, 0, 2, 2, 2, 4], [0, 0, 2, 2, 2, 4]),
+        "sub-2": ([2, 2, 2, 2, 8, 2], [2, 2, 2, 2, 2, 2], [2, 1, 2, 1, -2, 1]),
+    }
+    return write_nights(nights)
+
+def test_transition_counts_skip_invalid_epochs():
+    """
+    Pairs with a disconnection or missing data are not counted.
+    """
+    counts = transition_counts([0, 0, 1, 8, 1, -2, 2])
+    assert counts.sum() == 2
+    assert counts[0, 0] == 1 and counts[0, 1] == 1
+
+def test_transition_probabilities_and_distance():
+    """
+    Probabilities are normalized per row; identical dynamics have distance 0.
+    """
+    counts = np.array([[3, 1], [0, 0]])
+    probabilities = transition_probabilities(counts)
+    assert probabilities[0].tolist() == [0.75, 0.25]
+    assert np.isnan(probabilities[1]).all()
+
+    assert transition_distance(counts, counts * 2) == pytest.approx(0.0)
+    assert transition_distance(counts, np.array([[0, 4], [0, 0]])) == pytest.approx(0.75)
+
+def test_collect_transition_counts_matches_single_nights(dataset):
+    """
+    The single bincount over the dataset gives the same matrices as counting night by night,
+    and no transition crosses from one night into the next.
+    """
+    headband_files, psg_files = dataset
+    transitions = collect_transition_counts(headband_files, psg_files)
+
+    assert transitions["nights"] == ["sub-1", "sub-2"]
+    assert transitions["counts"].shape == (2, 3, 5, 5)
+    assert (transitions["counts"][0, 0] == transition_counts([0, 0, 2, 2, 2, 4])).all()
+    assert (transitions["counts"][1, 2] == transition_counts([2, 1, 2, 1, -2, 1])).all()
+    assert transitions["counts"][:, 0].sum() == 5 + 3
+
+def test_compare_dynamics_detects_fragmentation(dataset):
+    """
+    The fragmenting headband AI has more stage changes per hour and a larger distance than the PSG AI.
+    """
+    headband_files, psg_files = dataset
+    result = compare_dynamics(headband_files, psg_files)
+    second_night = result["per_night"].set_index("night").loc["sub-2"]
+
+    assert second_night["majority_changes_per_hour"] == pytest.approx(0.0)
+    assert second_night["ai_hb_changes_per_hour"] == pytest.approx(3 / (6 * 30 / 3600))
+    assert second_night["ai_psg_distance"] == pytest.approx(0.0)
+    assert second_night["ai_hb_distance"] == pytest.approx(1.0)
+    assert result["pooled_distance"]["ai_hb"] > result["pooled_distance"]["ai_psg"]
@@ -0,0 +1,100 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project import stage_encoding
+from files_for_python_project.stage_encoding import (
+    remap_stages,
+    register_scheme,
+    scheme_stages,
+    stage_label,
+    stage_positions,
+    get_lookup_table,
+)
+from files_for_python_project.bootstrap_confidence import confusion_counts
+
+def test_remap_stages_collapses_light_sleep():
+    """
+    N1 and N2 collapse into light sleep while disconnections and missing data keep their codes.
+    """
+    hypnogram = np.array([0, 1, 2, 3, 4, 8, -2])
+    result = remap_stages(hypnogram, "light_deep")
+    assert result.tolist() == [0, 1, 1, 2, 3, 8, -2]
+    # The source hypnogram is left untouched
+    assert hypnogram.tolist() == [0, 1, 2, 3, 4, 8, -2]
+
+def test_remap_stages_three_classes_and_rk():
+    """
+    The wake/NREM/REM and R&K schemes remap with the registered tables.
+    """
+    assert remap_stages([0, 1, 2, 3, 4], "wake_nrem_rem").tolist() == [0, 1, 1, 1, 2]
+    assert remap_stages([0, 3, 4], "rk").tolist() == [0, 3, 5]
+
+def test_remap_stages_without_scheme():
+    """
+    Without a scheme the hypnogram is returned as is.
+    """
+    hypnogram = np.array([0, 2, 4])
+    assert remap_stages(hypnogram) is hypnogram
+
+def test_remap_stages_errors():
+    """
+    Unknown schemes and codes outside the table raise a ValueError.
+    """
+    with pytest.raises(ValueError):
+        remap_stages([0, 1], "unknown")
+    with pytest.raises(ValueError):
+        remap_stages([0, 9], "aasm")
+
+def test_register_scheme():
+    """
+    A registered scheme can be used right away, and invalid mappings are rejected.
+    """
+    register_scheme("sleep_wake", {0: 0, 1: 1, 2: 1, 3: 1, 4: 1}, {0: "Wake", 1: "Sleep"})
+    try:
+        assert remap_stages([0, 4, 8], "sleep_wake").tolist() == [0, 1, 8]
+        assert scheme_stages("sleep_wake").tolist() == [0, 1]
+        assert stage_label(1, "sleep_wake") == "Sleep"
+    finally:
+        stage_encoding.STAGE_SCHEMES.pop("sleep_wake")
+
+    with pytest.raises(ValueError):
+        register_scheme("broken", {7: 0})
+
+def test_lookup_table_is_read_only():
+    """
+    Lookup tables are shared, so they cannot be modified by accident.
+    """
+    with pytest.raises(ValueError):
+        get_lookup_table("aasm")[0] = 3
+
+def test_confusion_counts_on_remapped_view():
+    """
+    Confusion counts work on remapped hypnograms using the stages of the scheme.
+    """
+    majority = remap_stages([1, 2, 4, 8], "wake_nrem_rem")
+    ai = remap_stages([2, 1, 4, 0], "wake_nrem_rem")
+    confusion = confusion_counts(majority, ai, scheme_stages("wake_nrem_rem"))
+    assert confusion.tolist() == [[0, 0, 0], [0, 2, 0], [0, 0, 1]]
+
+def test_stage_label():
+    """
+    Special codes have fixed labels in every scheme.
+    """
+    assert stage_label(-2) == "No data"
+    assert stage_label(8, "rk") == "PSG disconnection"
+    assert stage_label(4) == "REM"
+
+
+def test_stage_positions():
+    """
+    Codes map to their position in the stage list; disconnections and missing data map to -1.
+    """
+    hypnogram = np.array([0, 4, 8, -2, 2])
+    np.testing.assert_array_equal(stage_positions(hypnogram), [0, 4, -1, -1, 2])
+    np.testing.assert_array_equal(stage_positions(hypnogram, scheme_stages("wake_nrem_rem")), [0, -1, -1, -1, 2])
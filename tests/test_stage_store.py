@@ -0,0 +1,105 @@
+import pytest
+import json
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.stage_store import (
+    build_stage_store,
+    open_stage_store,
+    night_stages,
+    map_store_nights,
+    summarize_stored_night,
+)
+from files_for_python_project.streaming_pipeline import summarize_night
+
+@pytest.fixture
+def dataset(write_nights):
+    """
+    Creates two readable nights of different lengths and one night whose files do not line up.
+    """
+    nights = {
+        "sub-1": ([0, 2, 2, 4], [0, 2, 2, 4], [0, 2, -2, 4]),
+        "sub-2": ([2, 2, 8, 2, 3, 3], [2, 2, 2, 2, 3, 3], [1, 2, 2, 2, 2, 3]),
+        "sub-3": ([2, 2], [2, 2], [2]),
+    }
+    return write_nights(nights)
+
+def test_store_round_trip(dataset, tmp_path):
+    """
+    Every readable night is stored once and read back as read-only views.
+    """
+    store_dir = build_stage_store(*dataset, str(tmp_path / "store"))
+    store = open_stage_store(store_dir)
+    assert store["nights"] == ["sub-1", "sub-2"]
+    assert store["offsets"].tolist() == [0, 4, 10]
+    assert store["psg_files"] == dataset[1][:2]
+
+    majority, ai_psg, ai_hb = night_stages(store, 1)
+    assert majority.tolist() == [2, 2, 8, 2, 3, 3]
+    assert ai_hb.tolist() == [1, 2, 2, 2, 2, 3]
+    assert majority.dtype == np.int8
+    assert not majority.flags.writeable
+
+def test_store_with_scheme(dataset, tmp_path):
+    """
+    The stages are stored in the requested scheme.
+    """
+    store = open_stage_store(build_stage_store(*dataset, str(tmp_path / "store"), scheme="wake_nrem_rem"))
+    assert store["scheme"] == "wake_nrem_rem"
+    assert set(night_stages(store, 0)[0].tolist()) <= {0, 1, 2, 8}
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_map_store_nights_matches_summarize_night(dataset, tmp_path, workers):
+    """
+    The stored nights give the same numbers as reading the files, with or without worker processes.
+    """
+    store_dir = build_stage_store(*dataset, str(tmp_path / "store"))
+    rows = map_store_nights(summarize_stored_night, store_dir, workers=workers)
+    expected = [summarize_night(*pair) for pair in zip(*dataset)][:2]
+    for row, expected_row in zip(rows, expected):
+        for column, value in row.items():
+            assert value == expected_row[column]
+
+    assert map_store_nights(summarize_stored_night, store_dir, workers=workers, indices=[1])[0]["subject"] == "sub-2"
+
+def test_rebuild_swaps_whole_builds(dataset, tmp_path):
+    """
+    A reader attached before a rebuild keeps a consistent build; new readers get the new one,
+    and only the current and the previous builds are kept.
+    """
+    store_dir = str(tmp_path / "store")
+    build_stage_store(*dataset, store_dir)
+    old = open_stage_store(store_dir)
+
+    build_stage_store(dataset[0][1:], dataset[1][1:], store_dir)
+    new = open_stage_store(store_dir)
+    assert new["build"] != old["build"]
+    assert new["nights"] == ["sub-2"]
+    assert night_stages(old, 1)[0].tolist() == [2, 2, 8, 2, 3, 3]
+    assert night_stages(new, 0)[0].tolist() == [2, 2, 8, 2, 3, 3]
+
+    build_stage_store(*dataset, store_dir)
+    assert len(os.listdir(os.path.join(store_dir, "builds"))) == 2
+    assert not os.path.exists(old["build"])
+
+def test_open_rejects_mismatched_index(dataset, tmp_path):
+    """
+    An index that does not describe the array next to it is refused instead of giving wrong nights.
+    """
+    store = open_stage_store(build_stage_store(*dataset, str(tmp_path / "store")))
+    index_path = os.path.join(store["build"], "index.json")
+    with open(index_path) as index_file:
+        index = json.load(index_file)
+    index["shape"][1] += 1
+    index["offsets"][-1] += 1
+    with open(index_path, "w") as index_file:
+        json.dump(index, index_file)
+    with pytest.raises(ValueError):
+        open_stage_store(str(tmp_path / "store"))
+    with pytest.raises(FileNotFoundError):
+        open_stage_store(str(tmp_path / "missing"))
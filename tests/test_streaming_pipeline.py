@@ -0,0 +1,92 @@
+import pytest
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.streaming_pipeline import (
+    summarize_night,
+    batched,
+    batch_size_for_budget,
+    stream_dataset,
+    ESTIMATED_NIGHT_BYTES,
+)
+from files_for_python_project.find_file_function import iter_event_files
+
+@pytest.fixture
+def dataset(tmp_path, write_night):
+    """
+    Creates a small dataset of three nights, one of them with too much missing headband data.
+    """
+    write_night(tmp_path, "sub-1", [0, 1, 2, 8], [0, 1, 1, 0], [0, 1, 2, -2])
+    write_night(tmp_path, "sub-2", [2, 2, 3, 3], [2, 2, 3, 3], [2, 3, 3, 3])
+    write_night(tmp_path, "sub-3", [2, 2, 2, 2], [2, 2, 2, 1], [-2, -2, -2, 2])
+    return tmp_path
+
+def test_summarize_night(dataset):
+    """
+    The per-night row follows the rules of the original comparison and hour functions.
+    """
+    row = summarize_night(*next(p for p in iter_event_files(str(dataset)) if "sub-1_" in p[0]))
+    assert row["subject"] == "sub-1"
+    assert row["hb_match"] == pytest.approx(100.0)
+    assert row["psg_match"] == pytest.approx(200 / 3)
+    assert row["error_hours"] == pytest.approx(30 / 3600)
+    assert row["total_hours"] == pytest.approx(3 * 30 / 3600)
+
+def test_summarize_night_missing_file(tmp_path):
+    """
+    A night that cannot be read gives None.
+    """
+    assert summarize_night(str(tmp_path / "a.tsv"), str(tmp_path / "b.tsv")) is None
+
+def test_batched():
+    """
+    Items are grouped into lists of at most the batch size.
+    """
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 3)) == []
+
+def test_batch_size_for_budget():
+    """
+    The batch size grows with the memory budget and is never below one night.
+    """
+    assert batch_size_for_budget(0) == 1
+    assert batch_size_for_budget(10 * ESTIMATED_NIGHT_BYTES / (1024 * 1024)) == 10
+
+def test_stream_dataset(dataset, tmp_path):
+    """
+    Streaming in small batches gives the dataset-wide numbers and spills every night to disk.
+    """
+    spill_path = str(tmp_path / "nights.tsv")
+    report = stream_dataset(str(dataset), spill_path=spill_path, batch_size=2)
+
+    assert report["nights"] == 3
+    # sub-3 has too much missing headband data and is left out of the headband mean
+    assert report["hb_match"] == pytest.approx((100.0 + 75.0) / 2)
+    assert report["psg_match"] == pytest.approx((200 / 3 + 100.0 + 75.0) / 3)
+    assert report["error_hours"] == pytest.approx(4 * 30 / 3600)
+
+    spilled = pd.read_csv(spill_path, sep="\t")
+    assert sorted(spilled["subject"]) == ["sub-1", "sub-2", "sub-3"]
+
+def test_stream_dataset_rerun_replaces_spill_file(dataset, tmp_path):
+    """
+    Running twice with the same spill file keeps one row per night.
+    """
+    spill_path = str(tmp_path / "nights.tsv")
+    stream_dataset(str(dataset), spill_path=spill_path, batch_size=2)
+    stream_dataset(str(dataset), spill_path=spill_path, batch_size=2)
+    spilled = pd.read_csv(spill_path, sep="\t")
+    assert len(spilled) == 3
+
+def test_stream_dataset_empty_folder(tmp_path):
+    """
+    An empty dataset gives no nights and no means.
+    """
+    report = stream_dataset(str(tmp_path))
+    assert report["nights"] == 0
+    assert report["hb_match"] is None
@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.subject_aggregation import (
+    night_epoch_counts,
+    night_count_table,
+    read_participants,
+    aggregate_groups,
+    hierarchical_summary,
+)
+
+@pytest.fixture
+def dataset(tmp_path, write_night):
+    """
+    Creates three nights (two of sub-1, one of sub-2) of different lengths and a participants file.
+    """
+    nights = [
+        ("sub-1", "ses-1", [2, 2, 2, 2], [2, 2, 2, 2]),          # 4 of 4 epochs match
+        ("sub-1", "ses-2", [2, 2], [1, 1]),                      # 0 of 2 epochs match
+        ("sub-2", "ses-1", [0, 1, 2, 3, 4, 4], [0, 1, 2, 3, 4, 0]),  # 5 of 6 epochs match
+    ]
+    files = [write_night(tmp_path, subject, majority, majority, ai_hb, session=session)
+             for subject, session, majority, ai_hb in nights]
+    headband_files, psg_files = [list(paths) for paths in zip(*files)]
+
+    participants_file = tmp_path / "participants.tsv"
+    pd.DataFrame({"participant_id": ["sub-1", "sub-2"], "site": ["A", "B"]}).to_csv(
+        participants_file, sep="\t", index=False)
+    return headband_files, psg_files, str(participants_file)
+
+def test_night_epoch_counts_skips_headband_with_too_much_missing_data():
+    """
+    The counts follow the rules of the main report: disconnections are ignored and bad headband nights are skipped.
+    """
+    majority = np.array([2, 2, 8, 2])
+    counts = night_epoch_counts(majority, majority, np.array([2, -2, 2, -2]))
+    assert counts["psg_epochs"] == 3 and counts["psg_matched"] == 3
+    assert counts["hb_epochs"] == 0
+    assert counts["error_epochs"] == 2 and counts["total_epochs"] == 3
+
+def test_aggregate_by_subject_with_both_weights(dataset):
+    """
+    Epoch weighting pools the epochs of all nights, night weighting averages the per-night percentages.
+    """
+    headband_files, psg_files, _ = dataset
+    nights = night_count_table(headband_files, psg_files)
+
+    by_epochs = aggregate_groups(nights).set_index("subject")
+    assert by_epochs.loc["sub-1", "hb_match"] == pytest.approx(100 * 4 / 6)
+    assert by_epochs.loc["sub-1", "nights"] == 2
+    assert by_epochs.loc["all", "hb_match"] == pytest.approx(100 * 9 / 12)
+    assert by_epochs.loc["all", "subjects"] == 2
+
+    by_nights = aggregate_groups(nights, weight="nights").set_index("subject")
+    assert by_nights.loc["sub-1", "hb_match"] == pytest.approx(50.0)
+    assert by_nights.loc["all", "hb_match"] == pytest.approx((100 + 0 + 100 * 5 / 6) / 3)
+
+def test_hierarchical_summary_by_site(dataset):
+    """
+    Participant attributes can be used as grouping levels, alone or together with the subject.
+    """
+    headband_files, psg_files, participants_file = dataset
+    summary = hierarchical_summary(headband_files, psg_files, participants_file,
+                                   levels=[("site",), ("site", "subject")])
+
+    by_site = summary["site"].set_index("site")
+    assert list(by_site.index) == ["A", "B", "all"]
+    assert by_site.loc["B", "hb_match"] == pytest.approx(100 * 5 / 6)
+    assert by_site.loc["A", "total_hours"] == pytest.approx(4 * 30 / 3600)
+    assert list(summary["site/subject"]["subject"]) == ["sub-1", "sub-2", "all"]
+
+def test_missing_attributes(dataset, tmp_path):
+    """
+    Subjects without a row in the participants file are grouped as 'n/a'; unknown attributes are rejected.
+    """
+    headband_files, psg_files, _ = dataset
+    participants_file = tmp_path / "partial.tsv"
+    pd.DataFrame({"participant_id": ["sub-1"], "site": ["A"]}).to_csv(participants_file, sep="\t", index=False)
+    participants = read_participants(str(participants_file))
+    nights = night_count_table(headband_files, psg_files)
+
+    assert list(aggregate_groups(nights, participants, ("site",))["site"]) == ["A", "n/a", "all"]
+    with pytest.raises(ValueError):
+        aggregate_groups(nights, participants, ("device",))
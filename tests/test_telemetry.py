@@ -0,0 +1,71 @@
+import pytest
+import json
+import logging
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.telemetry import (
+    new_progress,
+    update_progress,
+    finish_progress,
+    progress_snapshot,
+    track_progress,
+)
+
+class FakeClock:
+    """
+    Clock that only moves when the test says so.
+    """
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+def test_progress_snapshot_rate_and_eta():
+    """
+    Throughput is items per second since the start; the ETA follows from the items left.
+    """
+    clock = FakeClock()
+    progress = new_progress(total=100, interval=5, clock=clock)
+    clock.now += 10
+    progress["done"] = 40
+    snapshot = progress_snapshot(progress)
+    assert snapshot["rate"] == pytest.approx(4.0)
+    assert snapshot["eta"] == pytest.approx(15.0)
+
+    unknown_total = new_progress(clock=clock)
+    assert progress_snapshot(unknown_total)["eta"] is None
+
+def test_update_progress_is_rate_limited(tmp_path, caplog):
+    """
+    Updates only report once the interval has passed; every report goes to the NDJSON stream.
+    """
+    clock = FakeClock()
+    stream_path = tmp_path / "progress.ndjson"
+    progress = new_progress(total=10, interval=5, stream_path=str(stream_path), clock=clock)
+
+    with caplog.at_level(logging.INFO):
+        for _ in range(9):
+            clock.now += 1
+            update_progress(progress)
+        finish_progress(progress)
+
+    records = [json.loads(line) for line in stream_path.read_text().splitlines()]
+    assert [record["done"] for record in records] == [5, 9]
+    assert [record["finished"] for record in records] == [False, True]
+    assert records[0]["eta"] == pytest.approx(5.0)
+    assert "Progress: 5/10 nights (1.0/s, ETA 5 s)" in caplog.text
+    assert "Finished 9/10 nights" in caplog.text
+
+def test_track_progress_yields_every_item(caplog):
+    """
+    The wrapped loop sees every item and the total is taken from the sequence.
+    """
+    with caplog.at_level(logging.INFO):
+        assert list(track_progress(["a", "b", "c"], label="files")) == ["a", "b", "c"]
+    assert "Finished 3/3 files" in caplog.text
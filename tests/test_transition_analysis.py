@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.transition_analysis import (
+    distance_to_transition,
+    transition_tolerant_agreement,
+    agreement_by_transition_distance,
+)
+
+@pytest.fixture
+def night_files(write_nights):
+    """
+    Creates one night with a headband and a PSG events file and returns their paths.
+    """
+    return write_nights({"sub-1": ([0, 0, 0, 2, 2, 2], [0, 0, 0, 2, 2, 3], [0, 0, 2, 2, 2, -2])}, onset=True)
+
+def test_distance_to_transition():
+    """
+    Both epochs next to a stage change have distance 0, and the distance grows away from it.
+    """
+    result = distance_to_transition([1, 1, 1, 2, 2, 2, 2, 3])
+    assert result.tolist() == [2, 1, 0, 0, 1, 1, 0, 0]
+
+def test_distance_to_transition_no_change():
+    """
+    A night without any stage change gets the night length as distance for every epoch.
+    """
+    assert distance_to_transition([2, 2, 2]).tolist() == [3, 3, 3]
+    assert distance_to_transition([]).tolist() == []
+
+def test_transition_tolerant_agreement():
+    """
+    An AI shifted by one epoch only fully agrees once a one-epoch tolerance is allowed.
+    """
+    majority = [0, 0, 2, 2, 2]
+    ai = [0, 0, 0, 2, 2]
+    assert transition_tolerant_agreement(majority, ai, k=0) == pytest.approx(80.0)
+    assert transition_tolerant_agreement(majority, ai, k=1) == pytest.approx(100.0)
+
+def test_transition_tolerant_agreement_ignores_invalid_epochs():
+    """
+    PSG disconnections and missing AI data are left out, and no valid epochs gives None.
+    """
+    assert transition_tolerant_agreement([8, 1, 1], [0, 1, -2], k=0) == pytest.approx(100.0)
+    assert transition_tolerant_agreement([8, 8], [0, 1]) is None
+
+def test_agreement_by_transition_distance(night_files):
+    """
+    Agreement per distance is computed from the real files, including the tolerant scores.
+    """
+    headband_files, psg_files = night_files
+    table, tolerant = agreement_by_transition_distance(headband_files, psg_files, max_distance=2)
+
+    assert table["distance"].tolist() == [0, 1, 2]
+    # Distances of the night are [2, 1, 0, 0, 1, 2]
+    assert table["psg_epochs"].tolist() == [2, 2, 2]
+    assert table["psg_agreement"].tolist() == pytest.approx([100.0, 100.0, 50.0])
+    # The last headband epoch has no data and is left out
+    assert table["hb_epochs"].tolist() == [2, 2, 1]
+    assert table["hb_agreement"].tolist() == pytest.approx([50.0, 100.0, 100.0])
+    assert tolerant["hb"] == pytest.approx(100.0)
+    assert tolerant["psg"] == pytest.approx(500 / 6)
+
+def test_agreement_by_transition_distance_no_nights():
+    """
+    Without any readable night the table is empty of epochs and the tolerant scores are None.
+    """
+    table, tolerant = agreement_by_transition_distance([], [], max_distance=3)
+    assert table["psg_epochs"].sum() == 0
+    assert np.isnan(table["hb_agreement"]).all()
+    assert tolerant == {"psg": None, "hb": None}
+
+def test_tolerance_zero_equals_pooled_agreement(write_nights):
+    """
+    With tolerance=0 the tolerant score of both sources is the pooled plain agreement, also when the
+    PSG AI has epochs without data (which count as disagreements, like in aispg_vs_majority).
+    """
+    headband_files, psg_files = write_nights({
+        "sub-1": ([0, 0, 2, 2, 2, 8, 3, 3], [0, -2, 2, 1, 2, 2, -2, 3], [0, 1, 2, 2, -2, 2, 3, 0]),
+    })
+
+    table, tolerant = agreement_by_transition_distance(headband_files, psg_files, tolerance=0)
+    for key in ("psg", "hb"):
+        epochs = table[f"{key}_epochs"]
+        pooled = (table[f"{key}_agreement"].fillna(0) * epochs).sum() / epochs.sum()
+        assert tolerant[key] == pytest.approx(pooled)
+    assert tolerant["psg"] == pytest.approx(400 / 7)
@@ -0,0 +1,100 @@
+import pytest
+import pandas as pd
+import os
+import sys
+
+# Add the root project directory to sys.path so that the module can be imported.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Import the functions to be tested from the project module.
+from files_for_python_project.watching_new_nights import new_watch_state, watch_cycle, watch_dataset
+from files_for_python_project.streaming_pipeline import final_report
+from files_for_python_project.results_database import query_nights
+
+def test_watch_cycle_processes_only_new_and_changed_nights(tmp_path, write_night):
+    """
+    Each cycle processes only new or changed nights and keeps the aggregates up to date.
+    """
+    write_night(tmp_path, "sub-1", [0, 1, 2, 2], [0, 1, 2, 2], [0, 1, 2, 2])
+    state = new_watch_state()
+
+    assert watch_cycle(state, str(tmp_path)) == {"changed": ["sub-1"], "removed": []}
+    assert watch_cycle(state, str(tmp_path)) == {"changed": [], "removed": []}
+
+    # A new night lands
+    write_night(tmp_path, "sub-2", [2, 2, 2, 2], [2, 2, 2, 2], [1, 1, 2, 2])
+    assert watch_cycle(state, str(tmp_path))["changed"] == ["sub-2"]
+    assert final_report(state["aggregates"])["hb_match"] == pytest.approx(75.0)
+
+    # The first night is rescored: its old contribution is replaced
+    write_night(tmp_path, "sub-1", [0, 1, 2, 2], [0, 1, 2, 2], [0, 0, 0, 2])
+    os.utime(tmp_path / "sub-1" / "eeg" / "sub-1_task-Sleep_acq-headband_events.tsv", ns=(1, 1))
+    assert watch_cycle(state, str(tmp_path))["changed"] == ["sub-1"]
+    report = final_report(state["aggregates"])
+    assert report["nights"] == 2
+    assert report["hb_match"] == pytest.approx(50.0)
+
+def test_watch_cycle_handles_removed_nights(tmp_path, write_night):
+    """
+    A night whose files disappear is removed from the aggregates.
+    """
+    write_night(tmp_path, "sub-1", [0, 1], [0, 1], [0, 1])
+    write_night(tmp_path, "sub-2", [0, 1], [0, 0], [0, 0])
+    state = new_watch_state()
+    watch_cycle(state, str(tmp_path))
+
+    os.remove(tmp_path / "sub-2" / "eeg" / "sub-2_task-Sleep_acq-psg_events.tsv")
+    assert watch_cycle(state, str(tmp_path))["removed"] == ["sub-2"]
+    assert final_report(state["aggregates"])["psg_match"] == pytest.approx(100.0)
+
+def test_watch_dataset_with_database(tmp_path, write_night):
+    """
+    The database is updated as nights arrive, and a new session starts from it without recomputing.
+    """
+    data = tmp_path / "data"
+    write_night(data, "sub-1", [0, 1, 2, 2], [0, 1, 2, 2], [0, 1, 2, 2])
+    database = str(tmp_path / "results.db")
+    updates = []
+
+    report = watch_dataset(str(data), interval=0, database_path=database, max_cycles=2,
+                           on_update=lambda report, changes: updates.append(changes))
+    assert report["nights"] == 1
+    assert updates == [{"changed": ["sub-1"], "removed": []}]
+    assert [row["subject_id"] for row in query_nights(database)] == ["sub-1"]
+
+    # A second session already knows sub-1 and only processes the new night
+    write_night(data, "sub-2", [2, 2], [2, 2], [2, 2])
+    updates.clear()
+    report = watch_dataset(str(data), interval=0, database_path=database, max_cycles=1,
+                           on_update=lambda report, changes: updates.append(changes))
+    assert updates == [{"changed": ["sub-2"], "removed": []}]
+    assert report["nights"] == 2
+
+def test_watch_cycle_changed_then_unreadable_then_deleted(tmp_path, write_night):
+    """
+    A night that becomes unreadable loses its old contribution at once, and deleting it later
+    does not change the numbers again.
+    """
+    data = tmp_path / "data"
+    write_night(data, "sub-1", [0, 1], [0, 1], [0, 1])
+    write_night(data, "sub-2", [0, 1], [0, 0], [0, 0])
+    database = str(tmp_path / "results.db")
+    state = new_watch_state(database)
+    watch_cycle(state, str(data))
+    assert final_report(state["aggregates"])["psg_match"] == pytest.approx(75.0)
+
+    # sub-2 is rewritten with a headband file that no longer lines up with the PSG file
+    headband_file = data / "sub-2" / "eeg" / "sub-2_task-Sleep_acq-headband_events.tsv"
+    pd.DataFrame({"ai_hb": [0, 0, 0]}).to_csv(headband_file, sep="\t", index=False)
+    os.utime(headband_file, ns=(1, 1))
+    assert watch_cycle(state, str(data)) == {"changed": [], "removed": ["sub-2"]}
+    assert final_report(state["aggregates"])["nights"] == 1
+    assert final_report(state["aggregates"])["psg_match"] == pytest.approx(100.0)
+    assert [row["subject_id"] for row in query_nights(database)] == ["sub-1"]
+
+    os.remove(headband_file)
+    assert watch_cycle(state, str(data)) == {"changed": [], "removed": []}
+    report = final_report(state["aggregates"])
+    assert report["nights"] == 1
+    assert report["psg_match"] == pytest.approx(100.0)
+    state["connection"].close()